@@ -0,0 +1,148 @@
+# benchmarks/bench_async.py
+"""
+ダッシュボード API の同期版（def + Session）と非同期版（async def + AsyncSession）の負荷試験。
+
+同期のエンドポイントは Starlette のスレッドプール（既定40スレッド）で実行されるため、
+一括登録などの重いリクエストがスレッドを使い切るとダッシュボードが待たされる。
+重いリクエスト（--busy 件を常に実行中にする）と並行してダッシュボードを叩き、
+応答時間とスループット・スレッド数を比較する。
+非同期版も aiosqlite が接続ごとにスレッドを使うため、スレッド数には async のエンジンの
+接続数（ASYNC_DB_POOL_SIZE / ASYNC_DB_MAX_OVERFLOW）の分が含まれる。
+
+    python benchmarks/bench_async.py
+    python benchmarks/bench_async.py --busy 80 --clients 50 --requests 40
+"""
+import argparse
+import asyncio
+import json
+import logging
+import os
+import threading
+import time
+
+from common import percentile, seed_database, setup_environment
+
+
+def _build_app(busy_ms):
+    """比較用のアプリ（非同期版は main.py のエンドポイントをそのまま使う）"""
+    from fastapi import Depends, FastAPI
+    from sqlmodel import Session
+    from models import get_session
+    from main import _account_summary_statement, list_accounts
+    from datetime import datetime
+
+    app = FastAPI()
+    app.add_api_route("/async/accounts", list_accounts)
+
+    # 非同期化する前の実装
+    def sync_list_accounts(session: Session = Depends(get_session)):
+        rows = session.exec(_account_summary_statement(datetime.now())).all()
+        return [
+            {"id": account_id, "name": name, "last_tweet": last_content}
+            for account_id, name, last_content, has_posted, next_at in rows
+        ]
+
+    app.add_api_route("/sync/accounts", sync_list_accounts)
+
+    # 一括登録・書き込みロック待ちなど、スレッドを占有する重いリクエストの代わり
+    def busy():
+        time.sleep(busy_ms / 1000)
+        return {}
+
+    app.add_api_route("/busy", busy)
+    return app
+
+
+async def _run(app, mode, args):
+    import httpx
+
+    transport = httpx.ASGITransport(app=app)
+    latencies = []
+    max_threads = threading.active_count()
+    stop = asyncio.Event()
+
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+
+        async def keep_busy():
+            while not stop.is_set():
+                await client.get("/busy")
+
+        async def dashboard():
+            nonlocal max_threads
+            for _ in range(args.requests):
+                start = time.perf_counter()
+                response = await client.get(f"/{mode}/accounts")
+                latencies.append((time.perf_counter() - start) * 1000)
+                response.raise_for_status()
+                max_threads = max(max_threads, threading.active_count())
+
+        busy_tasks = [asyncio.create_task(keep_busy()) for _ in range(args.busy)]
+        # 重いリクエストがスレッドを埋めるまで待つ
+        await asyncio.sleep(args.busy_ms / 1000 / 2)
+        start = time.perf_counter()
+        await asyncio.gather(*(dashboard() for _ in range(args.clients)))
+        elapsed = time.perf_counter() - start
+        stop.set()
+        await asyncio.gather(*busy_tasks)
+
+    return {
+        "requests": len(latencies),
+        "rps": round(len(latencies) / elapsed, 1),
+        "p50_ms": round(percentile(latencies, 50), 2),
+        "p95_ms": round(percentile(latencies, 95), 2),
+        "p99_ms": round(percentile(latencies, 99), 2),
+        "max_threads": max_threads,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--rows", type=int, default=50_000)
+    parser.add_argument("--accounts", type=int, default=200)
+    parser.add_argument("--busy", type=int, default=60, help="常に実行中にする重いリクエストの数")
+    parser.add_argument("--busy-ms", type=int, default=200, help="重いリクエスト1件の所要時間")
+    parser.add_argument("--clients", type=int, default=20, help="ダッシュボードを叩く同時接続数")
+    parser.add_argument("--requests", type=int, default=20, help="1接続あたりのリクエスト数")
+    parser.add_argument("--json", help="結果を JSON で書き出すファイル")
+    args = parser.parse_args()
+
+    db_path = setup_environment()
+    import models
+
+    logging.getLogger("httpx").setLevel(logging.WARNING)
+
+    models.engine.echo = False
+    models.create_db_and_tables()
+    try:
+        print(f"{args.rows:,}件のツイートを投入しています...")
+        seed_database(models.engine, accounts=args.accounts, tweets=args.rows)
+        app = _build_app(args.busy_ms)
+
+        async def run_all():
+            results = {}
+            for mode in ("sync", "async"):
+                results[mode] = await _run(app, mode, args)
+            await models.dispose_engines()
+            return results
+
+        results = asyncio.run(run_all())
+    finally:
+        models.engine.dispose()
+        os.remove(db_path)
+
+    print(
+        f"\n{'mode':<8}{'rps':>10}{'p50 (ms)':>12}{'p95 (ms)':>12}{'p99 (ms)':>12}{'threads':>10}"
+    )
+    for mode, r in results.items():
+        print(
+            f"{mode:<8}{r['rps']:>10.1f}{r['p50_ms']:>12.2f}{r['p95_ms']:>12.2f}"
+            f"{r['p99_ms']:>12.2f}{r['max_threads']:>10}"
+        )
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump({"args": vars(args), "results": results}, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,394 @@
+# benchmarks/bench_http.py
+"""
+大量データの DB に対する HTTP API（main.py）の負荷試験。
+
+アカウント・ツイート・画像を一時 DB に投入し、ローカルの uvicorn（別プロセス、スケジューラーは停止）に
+ダッシュボードと同じ呼び出し（アカウント一覧・タイムライン・一括予約・画像一覧・スケジュール設定の CRUD）を
+--concurrency 本の接続から --mix の比率で --duration 秒間送り、エンドポイントごとの
+応答時間のパーセンタイルとエラー率を出す。--json の結果には日時とコミットを含めるので、そのまま蓄積して比較できる。
+--db に既存のファイルを指定すると投入を省略して使い回す（なければ投入して残す）。
+
+    python benchmarks/bench_http.py
+    python benchmarks/bench_http.py --accounts 1000 --rows 1000000 --db /tmp/xbm-1m.db --concurrency 50 --duration 60
+    python benchmarks/bench_http.py --mix accounts=1,timeline=4,bulk=0,images=2,hourly=1 --json result.json
+"""
+import argparse
+import asyncio
+import json
+import logging
+import os
+import platform
+import random
+import socket
+import subprocess
+import sys
+import time
+from collections import Counter, defaultdict
+from datetime import datetime, timedelta
+
+from common import REPO_ROOT, percentile, seed_database, setup_environment
+
+# 操作名 → 既定の比率
+DEFAULT_MIX = {"accounts": 1, "timeline": 4, "tweets_all": 1, "bulk": 1, "images": 2, "hourly": 1}
+
+
+def _free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def _parse_mix(value):
+    mix = dict(DEFAULT_MIX)
+    for item in filter(None, value.split(",")):
+        name, _, weight = item.partition("=")
+        if name not in DEFAULT_MIX:
+            raise SystemExit(f"--mix の操作は {', '.join(DEFAULT_MIX)} のいずれかです: {name}")
+        mix[name] = float(weight)
+    return {name: weight for name, weight in mix.items() if weight > 0}
+
+
+def _seed_images(engine, accounts, per_account, seed=0):
+    """画像一覧用に、画像の実体とアカウントの画像名を登録する（ファイルは作らない）"""
+    from sqlalchemy import insert
+    from models import AccountImage, ImageBlob
+
+    rng = random.Random(seed)
+    now = datetime.now()
+    blobs = [
+        {
+            "sha256": f"{i:064x}",
+            "ext": ".png",
+            "size": rng.randint(10_000, 5_000_000),
+            "mime_type": "image/png",
+            "width": 1200,
+            "height": 800,
+        }
+        for i in range(max(per_account * 4, 1))
+    ]
+    rows = [
+        {
+            "account_id": account_id,
+            "name": f"bench-{account_id}-{i}.png",
+            "sha256": rng.choice(blobs)["sha256"],
+            "created_at": now - timedelta(minutes=rng.randint(0, 365 * 24 * 60)),
+            "usage_count": rng.randint(0, 5),
+        }
+        for account_id in range(1, accounts + 1)
+        for i in range(per_account)
+    ]
+    with engine.begin() as conn:
+        conn.execute(insert(ImageBlob), blobs)
+        for start in range(0, len(rows), 20_000):
+            conn.execute(insert(AccountImage), rows[start : start + 20_000])
+
+
+def _serve(port):
+    """子プロセス: スケジューラーを止めた main.app を uvicorn で動かす"""
+    setup_environment(os.environ["DATABASE_URL"].removeprefix("sqlite:///"))
+    import uvicorn
+    import main
+
+    # 投入したツイートを本物の X に投稿しないようにする
+    main.has_scheduler = False
+    uvicorn.run(main.app, host="127.0.0.1", port=port, log_level="warning")
+
+
+def _start_server(port, timeout=60):
+    process = subprocess.Popen(
+        [sys.executable, os.path.abspath(__file__), "--serve", str(port)],
+        stdout=subprocess.DEVNULL,
+    )
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        if process.poll() is not None:
+            raise SystemExit("uvicorn が起動できませんでした")
+        try:
+            with socket.create_connection(("127.0.0.1", port), timeout=0.5):
+                return process
+        except OSError:
+            time.sleep(0.2)
+    process.terminate()
+    raise SystemExit("uvicorn の起動がタイムアウトしました")
+
+
+class Recorder:
+    """エンドポイントごとの応答時間・ステータスを記録する"""
+
+    def __init__(self):
+        self.latencies = defaultdict(list)
+        self.statuses = defaultdict(Counter)
+
+    async def call(self, client, endpoint, method, url, **kwargs):
+        start = time.perf_counter()
+        try:
+            response = await client.request(method, url, **kwargs)
+            status = response.status_code
+        except Exception as e:
+            response, status = None, type(e).__name__
+        self.latencies[endpoint].append((time.perf_counter() - start) * 1000)
+        self.statuses[endpoint][str(status)] += 1
+        return response if status in (200, 201) else None
+
+    def summary(self, elapsed):
+        results = {}
+        for endpoint in sorted(self.latencies):
+            samples = self.latencies[endpoint]
+            statuses = self.statuses[endpoint]
+            errors = sum(count for status, count in statuses.items() if status not in ("200", "201"))
+            results[endpoint] = {
+                "requests": len(samples),
+                "errors": errors,
+                "error_rate": round(errors / len(samples), 4),
+                "rps": round(len(samples) / elapsed, 1),
+                "p50_ms": round(percentile(samples, 50), 2),
+                "p95_ms": round(percentile(samples, 95), 2),
+                "p99_ms": round(percentile(samples, 99), 2),
+                "max_ms": round(max(samples), 2),
+                "statuses": dict(statuses),
+            }
+        return results
+
+
+def _operations(recorder, args):
+    """操作名 → 1回分の呼び出し（async 関数）"""
+
+    def account_id(rng):
+        return rng.randint(1, args.accounts)
+
+    async def accounts(client, rng):
+        await recorder.call(client, "GET /accounts", "GET", "/accounts")
+
+    async def timeline(client, rng):
+        # 画面と同じく予約・履歴の2カラムを取得し、一部は次のページも読む
+        aid = account_id(rng)
+        for status in ("pending,failed", "posted"):
+            response = await recorder.call(
+                client,
+                "GET /accounts/{id}/tweets?status&limit",
+                "GET",
+                f"/accounts/{aid}/tweets",
+                params={"status": status, "limit": 20},
+            )
+            cursor = response.json().get("next_cursor") if response else None
+            if cursor and rng.random() < 0.3:
+                await recorder.call(
+                    client,
+                    "GET /accounts/{id}/tweets?cursor",
+                    "GET",
+                    f"/accounts/{aid}/tweets",
+                    params={"status": status, "limit": 20, "cursor": cursor},
+                )
+
+    async def tweets_all(client, rng):
+        # ページングなしの従来の全件取得
+        await recorder.call(
+            client, "GET /accounts/{id}/tweets", "GET", f"/accounts/{account_id(rng)}/tweets"
+        )
+
+    async def bulk(client, rng):
+        base = datetime.now() + timedelta(days=rng.randint(1, 30))
+        tweets = [
+            {
+                "content": f"load test {rng.random():.8f}",
+                "image_names": [],
+                "scheduled_at": (base + timedelta(minutes=i)).strftime("%Y-%m-%dT%H:%M"),
+            }
+            for i in range(args.bulk_size)
+        ]
+        await recorder.call(
+            client,
+            "POST /accounts/{id}/bulk-tweets",
+            "POST",
+            f"/accounts/{account_id(rng)}/bulk-tweets",
+            json={"tweets": tweets},
+        )
+
+    async def images(client, rng):
+        aid = account_id(rng)
+        sort = rng.choice(["newest", "name", "size", "usage"])
+        response = await recorder.call(
+            client,
+            "GET /accounts/{id}/images?sort&limit",
+            "GET",
+            f"/accounts/{aid}/images",
+            params={"sort": sort, "limit": 60},
+        )
+        cursor = response.json().get("next_cursor") if response else None
+        if cursor and rng.random() < 0.3:
+            await recorder.call(
+                client,
+                "GET /accounts/{id}/images?cursor",
+                "GET",
+                f"/accounts/{aid}/images",
+                params={"sort": sort, "cursor": cursor, "limit": 60},
+            )
+
+    async def hourly(client, rng):
+        # 作成 → 一覧 → 更新 → 削除
+        aid = account_id(rng)
+        base = f"/accounts/{aid}/hourly-schedules"
+        response = await recorder.call(
+            client,
+            "POST /accounts/{id}/hourly-schedules",
+            "POST",
+            base,
+            json={"name": "load test", "hours": ["09:00", "12:00", "18:00"]},
+        )
+        await recorder.call(client, "GET /accounts/{id}/hourly-schedules", "GET", base)
+        if response is None:
+            return
+        schedule_id = response.json()["id"]
+        await recorder.call(
+            client,
+            "PUT /accounts/{id}/hourly-schedules/{sid}",
+            "PUT",
+            f"{base}/{schedule_id}",
+            json={"hours": ["08:00", "20:00"], "is_active": False},
+        )
+        await recorder.call(
+            client,
+            "DELETE /accounts/{id}/hourly-schedules/{sid}",
+            "DELETE",
+            f"{base}/{schedule_id}",
+        )
+
+    return {
+        "accounts": accounts,
+        "timeline": timeline,
+        "tweets_all": tweets_all,
+        "bulk": bulk,
+        "images": images,
+        "hourly": hourly,
+    }
+
+
+async def _load(base_url, args, mix):
+    import httpx
+
+    recorder = Recorder()
+    names = list(mix)
+    weights = [mix[name] for name in names]
+    limits = httpx.Limits(max_connections=args.concurrency)
+
+    async with httpx.AsyncClient(base_url=base_url, timeout=args.request_timeout, limits=limits) as client:
+
+        async def run(operations, seconds):
+            until = time.perf_counter() + seconds
+
+            async def worker(index):
+                rng = random.Random(index)
+                while time.perf_counter() < until:
+                    await operations[rng.choices(names, weights)[0]](client, rng)
+
+            await asyncio.gather(*(worker(i) for i in range(args.concurrency)))
+
+        # 接続の確立とキャッシュの温めは集計しない
+        if args.warmup:
+            await run(_operations(Recorder(), args), args.warmup)
+        start = time.perf_counter()
+        await run(_operations(recorder, args), args.duration)
+        elapsed = time.perf_counter() - start
+    return recorder.summary(elapsed), elapsed
+
+
+def _git_commit():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            cwd=REPO_ROOT,
+            capture_output=True,
+            text=True,
+            check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--accounts", type=int, default=1000)
+    parser.add_argument("--rows", type=int, default=1_000_000, help="投入するツイート数")
+    parser.add_argument("--images", type=int, default=200, help="1アカウントあたりの画像数")
+    parser.add_argument("--db", help="使い回す DB ファイル（なければ投入して残す）")
+    parser.add_argument("--concurrency", type=int, default=20, help="同時に実行する接続数")
+    parser.add_argument("--duration", type=float, default=30, help="測定する秒数")
+    parser.add_argument("--warmup", type=float, default=3, help="集計しない慣らし運転の秒数")
+    parser.add_argument("--mix", default="", help="操作ごとの比率（例: timeline=4,bulk=0）")
+    parser.add_argument("--bulk-size", type=int, default=20, help="一括予約1回あたりの件数（最大150）")
+    parser.add_argument("--request-timeout", type=float, default=30)
+    parser.add_argument("--json", help="結果を JSON で書き出すファイル")
+    parser.add_argument("--serve", type=int, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.serve:
+        _serve(args.serve)
+        return
+
+    mix = _parse_mix(args.mix)
+    # setup_environment で作業ディレクトリが変わるので、先に絶対パスにしておく
+    if args.json:
+        args.json = os.path.abspath(args.json)
+    reuse = bool(args.db and os.path.exists(args.db))
+    db_path = setup_environment(os.path.abspath(args.db) if args.db else None)
+    import models
+
+    logging.getLogger("httpx").setLevel(logging.WARNING)
+
+    if not reuse:
+        models.create_db_and_tables()
+        print(f"{args.accounts:,}アカウント・{args.rows:,}件のツイートを投入しています...")
+        seed_database(models.engine, accounts=args.accounts, tweets=args.rows)
+        _seed_images(models.engine, args.accounts, args.images)
+    else:
+        from sqlmodel import Session, func, select
+        from models import Account
+
+        with Session(models.engine) as session:
+            args.accounts = session.exec(select(func.count()).select_from(Account)).one()
+        print(f"{args.db} を使います（{args.accounts:,}アカウント）")
+    models.engine.dispose()
+
+    port = _free_port()
+    server = _start_server(port)
+    try:
+        print(f"{args.concurrency}接続で{args.duration:g}秒間測定しています...")
+        results, elapsed = asyncio.run(_load(f"http://127.0.0.1:{port}", args, mix))
+    finally:
+        server.terminate()
+        server.wait()
+        if not args.db:
+            for suffix in ("", "-wal", "-shm"):
+                if os.path.exists(db_path + suffix):
+                    os.remove(db_path + suffix)
+
+    print(
+        f"\n{'endpoint':<48}{'requests':>9}{'rps':>8}{'p50 (ms)':>10}{'p95 (ms)':>10}"
+        f"{'p99 (ms)':>10}{'max (ms)':>10}{'errors':>8}"
+    )
+    for endpoint, r in results.items():
+        print(
+            f"{endpoint:<48}{r['requests']:>9}{r['rps']:>8.1f}{r['p50_ms']:>10.2f}{r['p95_ms']:>10.2f}"
+            f"{r['p99_ms']:>10.2f}{r['max_ms']:>10.2f}{r['error_rate']:>8.1%}"
+        )
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(
+                {
+                    "meta": {
+                        "timestamp": datetime.now().isoformat(timespec="seconds"),
+                        "commit": _git_commit(),
+                        "python": platform.python_version(),
+                        "elapsed_s": round(elapsed, 2),
+                    },
+                    "args": vars(args),
+                    "results": results,
+                },
+                f,
+                indent=2,
+            )
+
+
+if __name__ == "__main__":
+    main()
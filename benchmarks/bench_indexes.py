@@ -0,0 +1,125 @@
+# benchmarks/bench_indexes.py
+"""
+Tweet テーブルの複合インデックスの効果を測るベンチマーク。
+
+一時 SQLite に大量のツイートを投入し、スケジューラー・ダッシュボード・一覧が
+発行する主なクエリの所要時間をインデックスなし／ありで比較する。
+
+    python benchmarks/bench_indexes.py                 # 100万件
+    python benchmarks/bench_indexes.py --rows 100000 --accounts 200
+"""
+import argparse
+import json
+import os
+from datetime import datetime, timedelta
+
+from common import seed_database, setup_environment, time_call
+
+
+def _queries(session, account_id):
+    from sqlmodel import select
+    from models import Tweet, TWEET_PENDING
+    from main import (
+        TWEET_STATUS_FILTERS,
+        _account_summary_statement,
+        _tweet_counts,
+        _tweet_counts_statement,
+        _tweet_page_statement,
+    )
+    from services.dispatch_queue import CLAIM_BATCH_SIZE, _claimable
+
+    now = datetime.now()
+    history = TWEET_STATUS_FILTERS["posted"] + TWEET_STATUS_FILTERS["failed"]
+    return {
+        # スケジューラー: 投稿時刻を過ぎたツイートの取得
+        "claim_due": lambda: session.exec(
+            select(Tweet.id, Tweet.account_id)
+            .where(_claimable(now))
+            .order_by(Tweet.scheduled_at, Tweet.id)
+            .limit(CLAIM_BATCH_SIZE)
+        ).all(),
+        # スケジューラー: 直近の予約の読み込み（起床時刻の計算用）
+        "resync_window": lambda: session.exec(
+            select(Tweet.id, Tweet.scheduled_at).where(
+                Tweet.status == TWEET_PENDING,
+                Tweet.scheduled_at <= now + timedelta(minutes=20),
+            )
+        ).all(),
+        # ダッシュボード: 全アカウントの最終投稿・次回予定
+        "dashboard": lambda: session.exec(_account_summary_statement(now)).all(),
+        # 投稿一覧: 予約中の先頭ページ／履歴の先頭ページ
+        "page_scheduled": lambda: session.exec(
+            _tweet_page_statement(account_id, [TWEET_PENDING], None, 20)
+        ).all(),
+        "page_history": lambda: session.exec(
+            _tweet_page_statement(account_id, history, None, 20)
+        ).all(),
+        # 投稿一覧: 状態ごとの件数
+        "counts": lambda: _tweet_counts(
+            session.exec(_tweet_counts_statement(account_id)).all()
+        ),
+    }
+
+
+def _measure(engine, repeat, account_id):
+    from sqlmodel import Session
+
+    results = {}
+    with Session(engine) as session:
+        for name, query in _queries(session, account_id).items():
+            median, worst = time_call(query, repeat)
+            results[name] = {"median_ms": round(median, 2), "max_ms": round(worst, 2)}
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    parser.add_argument("--accounts", type=int, default=1000)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--json", help="結果を JSON で書き出すファイル")
+    args = parser.parse_args()
+
+    db_path = setup_environment()
+    from sqlalchemy import text
+    import models
+
+    models.engine.echo = False
+    models.create_db_and_tables()
+    try:
+        print(f"{args.rows:,}件のツイートを投入しています...")
+        seed_database(models.engine, accounts=args.accounts, tweets=args.rows)
+
+        # マイグレーション適用前の状態（インデックスなし）を再現する
+        with models.engine.begin() as conn:
+            for index in models.Tweet.__table__.indexes:
+                conn.execute(text(f"DROP INDEX IF EXISTS {index.name}"))
+            conn.execute(text("ANALYZE"))
+        before = _measure(models.engine, args.repeat, account_id=1)
+
+        with models.engine.begin() as conn:
+            models._create_indexes(conn, models.Tweet.__table__)
+            conn.execute(text("ANALYZE"))
+        after = _measure(models.engine, args.repeat, account_id=1)
+    finally:
+        models.engine.dispose()
+        os.remove(db_path)
+
+    print(f"\n{'query':<16}{'before (ms)':>14}{'after (ms)':>14}{'speedup':>10}")
+    for name in before:
+        b = before[name]["median_ms"]
+        a = after[name]["median_ms"]
+        speedup = f"{b / a:.1f}x" if a else "-"
+        print(f"{name:<16}{b:>14.2f}{a:>14.2f}{speedup:>10}")
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(
+                {"rows": args.rows, "accounts": args.accounts, "before": before, "after": after},
+                f,
+                indent=2,
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,226 @@
+# benchmarks/bench_scheduler.py
+"""
+スケジューラー（DispatchLoop → check_and_post）の投稿スループットを、ローカルの X API もどきで測るベンチマーク。
+
+アカウント・投稿待ちのツイート・画像を一時 DB と一時ディレクトリに用意し、
+tweepy の通信を benchmarks/fake_x.py のサーバーに向けて、全件が処理されるまでループを動かす。
+X 側の遅延・5xx エラー・429 の発生率を変えて、スループット（件/分）・予約時刻からの遅れ
+（p50 / p99）・ピークメモリを測る。--json で保存した結果を --baseline に渡すと前回と比較できる。
+
+    python benchmarks/bench_scheduler.py
+    python benchmarks/bench_scheduler.py --accounts 200 --tweets 5000 --image-ratio 0.3 --workers 16
+    python benchmarks/bench_scheduler.py --error-rate 0.02 --rate-limit-rate 0.01 --json after.json --baseline before.json
+"""
+import argparse
+import base64
+import json
+import logging
+import os
+import random
+import resource
+import shutil
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+from common import REPO_ROOT, percentile, seed_database, setup_environment
+from fake_x import FakeXServer, route_requests_to
+
+# 1x1 の PNG（アップロードの中身は問わないので最小限）
+PIXEL_PNG = base64.b64decode(
+    "iVBORw0KGgoAAAANSUhEUgAAAAEAAAABCAYAAAAfFcSJAAAADUlEQVR42mP8/5+hHgAHggJ/PchI7wAAAABJRU5ErkJggg=="
+)
+IMAGES_PER_ACCOUNT = 4
+
+
+def _peak_rss_mb():
+    usage = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux は KB、macOS はバイト
+    return usage / (1024 * 1024) if sys.platform == "darwin" else usage / 1024
+
+
+def _seed(models, args, start_at):
+    """アカウントと、start_at から --spread 秒に散らした投稿待ちのツイートを登録する"""
+    from sqlalchemy import insert
+    from models import Tweet, TWEET_PENDING
+
+    seed_database(models.engine, accounts=args.accounts, tweets=0)
+
+    image_names = [f"bench-{i}.png" for i in range(IMAGES_PER_ACCOUNT)]
+    for account_id in range(1, args.accounts + 1):
+        directory = os.path.join("static", "uploads", str(account_id))
+        os.makedirs(directory, exist_ok=True)
+        for name in image_names:
+            with open(os.path.join(directory, name), "wb") as f:
+                f.write(PIXEL_PNG)
+
+    rng = random.Random(0)
+    rows = []
+    for i in range(args.tweets):
+        with_images = rng.random() < args.image_ratio
+        rows.append(
+            {
+                "account_id": rng.randint(1, args.accounts),
+                "content": f"benchmark tweet {i}",
+                "image_names": json.dumps(
+                    rng.sample(image_names, args.images_per_tweet) if with_images else []
+                ),
+                "status": TWEET_PENDING,
+                "is_posted": False,
+                "scheduled_at": start_at + timedelta(seconds=args.spread * i / max(1, args.tweets)),
+            }
+        )
+    with models.engine.begin() as conn:
+        conn.execute(insert(Tweet), rows)
+
+
+def _remaining(models):
+    from sqlmodel import Session, func, select
+    from models import Tweet, TWEET_PENDING, TWEET_IN_FLIGHT
+
+    with Session(models.engine) as session:
+        return session.exec(
+            select(func.count())
+            .select_from(Tweet)
+            .where(Tweet.status.in_([TWEET_PENDING, TWEET_IN_FLIGHT]))
+        ).one()
+
+
+def _collect(models, started, finished):
+    from sqlmodel import Session, select
+    from models import Tweet, TWEET_POSTED, TWEET_FAILED
+
+    with Session(models.engine) as session:
+        rows = session.exec(
+            select(Tweet.status, Tweet.scheduled_at, Tweet.posted_at, Tweet.retry_count)
+        ).all()
+    lags = [
+        (posted_at - scheduled_at).total_seconds()
+        for status, scheduled_at, posted_at, _ in rows
+        if status == TWEET_POSTED
+    ]
+    elapsed = finished - started
+    return {
+        "posted": len(lags),
+        "failed": sum(1 for status, *_ in rows if status == TWEET_FAILED),
+        "unfinished": sum(1 for status, *_ in rows if status not in (TWEET_POSTED, TWEET_FAILED)),
+        "retries": sum(retry_count or 0 for *_, retry_count in rows),
+        "elapsed_s": round(elapsed, 2),
+        "tweets_per_min": round(len(lags) / elapsed * 60, 1) if elapsed else 0.0,
+        "lag_p50_s": round(percentile(lags, 50), 3),
+        "lag_p99_s": round(percentile(lags, 99), 3),
+        "lag_max_s": round(max(lags, default=0), 3),
+    }
+
+
+def _print_comparison(result, baseline):
+    print(f"\n{'':<16}{'baseline':>12}{'current':>12}{'change':>10}")
+    for key in ("tweets_per_min", "lag_p50_s", "lag_p99_s", "peak_rss_mb"):
+        before, after = baseline[key], result[key]
+        change = f"{(after - before) / before * 100:+.1f}%" if before else "-"
+        print(f"{key:<16}{before:>12}{after:>12}{change:>10}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--accounts", type=int, default=50)
+    parser.add_argument("--tweets", type=int, default=1000)
+    parser.add_argument("--image-ratio", type=float, default=0.2, help="画像付きツイートの割合")
+    parser.add_argument("--images-per-tweet", type=int, default=1, choices=range(1, IMAGES_PER_ACCOUNT + 1))
+    parser.add_argument("--spread", type=float, default=0, help="予約時刻を散らす秒数（0 なら全件が開始時点で期限切れ）")
+    parser.add_argument("--workers", type=int, default=8, help="SCHEDULER_MAX_WORKERS")
+    parser.add_argument("--latency-ms", type=int, default=50, help="POST /2/tweets の応答時間")
+    parser.add_argument("--upload-latency-ms", type=int, default=100, help="画像アップロードの応答時間")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="5xx を返す割合")
+    parser.add_argument("--rate-limit-rate", type=float, default=0.0, help="429 を返す割合")
+    parser.add_argument("--rate-limit-reset", type=int, default=1, help="429 のリセットまでの秒数")
+    parser.add_argument("--retry-delay", type=float, default=2, help="失敗時の再試行までの秒数（本番は60秒）")
+    parser.add_argument("--timeout", type=float, default=600)
+    parser.add_argument("--verbose", action="store_true", help="スケジューラーのログを表示する")
+    parser.add_argument("--json", help="結果を JSON で書き出すファイル")
+    parser.add_argument("--baseline", help="比較する前回の結果（--json で書き出したファイル）")
+    args = parser.parse_args()
+    # 作業ディレクトリを移すので、結果のファイルは呼び出し時の場所で解決しておく
+    for name in ("json", "baseline"):
+        if getattr(args, name):
+            setattr(args, name, os.path.abspath(getattr(args, name)))
+
+    # レート制限はもどきのサーバーのヘッダー（と 429）に任せる
+    os.environ["SCHEDULER_MAX_WORKERS"] = str(args.workers)
+    for name in ("X_USER_TWEET_LIMIT", "X_USER_DAILY_TWEET_LIMIT", "X_APP_TWEET_LIMIT"):
+        os.environ[name] = "1000000"
+    db_path = setup_environment()
+    # 画像は一時ディレクトリの static/uploads に置く（リポジトリを汚さない）
+    workdir = tempfile.mkdtemp(prefix="xbm-bench-")
+    os.chdir(workdir)
+
+    import models
+    from services import scheduler
+    from services.status_writer import status_writer
+
+    if not args.verbose:
+        logging.disable(logging.ERROR)
+    scheduler.RETRY_DELAY = timedelta(seconds=args.retry_delay)
+
+    server = FakeXServer(
+        latency_ms=args.latency_ms,
+        upload_latency_ms=args.upload_latency_ms,
+        error_rate=args.error_rate,
+        rate_limit_rate=args.rate_limit_rate,
+        rate_limit_reset=args.rate_limit_reset,
+    ).start()
+    route_requests_to(server.url)
+
+    models.create_db_and_tables()
+    try:
+        print(f"{args.accounts:,}アカウント・{args.tweets:,}件のツイートを投入しています...")
+        _seed(models, args, datetime.now())
+        rss_before = _peak_rss_mb()
+
+        started = time.perf_counter()
+        scheduler._dispatch_loop.start()
+        deadline = started + args.timeout + args.spread
+        while _remaining(models) and time.perf_counter() < deadline:
+            time.sleep(0.2)
+        status_writer.flush()
+        finished = time.perf_counter()
+
+        result = _collect(models, started, finished)
+        result["peak_rss_mb"] = round(_peak_rss_mb(), 1)
+        result["rss_growth_mb"] = round(result["peak_rss_mb"] - rss_before, 1)
+        result["x_api"] = dict(server.stats)
+    finally:
+        server.stop()
+        models.engine.dispose()
+        models.read_engine.dispose()
+        os.chdir(REPO_ROOT)
+        shutil.rmtree(workdir, ignore_errors=True)
+        for suffix in ("", "-wal", "-shm"):
+            if os.path.exists(db_path + suffix):
+                os.remove(db_path + suffix)
+
+    print(
+        f"\n{'posted':>8}{'failed':>8}{'retries':>9}{'elapsed (s)':>13}{'tweets/min':>12}"
+        f"{'lag p50 (s)':>13}{'lag p99 (s)':>13}{'peak RSS (MB)':>15}"
+    )
+    print(
+        f"{result['posted']:>8}{result['failed']:>8}{result['retries']:>9}{result['elapsed_s']:>13.2f}"
+        f"{result['tweets_per_min']:>12.1f}{result['lag_p50_s']:>13.3f}{result['lag_p99_s']:>13.3f}"
+        f"{result['peak_rss_mb']:>15.1f}"
+    )
+    print(f"X API: {result['x_api']}")
+    if result["unfinished"]:
+        print(f"タイムアウトまでに処理されなかったツイート: {result['unfinished']}件")
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            _print_comparison(result, json.load(f)["result"])
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump({"args": vars(args), "result": result}, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
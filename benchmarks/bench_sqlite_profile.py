@@ -0,0 +1,201 @@
+# benchmarks/bench_sqlite_profile.py
+"""
+SQLite の性能プロファイル（DB_PROFILE）ごとに、投稿処理中の読み取りの応答時間を測るベンチマーク。
+
+書き込みスレッドがスケジューラーと同じ流れ（リース取得 → in_flight → posted）で
+投稿待ちのツイートを処理し続ける間、読み取りスレッドがダッシュボード・一覧のクエリを
+読み取り用の接続で実行する。プロファイルは import 時に決まるため、それぞれ子プロセスで測る。
+
+    python benchmarks/bench_sqlite_profile.py
+    python benchmarks/bench_sqlite_profile.py --rows 500000 --writers 8 --readers 8 --seconds 20
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import threading
+import time
+from datetime import datetime
+
+from common import percentile, seed_database, setup_environment
+
+PROFILES = ("compat", "performance")
+
+
+def _writer(stop, stats, lock):
+    """スケジューラーの代わりに、期限の来たツイートを投稿済みにし続ける"""
+    from models import TWEET_IN_FLIGHT, TWEET_POSTED
+    from services.dispatch_queue import claim_due_tweets
+    from services.status_writer import status_writer
+
+    while not stop.is_set():
+        try:
+            token, claimed = claim_due_tweets(limit=20)
+        except Exception:
+            with lock:
+                stats["write_errors"] += 1
+            continue
+        if not claimed:
+            break
+        for tweet_id, _ in claimed:
+            if stop.is_set():
+                break
+            try:
+                # 送信前の in_flight はコミットを待ち、posted はまとめて書き込む
+                status_writer.write(tweet_id, {"status": TWEET_IN_FLIGHT}, lease_owner=token)
+                status_writer.submit(
+                    tweet_id,
+                    {
+                        "status": TWEET_POSTED,
+                        "is_posted": True,
+                        "posted_at": datetime.now(),
+                        "lease_owner": None,
+                        "lease_expires_at": None,
+                    },
+                    lease_owner=token,
+                )
+                with lock:
+                    stats["posted"] += 1
+            except Exception:
+                with lock:
+                    stats["write_errors"] += 1
+
+
+def _reader(stop, latencies, stats, lock, account_ids):
+    """ダッシュボード・一覧・件数のクエリを読み取り用の接続で繰り返す"""
+    from sqlmodel import Session
+    from models import TWEET_PENDING, read_engine
+    from main import (
+        _account_summary_statement,
+        _tweet_counts_statement,
+        _tweet_page_statement,
+    )
+
+    queries = [
+        lambda session, account_id: session.exec(
+            _account_summary_statement(datetime.now())
+        ).all(),
+        lambda session, account_id: session.exec(
+            _tweet_page_statement(account_id, [TWEET_PENDING], None, 20)
+        ).all(),
+        lambda session, account_id: session.exec(
+            _tweet_counts_statement(account_id)
+        ).all(),
+    ]
+    i = 0
+    while not stop.is_set():
+        query = queries[i % len(queries)]
+        account_id = account_ids[i % len(account_ids)]
+        i += 1
+        start = time.perf_counter()
+        try:
+            with Session(read_engine) as session:
+                query(session, account_id)
+        except Exception:
+            with lock:
+                stats["read_errors"] += 1
+            continue
+        elapsed = (time.perf_counter() - start) * 1000
+        with lock:
+            latencies.append(elapsed)
+
+
+def _run_profile(args):
+    """子プロセス: 指定のプロファイルで測定し、結果を JSON で標準出力に書く"""
+    os.environ["DB_PROFILE"] = args.child
+    db_path = setup_environment()
+    import models
+
+    models.create_db_and_tables()
+    try:
+        seed_database(
+            models.engine,
+            accounts=args.accounts,
+            tweets=args.rows,
+            due_now=args.rows // 4,
+        )
+        stop = threading.Event()
+        lock = threading.Lock()
+        latencies = []
+        stats = {"posted": 0, "write_errors": 0, "read_errors": 0}
+        account_ids = list(range(1, args.accounts + 1))
+        threads = [
+            threading.Thread(target=_writer, args=(stop, stats, lock))
+            for _ in range(args.writers)
+        ] + [
+            threading.Thread(
+                target=_reader, args=(stop, latencies, stats, lock, account_ids[i::args.readers])
+            )
+            for i in range(args.readers)
+        ]
+        for thread in threads:
+            thread.start()
+        time.sleep(args.seconds)
+        stop.set()
+        for thread in threads:
+            thread.join()
+    finally:
+        models.engine.dispose()
+        models.read_engine.dispose()
+        for suffix in ("", "-wal", "-shm"):
+            if os.path.exists(db_path + suffix):
+                os.remove(db_path + suffix)
+
+    result = {
+        "reads": len(latencies),
+        "read_p50_ms": round(percentile(latencies, 50), 2),
+        "read_p95_ms": round(percentile(latencies, 95), 2),
+        "read_p99_ms": round(percentile(latencies, 99), 2),
+        "read_max_ms": round(max(latencies, default=0), 2),
+        "posted_per_sec": round(stats["posted"] / args.seconds, 1),
+        **stats,
+    }
+    print(json.dumps(result))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--rows", type=int, default=200_000)
+    parser.add_argument("--accounts", type=int, default=200)
+    parser.add_argument("--writers", type=int, default=4, help="投稿処理のスレッド数")
+    parser.add_argument("--readers", type=int, default=4, help="読み取りのスレッド数")
+    parser.add_argument("--seconds", type=float, default=10)
+    parser.add_argument("--profiles", default=",".join(PROFILES))
+    parser.add_argument("--json", help="結果を JSON で書き出すファイル")
+    parser.add_argument("--child", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        _run_profile(args)
+        return
+
+    results = {}
+    for profile in args.profiles.split(","):
+        print(f"{profile}: {args.rows:,}件を投入して{args.seconds:g}秒間測定しています...")
+        output = subprocess.run(
+            [sys.executable, os.path.abspath(__file__), *sys.argv[1:], "--child", profile],
+            check=True,
+            capture_output=True,
+            text=True,
+        ).stdout
+        results[profile] = json.loads(output.strip().splitlines()[-1])
+
+    print(
+        f"\n{'profile':<13}{'reads':>8}{'p50 (ms)':>10}{'p95 (ms)':>10}{'p99 (ms)':>10}"
+        f"{'max (ms)':>10}{'posted/s':>10}{'errors':>8}"
+    )
+    for profile, r in results.items():
+        print(
+            f"{profile:<13}{r['reads']:>8}{r['read_p50_ms']:>10.2f}{r['read_p95_ms']:>10.2f}"
+            f"{r['read_p99_ms']:>10.2f}{r['read_max_ms']:>10.2f}{r['posted_per_sec']:>10.1f}"
+            f"{r['read_errors'] + r['write_errors']:>8}"
+        )
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump({"args": vars(args), "results": results}, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
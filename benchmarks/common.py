@@ -0,0 +1,133 @@
+# benchmarks/common.py
+"""ベンチマーク共通の処理（一時 DB の準備とテストデータの投入）"""
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def setup_environment(db_path=None):
+    """
+    リポジトリのモジュールを読み込む前に呼ぶ。
+    一時ファイルの SQLite を DATABASE_URL に設定し、DB ファイルのパスを返す。
+    """
+    if db_path is None:
+        fd, db_path = tempfile.mkstemp(prefix="xbm-bench-", suffix=".db")
+        os.close(fd)
+        os.remove(db_path)
+    os.environ["DATABASE_URL"] = f"sqlite:///{db_path}"
+    if not os.getenv("ENCRYPTION_KEY"):
+        from cryptography.fernet import Fernet
+
+        os.environ["ENCRYPTION_KEY"] = Fernet.generate_key().decode()
+    if REPO_ROOT not in sys.path:
+        sys.path.insert(0, REPO_ROOT)
+    os.chdir(REPO_ROOT)
+    return db_path
+
+
+def seed_database(
+    engine,
+    accounts=1000,
+    tweets=1_000_000,
+    posted_ratio=0.9,
+    failed_ratio=0.01,
+    due_now=0,
+    batch_size=20_000,
+    seed=0,
+):
+    """
+    アカウントとツイートを一括投入する。
+    - 投稿済み: 過去1年に分散
+    - 失敗: 過去30日に分散
+    - 投稿待ち: 今後30日に分散（due_now 件は現在時刻より前＝すぐ投稿対象）
+    """
+    from sqlalchemy import insert
+    from models import (
+        Account,
+        Tweet,
+        TWEET_PENDING,
+        TWEET_POSTED,
+        TWEET_FAILED,
+    )
+    from services.encryption import encrypt_data
+
+    rng = random.Random(seed)
+    now = datetime.now()
+    secret = encrypt_data("bench")
+
+    with engine.begin() as conn:
+        conn.execute(
+            insert(Account),
+            [
+                {
+                    "name": f"bench-{i}",
+                    "api_key": secret,
+                    "api_secret": secret,
+                    "access_token": secret,
+                    "access_token_secret": secret,
+                }
+                for i in range(accounts)
+            ],
+        )
+
+    rows = []
+    for i in range(tweets):
+        account_id = rng.randint(1, accounts)
+        roll = rng.random()
+        if i < due_now:
+            status = TWEET_PENDING
+            scheduled_at = now - timedelta(seconds=rng.randint(0, 60))
+        elif roll < posted_ratio:
+            status = TWEET_POSTED
+            scheduled_at = now - timedelta(minutes=rng.randint(1, 365 * 24 * 60))
+        elif roll < posted_ratio + failed_ratio:
+            status = TWEET_FAILED
+            scheduled_at = now - timedelta(minutes=rng.randint(1, 30 * 24 * 60))
+        else:
+            status = TWEET_PENDING
+            scheduled_at = now + timedelta(minutes=rng.randint(1, 30 * 24 * 60))
+        rows.append(
+            {
+                "account_id": account_id,
+                "content": f"benchmark tweet {i}",
+                "image_names": "[]",
+                "status": status,
+                "is_posted": status == TWEET_POSTED,
+                "is_failed": status == TWEET_FAILED,
+                "retry_count": 3 if status == TWEET_FAILED else 0,
+                "scheduled_at": scheduled_at,
+                "posted_at": scheduled_at if status == TWEET_POSTED else None,
+            }
+        )
+        if len(rows) >= batch_size:
+            with engine.begin() as conn:
+                conn.execute(insert(Tweet), rows)
+            rows = []
+    if rows:
+        with engine.begin() as conn:
+            conn.execute(insert(Tweet), rows)
+
+
+def time_call(func, repeat=5):
+    """func を repeat 回実行し、所要時間（ミリ秒）の中央値と最大値を返す"""
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        samples.append((time.perf_counter() - start) * 1000)
+    return statistics.median(samples), max(samples)
+
+
+def percentile(samples, p):
+    """p パーセンタイル（0〜100）"""
+    if not samples:
+        return 0.0
+    ordered = sorted(samples)
+    k = min(len(ordered) - 1, max(0, round(p / 100 * (len(ordered) - 1))))
+    return ordered[k]
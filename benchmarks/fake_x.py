@@ -0,0 +1,234 @@
+# benchmarks/fake_x.py
+"""
+ベンチマーク用のローカルの X API もどき。
+
+POST /2/tweets・POST /1.1/media/upload.json（通常・分割アップロード）・GET /2/users/me に
+本物と同じ形の JSON とレート制限ヘッダーを返す。応答の遅延と、5xx エラー・429 の発生率を指定できる。
+route_requests_to() で tweepy（requests）の api/upload.twitter.com 宛ての通信をこのサーバーに向ける。
+
+    python benchmarks/fake_x.py --port 8765 --latency-ms 80 --error-rate 0.01
+"""
+import argparse
+import json
+import random
+import re
+import threading
+import time
+from collections import Counter
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# レート制限ヘッダーの残り回数（ベンチマーク中に制限がかからない大きさ）
+UNLIMITED = 1_000_000
+
+
+class FakeXServer:
+    def __init__(
+        self,
+        port=0,
+        latency_ms=50,
+        upload_latency_ms=100,
+        error_rate=0.0,
+        rate_limit_rate=0.0,
+        rate_limit_reset=1,
+        seed=0,
+    ):
+        self.latency = latency_ms / 1000
+        self.upload_latency = upload_latency_ms / 1000
+        self.error_rate = error_rate
+        self.rate_limit_rate = rate_limit_rate
+        self.rate_limit_reset = rate_limit_reset
+        self.stats = Counter()
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+        self._next_id = 1_000_000
+        self._server = ThreadingHTTPServer(("127.0.0.1", port), _handler(self))
+        self._server.daemon_threads = True
+        self._thread = None
+
+    @property
+    def url(self):
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self):
+        self._thread = threading.Thread(
+            target=self._server.serve_forever, name="fake-x", daemon=True
+        )
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def next_id(self):
+        with self._lock:
+            self._next_id += 1
+            return self._next_id
+
+    def roll(self):
+        """このリクエストで返す障害（"429" / "5xx" / None）"""
+        with self._lock:
+            value = self._rng.random()
+        if value < self.rate_limit_rate:
+            return "429"
+        if value < self.rate_limit_rate + self.error_rate:
+            return "5xx"
+        return None
+
+    def count(self, name):
+        with self._lock:
+            self.stats[name] += 1
+
+
+def _rate_limit_headers(remaining, reset_in):
+    reset = str(int(time.time()) + reset_in)
+    headers = {}
+    for prefix in ("x-rate-limit", "x-user-limit-24hour", "x-app-limit-24hour"):
+        headers[f"{prefix}-limit"] = str(UNLIMITED)
+        headers[f"{prefix}-remaining"] = str(remaining)
+        headers[f"{prefix}-reset"] = reset
+    return headers
+
+
+def _handler(fake):
+    class Handler(BaseHTTPRequestHandler):
+        # keep-alive（本番と同じくコネクションを使い回す）
+        protocol_version = "HTTP/1.1"
+
+        def log_message(self, format, *args):
+            pass
+
+        def _send(self, status, payload=None, headers=None):
+            body = json.dumps(payload).encode() if payload is not None else b""
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            for name, value in (headers or {}).items():
+                self.send_header(name, value)
+            self.end_headers()
+            self.wfile.write(body)
+
+        def _read_body(self):
+            length = int(self.headers.get("Content-Length") or 0)
+            return self.rfile.read(length) if length else b""
+
+        def _fault(self, endpoint):
+            """障害を注入した場合は応答を返して True"""
+            fault = fake.roll()
+            if fault == "429":
+                fake.count(f"{endpoint}_429")
+                self._send(
+                    429,
+                    {"title": "Too Many Requests", "detail": "Too Many Requests", "status": 429},
+                    _rate_limit_headers(0, fake.rate_limit_reset),
+                )
+                return True
+            if fault == "5xx":
+                fake.count(f"{endpoint}_5xx")
+                self._send(
+                    503,
+                    {"title": "Service Unavailable", "detail": "injected", "status": 503},
+                )
+                return True
+            return False
+
+        def do_GET(self):
+            if self.path.startswith("/2/users/me"):
+                self._send(200, {"data": {"id": "1", "name": "bench", "username": "bench"}})
+            else:
+                self._send(404, {"title": "Not Found", "status": 404})
+
+        def do_POST(self):
+            body = self._read_body()
+            if self.path.startswith("/2/tweets"):
+                time.sleep(fake.latency)
+                if self._fault("tweets"):
+                    return
+                fake.count("tweets")
+                text = (json.loads(body or b"{}").get("text")) or ""
+                tweet_id = str(fake.next_id())
+                self._send(
+                    201,
+                    {"data": {"id": tweet_id, "text": text, "edit_history_tweet_ids": [tweet_id]}},
+                    _rate_limit_headers(UNLIMITED, 900),
+                )
+            elif self.path.startswith("/1.1/media/upload.json"):
+                self._media_upload(body)
+            else:
+                self._send(404, {"title": "Not Found", "status": 404})
+
+        def _media_upload(self, body):
+            # 分割アップロード（INIT / APPEND / FINALIZE）はフォームの command で判別する
+            match = re.search(rb'name="command"\r\n\r\n(\w+)', body) or re.search(
+                rb"command=(\w+)", body + self.path.encode()
+            )
+            command = match.group(1).decode() if match else None
+            if command == "APPEND":
+                self._send(204)
+                return
+            if command != "FINALIZE":
+                # 通常のアップロードと INIT に遅延・障害を入れる
+                time.sleep(fake.upload_latency)
+                if self._fault("media"):
+                    return
+                fake.count("media")
+            media_id = fake.next_id()
+            self._send(
+                200,
+                {
+                    "media_id": media_id,
+                    "media_id_string": str(media_id),
+                    "size": len(body),
+                    "expires_after_secs": 86400,
+                    "image": {"image_type": "image/png", "w": 1, "h": 1},
+                },
+            )
+
+    return Handler
+
+
+def route_requests_to(base_url):
+    """
+    このプロセスの requests による api/upload.(twitter|x).com 宛ての通信を base_url に向ける。
+    OAuth の署名は元の URL で計算済みなので、送信直前に書き換える。
+    """
+    import requests.adapters
+
+    pattern = re.compile(r"^https://(api|upload)\.(twitter|x)\.com")
+    original_send = requests.adapters.HTTPAdapter.send
+
+    def send(self, request, *args, **kwargs):
+        request.url = pattern.sub(base_url, request.url)
+        return original_send(self, request, *args, **kwargs)
+
+    requests.adapters.HTTPAdapter.send = send
+    return original_send
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--latency-ms", type=int, default=50)
+    parser.add_argument("--upload-latency-ms", type=int, default=100)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--rate-limit-rate", type=float, default=0.0)
+    args = parser.parse_args()
+
+    server = FakeXServer(
+        port=args.port,
+        latency_ms=args.latency_ms,
+        upload_latency_ms=args.upload_latency_ms,
+        error_rate=args.error_rate,
+        rate_limit_rate=args.rate_limit_rate,
+    ).start()
+    print(f"fake X API: {server.url}（Ctrl+C で終了）")
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        server.stop()
+
+
+if __name__ == "__main__":
+    main()
@@ -1,19 +1,43 @@
-from fastapi import FastAPI, Depends, HTTPException
+from fastapi import FastAPI, Depends, HTTPException, Request, Response
+from fastapi.responses import PlainTextResponse, StreamingResponse
 from fastapi.staticfiles import StaticFiles  # 追加
-from sqlmodel import Session, select, desc
+from sqlmodel import Session, select, desc, func, and_, or_
+from sqlmodel.ext.asyncio.session import AsyncSession
+from sqlalchemy import delete, insert
 from models import (
     Account,
     Tweet,
+    TweetArchive,
     CSVText,
     HourlySchedule,
+    TWEET_PENDING,
+    TWEET_IN_FLIGHT,
+    TWEET_POSTED,
+    TWEET_FAILED,
+    HAS_DATA_VERSION,
+    engine,
     get_session,
+    get_read_session,
+    get_async_session,
+    get_async_read_session,
+    dispose_engines,
     create_db_and_tables,
 )  # create_db_and_tablesを追加
 from services.encryption import encrypt_data, decrypt_data
 from services.x_service import send_hello_world  # 後ほど作成する関数
+from services.client_pool import get_clients, invalidate as invalidate_clients
+from services.ingest import IngestError, ingest_tweets
+from services.slots import interval_slots, hourly_slots
+from services.allocator import AllocationError, allocate, date_range
+from services.archive import includes_archived
+from services import events, metrics
+from services.assets import AssetFiles, REVALIDATE_CACHE_CONTROL, etag_matches
+from services.compression import CompressionMiddleware
 from datetime import datetime
 from uuid import uuid4
 from typing import List, Optional
+import base64
+import hashlib
 import json
 import tweepy
 
@@ -21,13 +45,71 @@ app = FastAPI()
 
 # スケジューラーの読み込み（あれば）
 try:
-    from services.scheduler import start_scheduler
+    from services.scheduler import (
+        start_scheduler,
+        notify_tweet_scheduled,
+        notify_tweet_removed,
+    )
 
     has_scheduler = True
 except ImportError:
     has_scheduler = False
 
 
+def _notify_scheduled(account_id, tweets):
+    """
+    追加した予約をスケジューラー（予約時刻に合わせて起床させる）と画面（scheduled イベント）に知らせる。
+    tweets は Tweet か (id, scheduled_at) の行。
+    """
+    tweets = list(tweets)
+    if not tweets:
+        return
+    # 件数が少なく内容が手元にあれば、画面がそのまま一覧に差し込めるように送る
+    detailed = len(tweets) <= events.EVENT_MAX_TWEETS and all(
+        isinstance(tweet, Tweet) for tweet in tweets
+    )
+    events.publish(
+        events.EVENT_SCHEDULED,
+        account_id,
+        count=len(tweets),
+        tweets=[events.tweet_fields(tweet) for tweet in tweets] if detailed else None,
+        first_scheduled_at=min(
+            (tweet.scheduled_at for tweet in tweets if tweet.scheduled_at), default=None
+        ),
+    )
+    if not has_scheduler:
+        return
+    for tweet in tweets:
+        notify_tweet_scheduled(tweet.scheduled_at, tweet.id)
+
+
+# ===== 条件付き GET（ETag） =====
+# アカウントごとのデータバージョン（models.Account.data_version）から ETag を作り、
+# 変わっていなければ 304 を返す（本文を作らず、送らない）。
+# 応答の形が変わるデプロイのあとに古いキャッシュを使わせないよう、main.py の内容のハッシュも含める
+with open(__file__, "rb") as _f:
+    API_REVISION = hashlib.sha256(_f.read()).hexdigest()[:8]
+
+
+def _not_modified(request, response, *parts):
+    """
+    parts から作った ETag が If-None-Match と一致すれば 304 の応答を返す。
+    一致しなければ response に ETag を付けて None を返す。
+    """
+    if not HAS_DATA_VERSION or None in parts:
+        return None
+    etag = f'W/"{API_REVISION}-{"-".join(str(part) for part in parts)}"'
+    headers = {"ETag": etag, "Cache-Control": REVALIDATE_CACHE_CONTROL}
+    if etag_matches(request.headers.get("if-none-match"), etag):
+        return Response(status_code=304, headers=headers)
+    response.headers.update(headers)
+    return None
+
+
+def _data_version_statement(account_id):
+    return select(Account.data_version).where(Account.id == account_id)
+
+
 # 起動時にテーブルを作成する（DBが空の場合）
 @app.on_event("startup")
 def on_startup():
@@ -37,39 +119,111 @@ def on_startup():
         start_scheduler()
 
 
-# 1. アカウント一覧取得（ダッシュボード用）
-@app.get("/accounts")
-def list_accounts(session: Session = Depends(get_session)):
-    accounts = session.exec(select(Account)).all()
-    result = []
+@app.on_event("shutdown")
+async def on_shutdown():
+    await dispose_engines()
 
-    for acc in accounts:
-        last_tweet = session.exec(
-            select(Tweet)
-            .where(Tweet.account_id == acc.id, Tweet.is_posted == True)
-            .order_by(desc(Tweet.posted_at))
-        ).first()
 
-        next_tweet = session.exec(
-            select(Tweet)
-            .where(Tweet.account_id == acc.id, Tweet.is_posted == False)
-            .where(Tweet.scheduled_at > datetime.now())
-            .order_by(Tweet.scheduled_at)
-        ).first()
+def _account_summary_statement(now):
+    """ダッシュボード用に、アカウントごとの最終投稿と次回予定を1クエリで取得する"""
 
-        result.append(
-            {
-                "id": acc.id,
-                "name": acc.name,
-                "last_tweet": last_tweet.content if last_tweet else "なし",
-                "next_scheduled": (
-                    next_tweet.scheduled_at.strftime("%m/%d %H:%M")
-                    if next_tweet
-                    else "予定なし"
-                ),
-            }
+    def last_posted(model):
+        posted = select(model.content).where(
+            model.account_id == Account.id, model.is_posted == True
         )
-    return result
+        last_content = (
+            posted.order_by(desc(model.posted_at)).limit(1).correlate(Account).scalar_subquery()
+        )
+        return last_content, posted.correlate(Account).exists()
+
+    # アーカイブ済みの投稿は Tweet に残っている投稿より古いので、Tweet になければ使う
+    last_content, has_posted = last_posted(Tweet)
+    archived_content, has_archived = last_posted(TweetArchive)
+    last_content = func.coalesce(last_content, archived_content)
+    has_posted = or_(has_posted, has_archived)
+    next_scheduled_at = (
+        select(func.min(Tweet.scheduled_at))
+        .where(
+            Tweet.account_id == Account.id,
+            Tweet.is_posted == False,
+            Tweet.scheduled_at > now,
+        )
+        .correlate(Account)
+        .scalar_subquery()
+    )
+    return select(
+        Account.id, Account.name, last_content, has_posted, next_scheduled_at
+    ).order_by(Account.id)
+
+
+# 1. アカウント一覧取得（ダッシュボード用）
+@app.get("/accounts")
+async def list_accounts(
+    request: Request,
+    response: Response,
+    session: AsyncSession = Depends(get_async_read_session),
+):
+    # 全アカウントのデータバージョンが同じなら応答も同じ
+    # （予約時刻を過ぎたツイートはスケジューラーが送信中にした時点でバージョンが上がる）
+    versions = (
+        await session.exec(select(Account.id, Account.data_version).order_by(Account.id))
+    ).all()
+    digest = hashlib.sha256(repr([tuple(row) for row in versions]).encode()).hexdigest()
+    cached = _not_modified(request, response, "accounts", digest[:16])
+    if cached:
+        return cached
+
+    rows = (await session.exec(_account_summary_statement(datetime.now()))).all()
+    return [
+        {
+            "id": account_id,
+            "name": name,
+            "last_tweet": last_content if has_posted else "なし",
+            "next_scheduled": (
+                next_scheduled_at.strftime("%m/%d %H:%M")
+                if next_scheduled_at
+                else "予定なし"
+            ),
+            # 画面がイベントで次回予定を書き換えるときの比較用
+            "next_scheduled_at": next_scheduled_at,
+        }
+        for account_id, name, last_content, has_posted, next_scheduled_at in rows
+    ]
+
+
+# Prometheus 形式のメトリクス
+@app.get("/metrics", response_class=PlainTextResponse)
+async def get_metrics(session: AsyncSession = Depends(get_async_read_session)):
+    # 投稿待ちの件数はスクレイプのたびに (account_id, status) のインデックスで集計する
+    rows = (
+        await session.exec(
+            select(Tweet.account_id, Tweet.status, func.count())
+            .where(Tweet.status.in_([TWEET_PENDING, TWEET_IN_FLIGHT]))
+            .group_by(Tweet.account_id, Tweet.status)
+        )
+    ).all()
+    metrics.PENDING_TWEETS.set_all(
+        {(account_id, status): count for account_id, status, count in rows}
+    )
+    metrics.EVENT_STREAMS.set(events.broker.subscriber_count)
+    return PlainTextResponse(
+        metrics.render(), media_type="text/plain; version=0.0.4; charset=utf-8"
+    )
+
+
+# 画面向けの変更イベント（Server-Sent Events）
+@app.get("/events")
+async def stream_events(request: Request, account_id: Optional[int] = None):
+    """
+    予約の登録・削除と投稿結果を text/event-stream で送る（account_id 指定でそのアカウントの分だけ）。
+    再接続時はブラウザが送る Last-Event-ID 以降を送り直す。
+    """
+    return StreamingResponse(
+        events.broker.stream(account_id, request.headers.get("last-event-id")),
+        media_type="text/event-stream",
+        # プロキシ（nginx・Cloudflare）にバッファさせない
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
 
 
 def _verify_twitter_credentials(
@@ -115,10 +269,18 @@ def save_account(account: Account, session: Session = Depends(get_session)):
 
 # アカウント情報の取得
 @app.get("/accounts/{account_id}")
-def get_account(account_id: int, session: Session = Depends(get_session)):
-    account = session.get(Account, account_id)
+async def get_account(
+    account_id: int,
+    request: Request,
+    response: Response,
+    session: AsyncSession = Depends(get_async_read_session),
+):
+    account = await session.get(Account, account_id)
     if not account:
         raise HTTPException(status_code=404, detail="Account not found")
+    cached = _not_modified(request, response, "account", account_id, account.data_version)
+    if cached:
+        return cached
     # 暗号化されたキーはそのまま返す（セキュリティのため平文に戻さない）
     return {
         "id": account.id,
@@ -168,39 +330,27 @@ def update_account(
 
     session.add(account)
     session.commit()
+    # キャッシュ済みのクライアントを破棄（次回投稿時に新しいキーで作り直す）
+    invalidate_clients(account_id)
     return {"status": "success"}
 
 
 # アカウント削除
 @app.delete("/accounts/{account_id}")
-def delete_account(account_id: int, session: Session = Depends(get_session)):
-    account = session.get(Account, account_id)
+async def delete_account(
+    account_id: int, session: AsyncSession = Depends(get_async_session)
+):
+    account = await session.get(Account, account_id)
     if not account:
         raise HTTPException(status_code=404, detail="Account not found")
 
-    # 紐づくツイートを一括削除
-    tweets = session.exec(
-        select(Tweet).where(Tweet.account_id == account_id)
-    ).all()
-    for tweet in tweets:
-        session.delete(tweet)
-
-    # 紐づく CSV テキストを削除
-    csv_texts = session.exec(
-        select(CSVText).where(CSVText.account_id == account_id)
-    ).all()
-    for ct in csv_texts:
-        session.delete(ct)
-
-    # 紐づくスケジュールを削除
-    schedules = session.exec(
-        select(HourlySchedule).where(HourlySchedule.account_id == account_id)
-    ).all()
-    for s in schedules:
-        session.delete(s)
+    # 紐づくツイート・CSV テキスト・スケジュールを一括削除
+    for model in (Tweet, TweetArchive, CSVText, HourlySchedule):
+        await session.exec(delete(model).where(model.account_id == account_id))
 
-    session.delete(account)
-    session.commit()
+    await session.delete(account)
+    await session.commit()
+    invalidate_clients(account_id)
     return {"status": "success"}
 
 
@@ -212,12 +362,7 @@ def verify_account(account_id: int, session: Session = Depends(get_session)):
         raise HTTPException(status_code=404, detail="Account not found")
 
     try:
-        client = tweepy.Client(
-            consumer_key=decrypt_data(account.api_key),
-            consumer_secret=decrypt_data(account.api_secret),
-            access_token=decrypt_data(account.access_token),
-            access_token_secret=decrypt_data(account.access_token_secret),
-        )
+        client = get_clients(account).client_v2
         me = client.get_me()
         return {
             "status": "ok",
@@ -251,27 +396,195 @@ def test_tweet(account_id: int, session: Session = Depends(get_session)):
 # --- main.py に追加 ---
 
 
+# ツイート一覧の状態フィルタ（pending は送信中も含む）
+TWEET_STATUS_FILTERS = {
+    "pending": [TWEET_PENDING, TWEET_IN_FLIGHT],
+    "posted": [TWEET_POSTED],
+    "failed": [TWEET_FAILED],
+}
+TWEETS_PAGE_SIZE = 20
+TWEETS_MAX_PAGE_SIZE = 200
+
+
+def _encode_cursor(tweet):
+    """ページ末尾のツイートから次ページ用のカーソルを作る"""
+    raw = f"{tweet.scheduled_at.isoformat()}|{tweet.id}"
+    return base64.urlsafe_b64encode(raw.encode()).decode()
+
+
+def _decode_cursor(cursor):
+    try:
+        scheduled_at, tweet_id = base64.urlsafe_b64decode(cursor.encode()).decode().split("|")
+        return datetime.fromisoformat(scheduled_at), int(tweet_id)
+    except (ValueError, UnicodeDecodeError):
+        raise HTTPException(status_code=400, detail="無効なカーソルです")
+
+
+def _parse_status_filter(status):
+    """"pending,failed" のようなカンマ区切りの指定を status 値のリストにする"""
+    statuses = []
+    for name in status.split(","):
+        name = name.strip()
+        if name not in TWEET_STATUS_FILTERS:
+            raise HTTPException(status_code=400, detail=f"無効なステータスです: {name}")
+        statuses.extend(TWEET_STATUS_FILTERS[name])
+    return statuses
+
+
+def _is_ascending(statuses):
+    """投稿待ちを含む一覧は古い順、履歴（投稿済み・失敗のみ）は新しい順"""
+    return TWEET_PENDING in statuses and TWEET_POSTED not in statuses
+
+
+def _tweet_page_statement(account_id, statuses, cursor, limit, model=Tweet):
+    """
+    (scheduled_at, id) のキーセットでページを取得するクエリ。
+    model=TweetArchive でアーカイブ済みの履歴にも同じ条件で使う。
+    """
+    ascending = _is_ascending(statuses)
+    statement = select(model).where(
+        model.account_id == account_id,
+        model.status.in_(statuses),
+        model.scheduled_at != None,
+    )
+    if cursor:
+        cursor_at, cursor_id = _decode_cursor(cursor)
+        if ascending:
+            statement = statement.where(
+                or_(
+                    model.scheduled_at > cursor_at,
+                    and_(model.scheduled_at == cursor_at, model.id > cursor_id),
+                )
+            )
+        else:
+            statement = statement.where(
+                or_(
+                    model.scheduled_at < cursor_at,
+                    and_(model.scheduled_at == cursor_at, model.id < cursor_id),
+                )
+            )
+    if ascending:
+        statement = statement.order_by(model.scheduled_at, model.id)
+    else:
+        statement = statement.order_by(desc(model.scheduled_at), desc(model.id))
+    # 次ページの有無を判定するため1件多く取得する
+    return statement.limit(limit + 1)
+
+
+def _merge_tweet_pages(tweets, archived, statuses):
+    """Tweet と TweetArchive のページを (scheduled_at, id) 順に1つにする"""
+    return sorted(
+        [*tweets, *archived],
+        key=lambda tweet: (tweet.scheduled_at, tweet.id),
+        reverse=not _is_ascending(statuses),
+    )
+
+
+def _tweet_counts_statement(account_id, model=Tweet):
+    return (
+        select(model.status, func.count())
+        .where(model.account_id == account_id)
+        .group_by(model.status)
+    )
+
+
+def _tweet_counts(rows):
+    """状態ごとのツイート件数（_tweet_counts_statement の結果から集計する）"""
+    counts = {name: 0 for name in TWEET_STATUS_FILTERS}
+    for status, count in rows:
+        for name, statuses in TWEET_STATUS_FILTERS.items():
+            if status in statuses:
+                counts[name] += count
+    return counts
+
+
 # 特定のアカウントの投稿一覧（予約＋履歴）を取得
 @app.get("/accounts/{account_id}/tweets")
-def get_account_tweets(account_id: int, session: Session = Depends(get_session)):
-    account = session.get(Account, account_id)
+async def get_account_tweets(
+    account_id: int,
+    request: Request,
+    response: Response,
+    status: Optional[str] = None,
+    cursor: Optional[str] = None,
+    limit: Optional[int] = None,
+    session: AsyncSession = Depends(get_async_read_session),
+):
+    """
+    status / cursor / limit のいずれかを指定するとキーセットページングで返す。
+    - status: pending / posted / failed（カンマ区切りで複数指定可、省略時は全件）
+    - cursor: 前のレスポンスの next_cursor
+    - limit: 1ページの件数（既定20、最大200）
+    何も指定しない場合は従来どおり全件を返す。
+    """
+    account = await session.get(Account, account_id)
     if not account:
         raise HTTPException(status_code=404, detail="Account not found")
+    # ページ・状態ごとに URL が違うので、ETag はアカウントのデータバージョンだけでよい
+    cached = _not_modified(request, response, "tweets", account_id, account.data_version)
+    if cached:
+        return cached
+
+    if status is None and cursor is None and limit is None:
+        # 全ツイートデータ取得（従来の形式）
+        tweets = (
+            await session.exec(
+                select(Tweet)
+                .where(Tweet.account_id == account_id)
+                .order_by(desc(Tweet.scheduled_at))
+            )
+        ).all()
+        archived = (
+            await session.exec(
+                select(TweetArchive).where(TweetArchive.account_id == account_id)
+            )
+        ).all()
+        tweets = sorted(
+            [*tweets, *archived],
+            key=lambda tweet: tweet.scheduled_at or datetime.min,
+            reverse=True,
+        )
+        return {"account_name": account.name, "tweets": tweets}
 
-    # 全ツイートデータ取得
-    tweets = session.exec(
-        select(Tweet)
-        .where(Tweet.account_id == account_id)
-        .order_by(desc(Tweet.scheduled_at))
+    statuses = (
+        _parse_status_filter(status)
+        if status
+        else [s for group in TWEET_STATUS_FILTERS.values() for s in group]
+    )
+    limit = min(max(limit or TWEETS_PAGE_SIZE, 1), TWEETS_MAX_PAGE_SIZE)
+    tweets = (
+        await session.exec(_tweet_page_statement(account_id, statuses, cursor, limit))
     ).all()
+    if includes_archived(statuses):
+        # 履歴はアーカイブ済みの分も同じキーセットで読み、合わせて1ページにする
+        archived = (
+            await session.exec(
+                _tweet_page_statement(account_id, statuses, cursor, limit, TweetArchive)
+            )
+        ).all()
+        tweets = _merge_tweet_pages(tweets, archived, statuses)
+    has_more = len(tweets) > limit
+    tweets = tweets[:limit]
 
-    return {"account_name": account.name, "tweets": tweets}
+    result = {
+        "account_name": account.name,
+        "tweets": tweets,
+        "limit": limit,
+        "next_cursor": _encode_cursor(tweets[-1]) if has_more else None,
+    }
+    # 件数は最初のページでだけ集計する
+    if cursor is None:
+        rows = (await session.exec(_tweet_counts_statement(account_id))).all()
+        rows += (
+            await session.exec(_tweet_counts_statement(account_id, TweetArchive))
+        ).all()
+        result["counts"] = _tweet_counts(rows)
+    return result
 
 
 # 新しいツイートを予約（DBに保存）
 @app.post("/accounts/{account_id}/tweets")
-def schedule_tweet(
-    account_id: int, data: dict, session: Session = Depends(get_session)
+async def schedule_tweet(
+    account_id: int, data: dict, session: AsyncSession = Depends(get_async_session)
 ):
     content = data.get("content", "").strip()
     image_names = data.get("image_names", [])  # リストで受け取る
@@ -297,14 +610,15 @@ def schedule_tweet(
         scheduled_at=scheduled_at,
     )
     session.add(tweet)
-    session.commit()
+    await session.commit()
+    _notify_scheduled(account_id, [tweet])
     return {"status": "success"}
 
 
 # 一括予約ツイート（複数のツイートを一度に予約）
 @app.post("/accounts/{account_id}/bulk-tweets")
-def schedule_bulk_tweets(
-    account_id: int, data: dict, session: Session = Depends(get_session)
+async def schedule_bulk_tweets(
+    account_id: int, data: dict, session: AsyncSession = Depends(get_async_session)
 ):
     """
     複数のツイートを一括予約
@@ -321,7 +635,7 @@ def schedule_bulk_tweets(
         ]
     }
     """
-    account = session.get(Account, account_id)
+    account = await session.get(Account, account_id)
     if not account:
         raise HTTPException(status_code=404, detail="Account not found")
 
@@ -335,7 +649,7 @@ def schedule_bulk_tweets(
             status_code=400, detail="一度に登録できるツイートは150個までです"
         )
 
-    created_count = 0
+    created_tweets = []
     errors = []
 
     for idx, tweet_data in enumerate(tweets_data):
@@ -365,18 +679,21 @@ def schedule_bulk_tweets(
                 scheduled_at=scheduled_at,
             )
             session.add(tweet)
-            created_count += 1
+            created_tweets.append(tweet)
 
         except Exception as e:
             errors.append(f"ツイート{idx+1}: {str(e)}")
 
     # コミット
     try:
-        session.commit()
+        await session.commit()
     except Exception as e:
-        session.rollback()
+        await session.rollback()
         raise HTTPException(status_code=500, detail=f"DB保存エラー: {str(e)}")
 
+    created_count = len(created_tweets)
+    _notify_scheduled(account_id, created_tweets)
+
     # 結果を返す
     result = {
         "status": "success" if created_count > 0 else "failed",
@@ -397,91 +714,251 @@ def schedule_bulk_tweets(
 # これを一番最後に書くことで、/ にアクセスした時に static/index.html を探してくれます
 
 import os
-import shutil
-from fastapi import UploadFile, File
+from fastapi import UploadFile, File, Form
+from fastapi import Request, Response
+from fastapi.responses import FileResponse, JSONResponse, StreamingResponse
+from starlette.concurrency import run_in_threadpool
+from services.assets import IMMUTABLE_CACHE_CONTROL
+from services import image_store
+from services.uploads import (
+    HEADER_SIZE,
+    MAX_GIF_SIZE_BYTES,
+    UploadError,
+    accepted_size,
+    check_header,
+    check_size,
+    copy_upload,
+    fit_to_limit,
+    save_upload,
+)
+from services.derivatives import HAS_PILLOW, get_thumbnail, thumbnail_width
 
 UPLOAD_DIR = "static/uploads"
 
 
+IMAGE_PAGE_SIZE = 60
+IMAGE_PAGE_MAX = 200
+
+
 # アカウントごとの画像一覧を取得
 @app.get("/accounts/{account_id}/images")
-def list_images(account_id: int):
-    path = f"{UPLOAD_DIR}/{account_id}"
-    if not os.path.exists(path):
-        return []
-    return os.listdir(path)
+def list_images(
+    account_id: int,
+    request: Request,
+    response: Response,
+    sort: Optional[str] = None,
+    cursor: Optional[str] = None,
+    limit: Optional[int] = None,
+    session: Session = Depends(get_read_session),
+):
+    """
+    パラメータなしの場合は従来どおり画像名のリスト（アップロード順）を返す。
+    sort / cursor / limit のいずれかを指定すると、メタデータ付きで1ページ分を返す:
+    {"items": [{name, size, width, height, mime_type, uploaded_at, usage_count}], "next_cursor"}
+    """
+    version = session.exec(_data_version_statement(account_id)).first()
+    cached = _not_modified(request, response, "images", account_id, version)
+    if cached:
+        return cached
+
+    if sort is None and cursor is None and limit is None:
+        return image_store.image_names(session, account_id)
+
+    sort = sort or "newest"
+    if sort not in image_store.IMAGE_SORTS:
+        raise HTTPException(
+            status_code=400,
+            detail=f"sort は {' / '.join(image_store.IMAGE_SORTS)} のいずれかです",
+        )
+    limit = min(max(limit or IMAGE_PAGE_SIZE, 1), IMAGE_PAGE_MAX)
+    try:
+        items, next_cursor = image_store.list_page(
+            session, account_id, sort, cursor, limit
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return {"items": items, "next_cursor": next_cursor}
+
+
+# 画像のサムネイル（画像名は内容ごとに一意なので、長期間キャッシュさせる）
+@app.get("/accounts/{account_id}/images/{image_name}/thumb")
+def get_image_thumbnail(
+    account_id: int,
+    image_name: str,
+    request: Request,
+    w: int = 320,
+    session: Session = Depends(get_read_session),
+):
+    source = image_store.image_path(account_id, image_name)
+    if not os.path.isfile(source):
+        raise HTTPException(status_code=404, detail="Image not found")
+    found = image_store.find_image(session, account_id, image_name)
+    if not found:
+        # まだストアに取り込まれていない画像は元画像をそのまま返す
+        return FileResponse(source)
+    _, blob = found
+
+    width = thumbnail_width(w)
+    etag = f'"{blob.sha256[:32]}-{width if HAS_PILLOW else "orig"}"'
+    headers = {"Cache-Control": IMMUTABLE_CACHE_CONTROL, "ETag": etag}
+    if etag_matches(request.headers.get("if-none-match"), etag):
+        return Response(status_code=304, headers=headers)
+
+    path = get_thumbnail(source, blob.sha256, width)
+    if path:
+        return FileResponse(path, media_type="image/webp", headers=headers)
+    # Pillow がない・読み込めない画像の場合は元画像を返す
+    return FileResponse(source, media_type=blob.mime_type, headers=headers)
 
 
 # 画像をアップロード
-ALLOWED_MIME_TYPES = {"image/jpeg", "image/png", "image/gif", "image/webp"}
-MAX_SIZE_BYTES = 5 * 1024 * 1024   # 5MB（通常画像）
-MAX_GIF_SIZE_BYTES = 15 * 1024 * 1024  # 15MB（GIF）
+# multipart 全体の上限（受け付ける画像の最大サイズ＋フォームの区切りなどの余裕）
+MAX_UPLOAD_REQUEST_BYTES = (
+    max(MAX_GIF_SIZE_BYTES, accepted_size("image/jpeg")) + 64 * 1024
+)
+
+
+@app.middleware("http")
+async def reject_oversized_upload(request, call_next):
+    """Content-Length が上限を超えるアップロードは本文を受信する前に断る"""
+    if request.method == "POST" and request.url.path.endswith("/upload"):
+        try:
+            length = int(request.headers.get("content-length", "0"))
+        except ValueError:
+            length = 0
+        if length > MAX_UPLOAD_REQUEST_BYTES:
+            limit_mb = MAX_UPLOAD_REQUEST_BYTES // (1024 * 1024)
+            return JSONResponse(
+                status_code=413,
+                content={"detail": f"ファイルサイズが上限（{limit_mb}MB）を超えています。"},
+            )
+    return await call_next(request)
 
 
 @app.post("/accounts/{account_id}/upload")
 async def upload_image(account_id: int, file: UploadFile = File(...)):
-    # MIME タイプチェック
-    if file.content_type not in ALLOWED_MIME_TYPES:
-        raise HTTPException(
-            status_code=400,
-            detail=f"サポートされていないファイル形式です。JPEG / PNG / GIF / WebP のみ許可されています。",
+    # チャンク単位で保存し、形式（マジックバイト）・サイズはその途中で確認する
+    temp_file = image_store.temp_path()
+    try:
+        size, mime_type, sha256 = await save_upload(file, temp_file)
+        # 上限を超えた画像は（有効なら）再圧縮する
+        size, mime_type, sha256, filename = await run_in_threadpool(
+            fit_to_limit, temp_file, size, mime_type, sha256, file.filename
         )
+    except UploadError as e:
+        raise HTTPException(status_code=400, detail=str(e))
 
-    # ファイルサイズチェック
-    size_limit = MAX_GIF_SIZE_BYTES if file.content_type == "image/gif" else MAX_SIZE_BYTES
-    contents = await file.read()
-    if len(contents) > size_limit:
-        limit_mb = size_limit // (1024 * 1024)
-        raise HTTPException(
-            status_code=400,
-            detail=f"ファイルサイズが上限（{limit_mb}MB）を超えています。",
-        )
+    # 同じ内容の画像は実体を共有する（同じアカウントなら既存の画像名を返す）
+    unique_name = await run_in_threadpool(
+        image_store.add_image,
+        account_id,
+        filename,
+        temp_file,
+        sha256,
+        size,
+        mime_type,
+    )
+    return {"filename": unique_name}
 
-    path = f"{UPLOAD_DIR}/{account_id}"
-    os.makedirs(path, exist_ok=True)  # フォルダがなければ作成
 
-    # ファイル名衝突を避けるためUUIDを付与
-    original_name = file.filename
-    name, ext = os.path.splitext(original_name)
-    safe_ext = ext if ext else ""
-    unique_name = f"{name}_{uuid4().hex}{safe_ext}"
+# ファイル（CSV / NDJSON）からツイートを一括予約
+INGEST_CONTENT_TYPES = {
+    "text/csv": "csv",
+    "application/x-ndjson": "ndjson",
+    "application/jsonl": "ndjson",
+}
+INGEST_EXTENSIONS = {".csv": "csv", ".ndjson": "ndjson", ".jsonl": "ndjson"}
 
-    file_path = os.path.join(path, unique_name)
-    with open(file_path, "wb") as buffer:
-        buffer.write(contents)
 
-    return {"filename": unique_name}
+@app.post("/accounts/{account_id}/tweets/ingest")
+def ingest_tweet_file(
+    account_id: int,
+    file: UploadFile = File(...),
+    format: Optional[str] = None,
+    session: Session = Depends(get_session),
+):
+    """
+    CSV / NDJSON ファイルの行を1行ずつ検証して予約登録する（件数の上限は INGEST_MAX_ROWS）。
+    形式は format（csv / ndjson）、ファイルの拡張子、Content-Type の順に判定する。
+    不正な行はスキップし、行番号付きで errors に返す。
+    """
+    account = session.get(Account, account_id)
+    if not account:
+        raise HTTPException(status_code=404, detail="Account not found")
+
+    ext = os.path.splitext(file.filename or "")[1].lower()
+    fmt = (
+        format
+        or INGEST_EXTENSIONS.get(ext)
+        or INGEST_CONTENT_TYPES.get(file.content_type)
+    )
+    if not fmt:
+        raise HTTPException(
+            status_code=400, detail="ファイル形式（csv / ndjson）を指定してください"
+        )
+
+    try:
+        result = ingest_tweets(
+            session,
+            account_id,
+            file.file,
+            fmt,
+            known_images=set(image_store.image_names(session, account_id)),
+            on_batch=lambda rows: _notify_scheduled(account_id, rows),
+        )
+    except IngestError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    if result["created_count"] == 0:
+        raise HTTPException(status_code=400, detail=result)
+    return result
 
 
 # 予約ツイートを削除（未投稿のみ）
 @app.delete("/accounts/{account_id}/tweets/{tweet_id}")
-def delete_tweet(
-    account_id: int, tweet_id: int, session: Session = Depends(get_session)
+async def delete_tweet(
+    account_id: int, tweet_id: int, session: AsyncSession = Depends(get_async_session)
 ):
-    tweet = session.get(Tweet, tweet_id)
+    # 失敗したツイートはアーカイブ済みのことがある
+    tweet = await session.get(Tweet, tweet_id) or await session.get(TweetArchive, tweet_id)
     if not tweet or tweet.account_id != account_id:
         raise HTTPException(status_code=404, detail="Tweet not found")
     if tweet.is_posted:
         raise HTTPException(status_code=400, detail="投稿済みのツイートは削除できません")
-    session.delete(tweet)
-    session.commit()
+    if tweet.status == TWEET_IN_FLIGHT:
+        raise HTTPException(status_code=400, detail="投稿処理中のツイートは削除できません")
+    await session.delete(tweet)
+    await session.commit()
+    events.publish(
+        events.EVENT_DELETED,
+        account_id,
+        tweet_id=tweet_id,
+        status=tweet.status,
+        scheduled_at=tweet.scheduled_at,
+    )
+    if has_scheduler:
+        notify_tweet_removed(tweet_id)
     return {"status": "success"}
 
 
 # 画像を削除
 @app.delete("/accounts/{account_id}/images/{image_name}")
-def delete_image(account_id: int, image_name: str):
-    file_path = f"{UPLOAD_DIR}/{account_id}/{image_name}"
-    if os.path.exists(file_path):
-        os.remove(file_path)
+def delete_image(
+    account_id: int, image_name: str, session: Session = Depends(get_session)
+):
+    if image_store.find_references(session, account_id, image_name):
+        raise HTTPException(
+            status_code=400, detail="予約中のツイートで使われている画像は削除できません"
+        )
+    if image_store.remove_image(session, account_id, image_name):
         return {"message": "deleted"}
     raise HTTPException(status_code=404, detail="Image not found")
 
 
 # CSVテキストを保存
 @app.post("/accounts/{account_id}/csv-texts")
-def save_csv_texts(
-    account_id: int, data: dict, session: Session = Depends(get_session)
+async def save_csv_texts(
+    account_id: int, data: dict, session: AsyncSession = Depends(get_async_session)
 ):
     """
     CSVから読み込んだテキストをDBに保存（最大100件）
@@ -495,7 +972,7 @@ def save_csv_texts(
 
     # 既存レコードを検索
     statement = select(CSVText).where(CSVText.account_id == account_id)
-    existing = session.exec(statement).first()
+    existing = (await session.exec(statement)).first()
 
     if existing:
         # 更新
@@ -511,18 +988,28 @@ def save_csv_texts(
         )
         session.add(csv_text)
 
-    session.commit()
+    await session.commit()
     return {"message": "saved", "count": len(texts)}
 
 
 # CSVテキストを取得
 @app.get("/accounts/{account_id}/csv-texts")
-def get_csv_texts(account_id: int, session: Session = Depends(get_session)):
+async def get_csv_texts(
+    account_id: int,
+    request: Request,
+    response: Response,
+    session: AsyncSession = Depends(get_async_read_session),
+):
     """
     保存されているCSVテキストを取得
     """
+    version = (await session.exec(_data_version_statement(account_id))).first()
+    cached = _not_modified(request, response, "csv-texts", account_id, version)
+    if cached:
+        return cached
+
     statement = select(CSVText).where(CSVText.account_id == account_id)
-    csv_text = session.exec(statement).first()
+    csv_text = (await session.exec(statement)).first()
 
     if csv_text:
         texts = json.loads(csv_text.texts)
@@ -533,8 +1020,8 @@ def get_csv_texts(account_id: int, session: Session = Depends(get_session)):
 
 # 1件ずつ予約を登録するエンドポイント（メガ予約用）
 @app.post("/accounts/{account_id}/bulk-schedule-single")
-def schedule_single_tweet(
-    account_id: int, data: dict, session: Session = Depends(get_session)
+async def schedule_single_tweet(
+    account_id: int, data: dict, session: AsyncSession = Depends(get_async_session)
 ):
     """
     単一ツイートを予約登録するエンドポイント。
@@ -547,7 +1034,7 @@ def schedule_single_tweet(
     }
     """
 
-    account = session.get(Account, account_id)
+    account = await session.get(Account, account_id)
     if not account:
         raise HTTPException(status_code=404, detail="Account not found")
 
@@ -578,27 +1065,216 @@ def schedule_single_tweet(
 
     session.add(tweet)
     try:
-        session.commit()
+        await session.commit()
     except Exception as exc:  # pragma: no cover - DB例外ハンドリング
-        session.rollback()
+        await session.rollback()
         raise HTTPException(status_code=500, detail=f"DB保存エラー: {exc}")
 
+    _notify_scheduled(account_id, [tweet])
     return {"status": "success"}
 
 
+# ===== メガ予約（画像と予約内容を1リクエストで登録） =====
+MEGA_MAX_TWEETS = 150
+MEGA_INSERT_CHUNK = 50
+
+
+def _parse_mega_spec(raw, session, account_id):
+    """spec（JSON文字列）を検証し、(開始日時, 間隔(分), 時刻リスト, spec) を返す"""
+    try:
+        spec = json.loads(raw)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="spec の JSON が不正です")
+    if not isinstance(spec, dict):
+        raise HTTPException(status_code=400, detail="spec はオブジェクトで指定してください")
+
+    try:
+        start_at = datetime.fromisoformat(spec.get("start_at"))
+    except (TypeError, ValueError):
+        raise HTTPException(status_code=400, detail="無効な開始日時です")
+
+    hours = None
+    interval_minutes = None
+    schedule_id = spec.get("hourly_schedule_id")
+    if schedule_id is not None:
+        schedule = session.get(HourlySchedule, schedule_id)
+        if not schedule or schedule.account_id != account_id:
+            raise HTTPException(status_code=404, detail="Schedule not found")
+        hours = json.loads(schedule.hours)
+    else:
+        try:
+            interval_minutes = int(spec.get("interval_minutes") or 0)
+        except (TypeError, ValueError):
+            interval_minutes = 0
+        if interval_minutes <= 0:
+            raise HTTPException(
+                status_code=400,
+                detail="投稿間隔（interval_minutes）またはスケジュールを指定してください",
+            )
+    return start_at, interval_minutes, hours, spec
+
+
+def _mega_content(spec, index, total):
+    """index 番目のツイート本文（CSV テキスト優先、なければ固定テキスト、通し番号は任意）"""
+    texts = spec.get("texts") or []
+    base = texts[index] if index < len(texts) else (spec.get("text") or "")
+    base = str(base).strip()
+    if spec.get("add_number"):
+        return f"{base} ({index + 1}/{total})" if base else f"({index + 1}/{total})"
+    return base
+
+
+@app.post("/accounts/{account_id}/mega-schedule")
+def mega_schedule(
+    account_id: int,
+    spec: str = Form(...),
+    files: List[UploadFile] = File(default=[]),
+    session: Session = Depends(get_session),
+):
+    """
+    画像のアップロードと予約の登録を1リクエストで行う（メガ予約用）。
+
+    - files: 新しくアップロードする画像（任意）
+    - spec: JSON 文字列
+        {
+            "image_names": ["abc.jpg", "new.png"],  # 既存の画像名、または files のファイル名
+            "start_at": "2025-01-01T10:00",
+            "interval_minutes": 60,                  # または "hourly_schedule_id": 1
+            "texts": ["1件目", "2件目"],             # 任意（CSV テキスト。なければ text）
+            "text": "固定テキスト",
+            "add_number": true                       # 任意（末尾に (1/150) を付ける）
+        }
+
+    画像はディスクへ順に保存し、ツイートは1トランザクションでまとめて登録する。
+    進捗は NDJSON（1行1イベント）で返す:
+        {"stage": "upload", "done": 3, "total": 10}
+        {"stage": "schedule", "done": 50, "total": 150}
+        {"stage": "done", "created_count": 150, "uploaded": [...]}
+        {"stage": "error", "detail": "..."}
+    """
+    account = session.get(Account, account_id)
+    if not account:
+        raise HTTPException(status_code=404, detail="Account not found")
+    start_at, interval_minutes, hours, spec = _parse_mega_spec(spec, session, account_id)
+
+    # 送信された画像はストリームを開く前に検証する（エラーは 400 で返す）
+    for file in files:
+        header = file.file.read(HEADER_SIZE)
+        file.file.seek(0, os.SEEK_END)
+        size = file.file.tell()
+        file.file.seek(0)
+        try:
+            check_size(check_header(header, file.filename), size, file.filename)
+        except UploadError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+
+    uploads = {file.filename: file for file in files}
+    image_names = spec.get("image_names") or [file.filename for file in files]
+    if not isinstance(image_names, list) or not image_names:
+        raise HTTPException(status_code=400, detail="画像を指定してください")
+    if len(image_names) > MEGA_MAX_TWEETS:
+        raise HTTPException(
+            status_code=400,
+            detail=f"一度に予約できるのは{MEGA_MAX_TWEETS}件までです",
+        )
+    existing = set(image_store.image_names(session, account_id))
+    missing = [n for n in image_names if n not in uploads and n not in existing]
+    if missing:
+        raise HTTPException(
+            status_code=400, detail=f"画像が見つかりません: {', '.join(missing)}"
+        )
+
+    total = len(image_names)
+    try:
+        if hours is not None:
+            slots = hourly_slots(start_at, total, hours)
+        else:
+            slots = interval_slots(start_at, total, interval_minutes)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    def progress(**event):
+        return json.dumps(event, ensure_ascii=False) + "\n"
+
+    def run():
+        stored = {}  # 送信されたファイル名 -> 保存後の画像名
+        created_names = []  # このリクエストで新しく作った画像名（既存の画像と同じ内容のものは除く）
+        try:
+            # 1. 画像をストアに保存（チャンク単位でコピーし、全体をメモリに載せない）
+            for done, (filename, file) in enumerate(uploads.items(), 1):
+                temp_file = image_store.temp_path()
+                size, mime_type, sha256 = copy_upload(file.file, temp_file, filename)
+                size, mime_type, sha256, saved_name = fit_to_limit(
+                    temp_file, size, mime_type, sha256, filename
+                )
+                stored[filename], created = image_store.store_image(
+                    account_id, saved_name, temp_file, sha256, size, mime_type
+                )
+                if created:
+                    created_names.append(stored[filename])
+                yield progress(stage="upload", done=done, total=len(uploads))
+
+            # 2. ツイートを1トランザクションで登録
+            rows = [
+                {
+                    "account_id": account_id,
+                    "content": _mega_content(spec, index, total),
+                    "image_names": json.dumps([stored.get(name, name)]),
+                    "is_posted": False,
+                    "scheduled_at": slots[index],
+                    "status": TWEET_PENDING,
+                }
+                for index, name in enumerate(image_names)
+            ]
+            statement = insert(Tweet).returning(Tweet.id, Tweet.scheduled_at)
+            created = []
+            with Session(engine) as db:
+                for start in range(0, total, MEGA_INSERT_CHUNK):
+                    chunk = rows[start : start + MEGA_INSERT_CHUNK]
+                    created.extend(db.execute(statement, chunk).all())
+                    yield progress(stage="schedule", done=len(created), total=total)
+                db.commit()
+        except Exception as e:
+            # ツイートはロールバック済み。一度も使われていない画像は GC で削除されないので、
+            # このリクエストで新しく保存した画像はここで削除する
+            image_store.discard_images(account_id, created_names)
+            yield progress(stage="error", detail=f"予約の登録に失敗しました: {e}")
+            return
+
+        _notify_scheduled(account_id, created)
+        yield progress(
+            stage="done",
+            status="success",
+            created_count=len(created),
+            uploaded=list(stored.values()),
+        )
+
+    return StreamingResponse(run(), media_type="application/x-ndjson")
+
+
 # ===== 時間単位スケジュール設定のCRUD =====
 
 
 # 特定のアカウントのスケジュール設定一覧を取得
 @app.get("/accounts/{account_id}/hourly-schedules")
-def get_hourly_schedules(account_id: int, session: Session = Depends(get_session)):
+async def get_hourly_schedules(
+    account_id: int,
+    request: Request,
+    response: Response,
+    session: AsyncSession = Depends(get_async_read_session),
+):
     """アカウントに紐づくスケジュール設定一覧を取得"""
-    account = session.get(Account, account_id)
+    account = await session.get(Account, account_id)
     if not account:
         raise HTTPException(status_code=404, detail="Account not found")
+    cached = _not_modified(request, response, "hourly", account_id, account.data_version)
+    if cached:
+        return cached
 
-    schedules = session.exec(
-        select(HourlySchedule).where(HourlySchedule.account_id == account_id)
+    schedules = (
+        await session.exec(
+            select(HourlySchedule).where(HourlySchedule.account_id == account_id)
+        )
     ).all()
 
     # JSON文字列をリストに変換して返す
@@ -621,11 +1297,11 @@ def get_hourly_schedules(account_id: int, session: Session = Depends(get_session
 
 # スケジュール設定を新規作成
 @app.post("/accounts/{account_id}/hourly-schedules")
-def create_hourly_schedule(
-    account_id: int, data: dict, session: Session = Depends(get_session)
+async def create_hourly_schedule(
+    account_id: int, data: dict, session: AsyncSession = Depends(get_async_session)
 ):
     """新しいスケジュール設定を作成"""
-    account = session.get(Account, account_id)
+    account = await session.get(Account, account_id)
     if not account:
         raise HTTPException(status_code=404, detail="Account not found")
 
@@ -649,8 +1325,8 @@ def create_hourly_schedule(
     )
 
     session.add(schedule)
-    session.commit()
-    session.refresh(schedule)
+    await session.commit()
+    await session.refresh(schedule)
 
     return {
         "status": "success",
@@ -664,14 +1340,14 @@ def create_hourly_schedule(
 
 # スケジュール設定を更新
 @app.put("/accounts/{account_id}/hourly-schedules/{schedule_id}")
-def update_hourly_schedule(
+async def update_hourly_schedule(
     account_id: int,
     schedule_id: int,
     data: dict,
-    session: Session = Depends(get_session),
+    session: AsyncSession = Depends(get_async_session),
 ):
     """スケジュール設定を更新"""
-    schedule = session.get(HourlySchedule, schedule_id)
+    schedule = await session.get(HourlySchedule, schedule_id)
     if not schedule or schedule.account_id != account_id:
         raise HTTPException(status_code=404, detail="Schedule not found")
 
@@ -693,7 +1369,7 @@ def update_hourly_schedule(
 
     schedule.updated_at = datetime.now()
     session.add(schedule)
-    session.commit()
+    await session.commit()
 
     return {
         "status": "success",
@@ -707,21 +1383,91 @@ def update_hourly_schedule(
 
 # スケジュール設定を削除
 @app.delete("/accounts/{account_id}/hourly-schedules/{schedule_id}")
-def delete_hourly_schedule(
-    account_id: int, schedule_id: int, session: Session = Depends(get_session)
+async def delete_hourly_schedule(
+    account_id: int, schedule_id: int, session: AsyncSession = Depends(get_async_session)
 ):
     """スケジュール設定を削除"""
-    schedule = session.get(HourlySchedule, schedule_id)
+    schedule = await session.get(HourlySchedule, schedule_id)
     if not schedule or schedule.account_id != account_id:
         raise HTTPException(status_code=404, detail="Schedule not found")
 
-    session.delete(schedule)
-    session.commit()
+    await session.delete(schedule)
+    await session.commit()
 
     return {"status": "success", "message": "スケジュール設定を削除しました"}
 
 
+# スケジュールの空き枠にまとめて予約する
+@app.post("/accounts/{account_id}/hourly-schedules/{schedule_id}/allocate")
+def allocate_hourly_schedule(
+    account_id: int,
+    schedule_id: int,
+    data: dict,
+    session: Session = Depends(get_session),
+):
+    """
+    期間内のスケジュールの枠のうち、投稿待ちのツイートがない枠に順に予約を登録する。
+    リクエストボディ:
+    {
+        "start_date": "2025-01-01",
+        "end_date": "2025-01-31",       # この日まで（両端を含む）
+        "source": "csv",                # csv: 保存済みの CSV テキスト / images: 画像1枚につき1件
+        "image_names": ["a.jpg"],       # images の場合（省略時はすべての画像）
+        "text": "固定テキスト",          # images で CSV テキストが足りない場合の本文
+        "dry_run": false                # true なら登録せず割り当て予定の枠だけ返す
+    }
+    """
+    schedule = session.get(HourlySchedule, schedule_id)
+    if not schedule or schedule.account_id != account_id:
+        raise HTTPException(status_code=404, detail="Schedule not found")
+    if not schedule.is_active:
+        raise HTTPException(status_code=400, detail="無効化されたスケジュールです")
+
+    source = data.get("source", "csv")
+    image_names = None
+    if source == "images":
+        known = image_store.image_names(session, account_id)
+        image_names = data.get("image_names") or known
+        if not isinstance(image_names, list):
+            raise HTTPException(status_code=400, detail="image_names はリストで指定してください")
+        missing = set(image_names) - set(known)
+        if missing:
+            raise HTTPException(
+                status_code=400, detail=f"画像が見つかりません: {', '.join(sorted(missing))}"
+            )
+
+    try:
+        start_at, end_at = date_range(data.get("start_date"), data.get("end_date"))
+        result = allocate(
+            session,
+            account_id,
+            json.loads(schedule.hours),
+            start_at,
+            end_at,
+            source,
+            image_names=image_names,
+            text=data.get("text", ""),
+            dry_run=bool(data.get("dry_run")),
+        )
+    except AllocationError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    _notify_scheduled(account_id, result["created"])
+    slots = result["slots"]
+    return {
+        "status": "success",
+        "created_count": len(result["created"]),
+        "skipped_taken": result["skipped"],
+        "first_slot": slots[0] if slots else None,
+        "last_slot": slots[-1] if slots else None,
+        "slots": slots if data.get("dry_run") else None,
+    }
+
+
 # 静的ファイルの配信設定（ディレクトリがなければ作成）
 os.makedirs("static/uploads", exist_ok=True)
 app.mount("/uploads", StaticFiles(directory="static/uploads"), name="uploads")
-app.mount("/", StaticFiles(directory="static", html=True), name="static")
+app.mount("/", AssetFiles(directory="static", html=True), name="static")
+
+# JSON・テキストの応答を圧縮する（静的ファイルは圧縮済みのものを返すのでそのまま）
+app.add_middleware(CompressionMiddleware)
@@ -1,14 +1,119 @@
 from datetime import datetime
+from sqlalchemy import Index, event, inspect, text
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import create_async_engine
 from sqlmodel import Field, SQLModel, create_engine, Session, select
+from sqlmodel.ext.asyncio.session import AsyncSession
 from typing import Optional
 import os
+import time
+
+from services.metrics import instrument_engine
 
 sqlite_url = os.getenv("DATABASE_URL", "sqlite:///./database.db")
-engine = create_engine(sqlite_url, echo=True, connect_args={"check_same_thread": False})
+
+# 実行した SQL をすべてログに出す（開発時のみ）
+SQL_ECHO = os.getenv("SQL_ECHO", "0") == "1"
+
+# ===== SQLite の性能プロファイル =====
+# performance（既定）: WAL・synchronous=NORMAL などを設定し、API の読み取りはスケジューラーの
+#   書き込みとは別の接続（query_only）で行う。WAL では読み取りが書き込みトランザクションを待たない
+# compat: SQLite の既定値のまま、読み書きとも同じ接続を使う（従来の動作）
+DB_PROFILE = os.getenv("DB_PROFILE", "performance")
+
+SQLITE_PROFILES = {
+    "compat": {},
+    "performance": {
+        "journal_mode": "WAL",
+        "synchronous": "NORMAL",
+        "busy_timeout": int(os.getenv("SQLITE_BUSY_TIMEOUT_MS", "5000")),
+        "mmap_size": int(os.getenv("SQLITE_MMAP_SIZE", str(256 * 1024 * 1024))),
+        # 負の値は KiB 単位
+        "cache_size": -int(os.getenv("SQLITE_CACHE_SIZE_KB", "65536")),
+        "temp_store": "MEMORY",
+    },
+}
+if DB_PROFILE not in SQLITE_PROFILES:
+    raise ValueError(f"DB_PROFILE は {' / '.join(SQLITE_PROFILES)} のいずれかです: {DB_PROFILE}")
+
+# async のエンドポイント用（同じ DB を非同期ドライバで開く）
+ASYNC_DRIVERS = {"sqlite": "sqlite+aiosqlite", "postgresql": "postgresql+asyncpg"}
+
+
+# async のエンジンごとの接続数（足りない分は接続が空くのをイベントループ上で待つ）
+ASYNC_POOL_SIZE = int(os.getenv("ASYNC_DB_POOL_SIZE", "2"))
+ASYNC_POOL_MAX_OVERFLOW = int(os.getenv("ASYNC_DB_MAX_OVERFLOW", "0"))
+
+
+def _async_url(url):
+    """DATABASE_URL のドライバを非同期版に置き換える（ASYNC_DATABASE_URL があればそれを使う）"""
+    url = make_url(url)
+    return url.set(drivername=ASYNC_DRIVERS.get(url.drivername, url.drivername))
+
+
+_url = make_url(sqlite_url)
+IS_SQLITE = _url.get_backend_name() == "sqlite"
+# 読み取り専用の接続を分けるか（インメモリ DB は接続ごとに別の DB になるため分けない）
+SPLIT_READS = (
+    IS_SQLITE and DB_PROFILE != "compat" and _url.database not in (None, "", ":memory:")
+)
+
+
+def _sqlite_pragmas(read_only):
+    pragmas = dict(SQLITE_PROFILES[DB_PROFILE])
+    if read_only:
+        # journal_mode の変更は書き込みになるため、query_only は最後に設定する
+        pragmas["query_only"] = "ON"
+    return pragmas
+
+
+def _pragma_listener(pragmas):
+    def set_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        for name, value in pragmas.items():
+            cursor.execute(f"PRAGMA {name}={value}")
+        cursor.close()
+
+    return set_pragmas
+
+
+def _create_engines(read_only=False):
+    """(同期エンジン, 非同期エンジン) を作り、SQLite なら接続ごとにプロファイルの PRAGMA を設定する"""
+    sync_engine = create_engine(
+        sqlite_url,
+        echo=SQL_ECHO,
+        connect_args={"check_same_thread": False} if IS_SQLITE else {},
+    )
+    async_engine = create_async_engine(
+        os.getenv("ASYNC_DATABASE_URL") or _async_url(sqlite_url),
+        echo=SQL_ECHO,
+        # aiosqlite は接続ごとにスレッドを1つ使うので、接続数の上限がそのままスレッド数の上限になる
+        pool_size=ASYNC_POOL_SIZE,
+        max_overflow=ASYNC_POOL_MAX_OVERFLOW,
+    )
+    if IS_SQLITE:
+        listener = _pragma_listener(_sqlite_pragmas(read_only))
+        event.listen(sync_engine, "connect", listener)
+        event.listen(async_engine.sync_engine, "connect", listener)
+    # SQL の実行時間を /metrics に記録する
+    for e in (sync_engine, async_engine.sync_engine):
+        instrument_engine(e, "read" if read_only else "write")
+    return sync_engine, async_engine
+
+
+# 書き込み用（スケジューラー・マイグレーション・書き込みを伴うエンドポイント）
+engine, async_engine = _create_engines()
+# 読み取り専用（一覧・ダッシュボードなどの GET）
+if SPLIT_READS:
+    read_engine, async_read_engine = _create_engines(read_only=True)
+else:
+    read_engine, async_read_engine = engine, async_engine
 
 
 def create_db_and_tables():
     SQLModel.metadata.create_all(engine)
+    # 既存の DB には、まだ適用していないマイグレーションを順に適用する
+    run_migrations()
 
 
 def get_session():
@@ -16,6 +121,29 @@ def get_session():
         yield session
 
 
+def get_read_session():
+    with Session(read_engine) as session:
+        yield session
+
+
+async def get_async_session():
+    # コミット後に属性を読み直さない（レスポンスの組み立て時に暗黙の I/O が走らないように）
+    async with AsyncSession(async_engine, expire_on_commit=False) as session:
+        yield session
+
+
+async def get_async_read_session():
+    async with AsyncSession(async_read_engine) as session:
+        yield session
+
+
+async def dispose_engines():
+    for e in {async_engine, async_read_engine}:
+        await e.dispose()
+    for e in {engine, read_engine}:
+        e.dispose()
+
+
 class Account(SQLModel, table=True):
     id: Optional[int] = Field(default=None, primary_key=True)
     name: str
@@ -23,10 +151,43 @@ class Account(SQLModel, table=True):
     api_secret: str
     access_token: str
     access_token_secret: str
+    # アカウントのデータ（ツイート・画像・CSVテキスト・スケジュール設定）が変わるたびに
+    # トリガーで 1 増える。API の ETag に使う。アカウントを削除して同じ id が使われても
+    # 値が重ならないように、作成時刻（ミリ秒）から数え始める
+    data_version: Optional[int] = Field(default_factory=lambda: int(time.time() * 1000))
+
+
+# --- 投稿処理の状態（pending → in_flight → posted / failed） ---
+TWEET_PENDING = "pending"  # 投稿待ち（リトライ待ちを含む）
+TWEET_IN_FLIGHT = "in_flight"  # X へ送信中（結果が確定していない）
+TWEET_POSTED = "posted"  # 投稿済み
+TWEET_FAILED = "failed"  # 失敗（リトライ上限、または送信中に中断され結果不明）
 
 
 # --- 投稿データ（これが "posted db" の役割を兼ねます） ---
 class Tweet(SQLModel, table=True):
+    __table_args__ = (
+        # スケジューラー: 投稿待ちの取得・起床時刻の読み込み・事前アップロード
+        Index("ix_tweet_status_scheduled_at", "status", "scheduled_at"),
+        # アカウント詳細: 状態ごとの一覧（キーセットページング）と件数
+        Index(
+            "ix_tweet_account_status_scheduled_at",
+            "account_id",
+            "status",
+            "scheduled_at",
+            "id",
+        ),
+        # ダッシュボード: 最終投稿と次回予定
+        Index("ix_tweet_account_posted_at", "account_id", "is_posted", "posted_at"),
+        Index(
+            "ix_tweet_account_scheduled_at", "account_id", "is_posted", "scheduled_at"
+        ),
+        # リースの取得結果の読み出し・解放
+        Index("ix_tweet_lease_owner", "lease_owner"),
+        # 削除・アーカイブした行の id を再利用しない（TweetArchive と id が重ならないように）
+        {"sqlite_autoincrement": True},
+    )
+
     id: Optional[int] = Field(default=None, primary_key=True)
     account_id: int
     content: Optional[str] = Field(default="")  # テキストはオプション
@@ -36,6 +197,42 @@ class Tweet(SQLModel, table=True):
     posted_at: Optional[datetime] = None  # 実際の投稿日時
     retry_count: int = Field(default=0)  # リトライ回数
     is_failed: bool = Field(default=False)  # 3回失敗で True（無限リトライ防止）
+    media_ids: Optional[str] = None  # 事前アップロード済みの media_id（JSON配列）
+    media_expires_at: Optional[datetime] = None  # 事前アップロードした media_id の有効期限
+    lease_owner: Optional[str] = None  # 投稿処理中のワーカー（リース保持者）
+    lease_expires_at: Optional[datetime] = None  # リースの有効期限（過ぎたら他のワーカーが再取得できる）
+    status: Optional[str] = Field(default=TWEET_PENDING)  # 投稿処理の状態（is_posted / is_failed と連動）
+    next_attempt_at: Optional[datetime] = None  # 再試行・レート制限で延期した場合、次に取得できる時刻
+
+
+# --- 保存期間を過ぎた投稿済み・失敗ツイート（services/archive.py が Tweet から移す） ---
+# id は Tweet のものを引き継ぐ（Tweet は AUTOINCREMENT なので重ならない）。
+# 投稿処理用のカラム（media_ids・リース）は持たない
+class TweetArchive(SQLModel, table=True):
+    __table_args__ = (
+        # アカウント詳細の履歴（キーセットページング）と件数
+        Index(
+            "ix_tweetarchive_account_status_scheduled_at",
+            "account_id",
+            "status",
+            "scheduled_at",
+            "id",
+        ),
+        # ダッシュボード: 最終投稿
+        Index("ix_tweetarchive_account_posted_at", "account_id", "is_posted", "posted_at"),
+    )
+
+    id: Optional[int] = Field(default=None, primary_key=True)
+    account_id: int
+    content: Optional[str] = Field(default="")
+    image_names: str = Field(default="")
+    is_posted: bool = Field(default=False)
+    scheduled_at: Optional[datetime] = None
+    posted_at: Optional[datetime] = None
+    retry_count: int = Field(default=0)
+    is_failed: bool = Field(default=False)
+    status: Optional[str] = None
+    archived_at: datetime = Field(default_factory=datetime.now)
 
 
 # --- CSVテキストデータ（アカウントごとに保存） ---
@@ -58,3 +255,281 @@ class HourlySchedule(SQLModel, table=True):
     is_active: bool = Field(default=True)  # スケジュールが有効かどうか
     created_at: datetime = Field(default_factory=datetime.now)
     updated_at: datetime = Field(default_factory=datetime.now)
+
+
+# --- 画像の実体（SHA-256 で重複を排除して1つだけ保存する） ---
+class ImageBlob(SQLModel, table=True):
+    sha256: str = Field(primary_key=True)
+    ext: str = Field(default="")  # 拡張子（".png" など）
+    size: int = Field(default=0)  # バイト数
+    mime_type: Optional[str] = None
+    width: Optional[int] = None  # 画像の幅（px、Pillow がない場合は None）
+    height: Optional[int] = None  # 画像の高さ（px）
+    ref_count: int = Field(default=0)  # 投稿待ちツイートからの参照数（GC のたびに更新）
+    created_at: datetime = Field(default_factory=datetime.now)
+
+
+# --- アカウントごとの画像名 → 実体の対応 ---
+class AccountImage(SQLModel, table=True):
+    __table_args__ = (
+        Index("ix_accountimage_account_name", "account_id", "name", unique=True),
+        # 画像一覧: アップロード順・使用数順のキーセットページング
+        Index("ix_accountimage_account_created_at", "account_id", "created_at", "id"),
+        Index("ix_accountimage_account_usage", "account_id", "usage_count", "id"),
+    )
+
+    id: Optional[int] = Field(default=None, primary_key=True)
+    account_id: int
+    name: str  # 画面・Tweet.image_names で使う画像名
+    sha256: str = Field(index=True)  # ImageBlob.sha256
+    created_at: datetime = Field(default_factory=datetime.now)
+    last_referenced_at: Optional[datetime] = None  # 最後に投稿待ちツイートから参照されていた時刻
+    usage_count: int = Field(default=0)  # この画像を使っている投稿待ちツイートの数（GC のたびに更新）
+
+
+# --- 適用済みのマイグレーション ---
+class SchemaVersion(SQLModel, table=True):
+    version: int = Field(primary_key=True)
+    description: str
+    applied_at: datetime = Field(default_factory=datetime.now)
+
+
+# ===== マイグレーション =====
+# create_all は既存テーブルを変更しないため、カラム・インデックスの追加はここに
+# バージョン付きで追記していく（番号は増やす一方で、適用済みのものは変更しない）。
+
+
+def _add_columns(conn, table, column_names):
+    """モデル定義どおりのカラムを既存テーブルに追加する（既にあれば何もしない）"""
+    existing = {c["name"] for c in inspect(conn).get_columns(table.name)}
+    for name in column_names:
+        if name in existing:
+            continue
+        column = table.columns[name]
+        column_type = column.type.compile(dialect=conn.dialect)
+        conn.execute(text(f"ALTER TABLE {table.name} ADD COLUMN {name} {column_type}"))
+
+
+def _create_indexes(conn, table):
+    for index in table.indexes:
+        index.create(conn, checkfirst=True)
+
+
+def _migrate_dispatch_columns(conn):
+    _add_columns(
+        conn,
+        Tweet.__table__,
+        ["media_ids", "media_expires_at", "lease_owner", "lease_expires_at", "status"],
+    )
+
+
+def _migrate_fill_tweet_status(conn):
+    conn.execute(
+        text(
+            "UPDATE tweet SET status = CASE"
+            f" WHEN is_posted THEN '{TWEET_POSTED}'"
+            f" WHEN is_failed THEN '{TWEET_FAILED}'"
+            f" ELSE '{TWEET_PENDING}' END"
+            " WHERE status IS NULL"
+        )
+    )
+
+
+def _migrate_tweet_indexes(conn):
+    _create_indexes(conn, Tweet.__table__)
+
+
+def _migrate_image_catalog(conn):
+    _add_columns(conn, ImageBlob.__table__, ["width", "height"])
+    _add_columns(conn, AccountImage.__table__, ["usage_count"])
+    conn.execute(text("UPDATE accountimage SET usage_count = 0 WHERE usage_count IS NULL"))
+    _create_indexes(conn, AccountImage.__table__)
+
+
+def _migrate_reset_image_gc_clock(conn):
+    # 以前は取り込み時刻から GC の猶予を数えていたため、一度も使われていない画像も消えていた。
+    # 参照されていない画像は使われたことがあるか区別できないので、ユーザーが消すまで残す側に倒す
+    conn.execute(
+        text("UPDATE accountimage SET last_referenced_at = NULL WHERE usage_count = 0")
+    )
+
+
+# account_id を持ち、変更すると API の応答が変わるテーブル
+DATA_VERSION_TABLES = ["tweet", "tweetarchive", "csvtext", "hourlyschedule", "accountimage"]
+# データバージョンを更新するトリガーは SQLite の構文で作る（それ以外の DB では ETag を使わない）
+HAS_DATA_VERSION = engine.dialect.name == "sqlite"
+
+
+DATA_VERSION_TRIGGERS = (("INSERT", "NEW"), ("UPDATE", "NEW"), ("DELETE", "OLD"))
+# UPDATE で画面に表示する列が変わったときだけバージョンを上げる（指定のないテーブルはすべての列）。
+# リースの取得・延長・解放や事前アップロードは投稿処理のたびに書き込まれるので対象外にする
+DATA_VERSION_UPDATE_COLUMNS = {
+    "tweet": [
+        "account_id",
+        "content",
+        "image_names",
+        "is_posted",
+        "scheduled_at",
+        "posted_at",
+        "retry_count",
+        "is_failed",
+        "status",
+    ],
+}
+
+
+def _create_data_version_triggers(conn, table):
+    for op, row in DATA_VERSION_TRIGGERS:
+        event_name = op
+        if op == "UPDATE" and table in DATA_VERSION_UPDATE_COLUMNS:
+            event_name = f"UPDATE OF {', '.join(DATA_VERSION_UPDATE_COLUMNS[table])}"
+        conn.execute(
+            text(
+                f"CREATE TRIGGER IF NOT EXISTS {table}_{op.lower()}_data_version"
+                f" AFTER {event_name} ON {table} BEGIN"
+                f" UPDATE account SET data_version = data_version + 1 WHERE id = {row}.account_id;"
+                " END"
+            )
+        )
+
+
+def _migrate_data_version(conn):
+    _add_columns(conn, Account.__table__, ["data_version"])
+    conn.execute(text("UPDATE account SET data_version = 0 WHERE data_version IS NULL"))
+    if not HAS_DATA_VERSION:
+        return
+    # スケジューラー・一括予約・アーカイブなど、どこから書き込んでも上がるようにトリガーで更新する
+    for table in DATA_VERSION_TABLES:
+        _create_data_version_triggers(conn, table)
+    conn.execute(
+        text(
+            "CREATE TRIGGER IF NOT EXISTS account_update_data_version"
+            " AFTER UPDATE OF name ON account BEGIN"
+            " UPDATE account SET data_version = data_version + 1 WHERE id = NEW.id;"
+            " END"
+        )
+    )
+
+
+def _migrate_tweet_autoincrement(conn):
+    # SQLite は AUTOINCREMENT がないと「最大の id + 1」を次の id にするため、最新の行を削除・
+    # アーカイブすると id が再利用され、TweetArchive への移動が UNIQUE 制約で失敗し続けていた。
+    # AUTOINCREMENT はテーブルを作り直さないと付けられない
+    if conn.dialect.name != "sqlite":
+        return
+    table_sql = conn.execute(
+        text("SELECT sql FROM sqlite_master WHERE type = 'table' AND name = 'tweet'")
+    ).scalar()
+    if "AUTOINCREMENT" not in table_sql.upper():
+        for op, _ in DATA_VERSION_TRIGGERS:
+            conn.execute(text(f"DROP TRIGGER IF EXISTS tweet_{op.lower()}_data_version"))
+        conn.execute(text("ALTER TABLE tweet RENAME TO tweet_old"))
+        # インデックスは名前ごと tweet_old に付いていくので、作り直す前に消す
+        index_names = conn.execute(
+            text(
+                "SELECT name FROM sqlite_master"
+                " WHERE type = 'index' AND tbl_name = 'tweet_old' AND sql IS NOT NULL"
+            )
+        ).scalars().all()
+        for name in index_names:
+            conn.execute(text(f"DROP INDEX {name}"))
+        Tweet.__table__.create(conn)
+        # 後のマイグレーションで追加するカラムは古いテーブルにまだない
+        existing = {c["name"] for c in inspect(conn).get_columns("tweet_old")}
+        columns = ", ".join(c for c in Tweet.__table__.columns.keys() if c in existing)
+        conn.execute(text(f"INSERT INTO tweet ({columns}) SELECT {columns} FROM tweet_old"))
+        conn.execute(text("DROP TABLE tweet_old"))
+        if HAS_DATA_VERSION:
+            _create_data_version_triggers(conn, "tweet")
+
+    # 既に再利用されてアーカイブ済みの id と重なっている行は、新しい id に振り直す
+    duplicate_ids = conn.execute(
+        text("SELECT id FROM tweet WHERE id IN (SELECT id FROM tweetarchive) ORDER BY id")
+    ).scalars().all()
+    for tweet_id in duplicate_ids:
+        conn.execute(
+            text(
+                "UPDATE tweet SET id = 1 + MAX("
+                " (SELECT MAX(id) FROM tweet), (SELECT COALESCE(MAX(id), 0) FROM tweetarchive))"
+                " WHERE id = :id"
+            ),
+            {"id": tweet_id},
+        )
+    # アーカイブ済みの id も、これから採番しないようにする
+    conn.execute(
+        text(
+            "INSERT INTO sqlite_sequence (name, seq) SELECT 'tweet', 0"
+            " WHERE NOT EXISTS (SELECT 1 FROM sqlite_sequence WHERE name = 'tweet')"
+        )
+    )
+    conn.execute(
+        text(
+            "UPDATE sqlite_sequence SET seq = MAX("
+            " seq,"
+            " (SELECT COALESCE(MAX(id), 0) FROM tweet),"
+            " (SELECT COALESCE(MAX(id), 0) FROM tweetarchive))"
+            " WHERE name = 'tweet'"
+        )
+    )
+
+
+def _migrate_next_attempt_at(conn):
+    _add_columns(conn, Tweet.__table__, ["next_attempt_at"])
+
+
+def _migrate_data_version_columns(conn):
+    if not HAS_DATA_VERSION:
+        return
+    # 以前のトリガーはリースの書き込みでもバージョンを上げ、投稿処理のたびに ETag が変わっていた
+    for table in DATA_VERSION_UPDATE_COLUMNS:
+        conn.execute(text(f"DROP TRIGGER IF EXISTS {table}_update_data_version"))
+        _create_data_version_triggers(conn, table)
+
+
+def _migrate_backfill_images(conn):
+    # 既存のアップロードディレクトリを走査して画像一覧のテーブルを埋める（1回だけ）
+    from services.image_store import backfill
+
+    with Session(bind=conn) as session:
+        backfill(session)
+
+
+# (バージョン, 説明, 適用関数)
+MIGRATIONS = [
+    (1, "tweet: 事前アップロード・リース・状態のカラムを追加", _migrate_dispatch_columns),
+    (2, "tweet: 既存ツイートの status を設定", _migrate_fill_tweet_status),
+    (3, "tweet: スケジューラー・一覧用の複合インデックスを追加", _migrate_tweet_indexes),
+    (4, "image: 画像一覧用のカラム（サイズ・使用数）とインデックスを追加", _migrate_image_catalog),
+    (5, "image: 既存のアップロード画像を画像一覧に取り込む", _migrate_backfill_images),
+    (6, "account: ETag 用のデータバージョンとその更新トリガーを追加", _migrate_data_version),
+    (7, "image: 一度も使われていない画像を GC の対象から外す", _migrate_reset_image_gc_clock),
+    (8, "tweet: id を再利用しないようにテーブルを AUTOINCREMENT で作り直す", _migrate_tweet_autoincrement),
+    (9, "tweet: 再試行・延期したツイートの次の取得時刻のカラムを追加", _migrate_next_attempt_at),
+    (10, "account: データバージョンのトリガーを表示する列の変更に限る", _migrate_data_version_columns),
+]
+
+
+def run_migrations():
+    """未適用のマイグレーションをバージョン順に1つずつ（各々1トランザクションで）適用する"""
+    with Session(engine) as session:
+        applied = set(session.exec(select(SchemaVersion.version)).all())
+
+    for version, description, migrate in MIGRATIONS:
+        if version in applied:
+            continue
+        try:
+            with engine.begin() as conn:
+                migrate(conn)
+                conn.execute(
+                    SchemaVersion.__table__.insert().values(
+                        version=version,
+                        description=description,
+                        applied_at=datetime.now(),
+                    )
+                )
+        except Exception:
+            # 同時に起動した別プロセスが先に適用した場合は問題なし
+            with Session(engine) as session:
+                if session.get(SchemaVersion, version):
+                    continue
+            raise
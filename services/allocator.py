@@ -0,0 +1,180 @@
+# services/allocator.py
+"""
+時間帯スケジュール（HourlySchedule）の空き枠へのツイートの割り当て。
+
+期間内のスケジュールの枠を早い順に並べ、同じアカウントの投稿待ちツイートが既にある枠
+（分単位で比較）を飛ばして、内容（CSV テキストまたは画像）を1件ずつ割り当てる。
+既存の予約は (account_id, status, scheduled_at) のインデックスで期間分を1回だけ読み、
+ツイートは ALLOCATE_BATCH_SIZE 件ごとの INSERT でまとめて登録する。
+
+割り当て中はアカウントをロックする（SQLite では書き込みロック）ため、
+同時に割り当てても同じ枠に二重に予約されることはない。
+"""
+import json
+import os
+from datetime import datetime, timedelta
+
+from sqlalchemy import insert, update
+from sqlmodel import select
+
+from models import Account, CSVText, Tweet, TWEET_PENDING, TWEET_IN_FLIGHT
+from services.slots import iter_hourly_slots
+
+# 1回の割り当てで登録できる最大件数
+ALLOCATE_MAX_TWEETS = int(os.getenv("ALLOCATE_MAX_TWEETS", "10000"))
+# 1回の INSERT にまとめる件数
+ALLOCATE_BATCH_SIZE = 500
+
+SOURCES = ("csv", "images")
+
+
+class AllocationError(ValueError):
+    """割り当てできない場合のエラー（内容がない・空き枠が足りないなど）"""
+
+
+def _minute(value):
+    return value.replace(second=0, microsecond=0)
+
+
+def _lock_account(session, account_id):
+    """割り当てが終わるまで、同じアカウントへの割り当てを待たせる"""
+    if session.get_bind().dialect.name == "sqlite":
+        # SQLite は最初の書き込みで DB の書き込みロックを取り、コミットまで保持する
+        session.execute(
+            update(Account)
+            .where(Account.id == account_id)
+            .values(name=Account.name)
+            .execution_options(synchronize_session=False)
+        )
+    else:
+        session.exec(
+            select(Account.id).where(Account.id == account_id).with_for_update()
+        ).first()
+
+
+def taken_slots(session, account_id, start_at, end_at):
+    """期間内で投稿待ち（送信中を含む）のツイートがある時刻（分単位）"""
+    rows = session.exec(
+        select(Tweet.scheduled_at).where(
+            Tweet.account_id == account_id,
+            Tweet.status.in_([TWEET_PENDING, TWEET_IN_FLIGHT]),
+            Tweet.scheduled_at >= start_at,
+            Tweet.scheduled_at < end_at,
+        )
+    ).all()
+    return {_minute(scheduled_at) for scheduled_at in rows}
+
+
+def free_slots(hours, start_at, end_at, taken, count):
+    """空いている枠を早い順に最大 count 個返す。戻り値は (枠のリスト, 飛ばした枠の数)"""
+    slots = []
+    skipped = 0
+    for slot in iter_hourly_slots(hours, start_at, end_at):
+        if slot in taken:
+            skipped += 1
+            continue
+        slots.append(slot)
+        if len(slots) == count:
+            break
+    return slots, skipped
+
+
+def _contents(session, account_id, source, image_names, text):
+    """割り当てる内容を (本文, 画像名のリスト) のリストで返す"""
+    csv_text = session.exec(
+        select(CSVText.texts).where(CSVText.account_id == account_id)
+    ).first()
+    texts = json.loads(csv_text) if csv_text else []
+
+    if source == "csv":
+        contents = [(str(t).strip(), []) for t in texts if str(t).strip()]
+        if not contents:
+            raise AllocationError("CSV テキストが登録されていません")
+        return contents
+
+    if not image_names:
+        raise AllocationError("画像を指定してください")
+    # 画像1枚につき1ツイート。本文は CSV テキストを順に使い、足りなければ固定テキスト
+    return [
+        (str(texts[i]).strip() if i < len(texts) else (text or "").strip(), [name])
+        for i, name in enumerate(image_names)
+    ]
+
+
+def allocate(
+    session,
+    account_id,
+    hours,
+    start_at,
+    end_at,
+    source,
+    image_names=None,
+    text="",
+    dry_run=False,
+):
+    """
+    期間 [start_at, end_at) の空き枠に内容を割り当て、ツイートを登録する（コミットまで行う）。
+    戻り値は {"created": [(id, scheduled_at), ...], "slots": [...], "skipped": 飛ばした枠の数}。
+    dry_run=True の場合は登録せず、割り当て予定の枠だけを返す。
+    """
+    if source not in SOURCES:
+        raise AllocationError(f"source は {' / '.join(SOURCES)} のいずれかです")
+    if end_at <= start_at:
+        raise AllocationError("終了日は開始日より後にしてください")
+
+    if not dry_run:
+        # 空き枠を読む前にロックする（読んでから登録するまでの間に他の割り当てを挟ませない）
+        _lock_account(session, account_id)
+    try:
+        contents = _contents(session, account_id, source, image_names, text)
+        if len(contents) > ALLOCATE_MAX_TWEETS:
+            raise AllocationError(f"一度に割り当てできるのは{ALLOCATE_MAX_TWEETS}件までです")
+        taken = taken_slots(session, account_id, start_at, end_at)
+        slots, skipped = free_slots(hours, start_at, end_at, taken, len(contents))
+    except ValueError as e:
+        # AllocationError を含む。ロックを解放してから返す
+        session.rollback()
+        raise AllocationError(str(e))
+    if len(slots) < len(contents):
+        session.rollback()
+        raise AllocationError(
+            f"期間内の空き枠が足りません（空き: {len(slots)}件 / 必要: {len(contents)}件）"
+        )
+
+    if dry_run:
+        return {"created": [], "slots": slots, "skipped": skipped}
+
+    rows = [
+        {
+            "account_id": account_id,
+            "content": content,
+            "image_names": json.dumps(names),
+            "is_posted": False,
+            "scheduled_at": slot,
+            "status": TWEET_PENDING,
+        }
+        for (content, names), slot in zip(contents, slots)
+    ]
+    statement = insert(Tweet).returning(Tweet.id, Tweet.scheduled_at)
+    created = []
+    for start in range(0, len(rows), ALLOCATE_BATCH_SIZE):
+        chunk = rows[start : start + ALLOCATE_BATCH_SIZE]
+        created.extend(session.execute(statement, chunk).all())
+    session.commit()
+    return {"created": created, "slots": slots, "skipped": skipped}
+
+
+def date_range(start_date, end_date, now=None):
+    """
+    "2025-01-01" 〜 "2025-01-31"（両端を含む日付）を [開始日時, 終了日時) にする。
+    開始は現在時刻より前にならないようにする。不正な値は AllocationError。
+    """
+    try:
+        start_at = datetime.fromisoformat(start_date)
+        end_at = datetime.fromisoformat(end_date)
+    except (TypeError, ValueError):
+        raise AllocationError("無効な日付です")
+    if len(end_date) <= 10:
+        # 日付だけの指定はその日の終わりまで
+        end_at += timedelta(days=1)
+    return max(start_at, now or datetime.now()), end_at
@@ -0,0 +1,89 @@
+# services/archive.py
+"""
+投稿済み・失敗ツイートのアーカイブ（Tweet → TweetArchive）。
+
+Tweet はスケジューラーが常に読み書きするため、保存期間（TWEET_ARCHIVE_DAYS）を過ぎた
+投稿済み・失敗ツイートを定期的に TweetArchive へ移し、Tweet には投稿待ちと最近の履歴だけを残す。
+1バッチごとに「Tweet から DELETE ... RETURNING → TweetArchive に INSERT」を1トランザクションで行うので、
+途中で止まっても二重に移したり失ったりしない。
+id はそのまま引き継ぐ（Tweet は AUTOINCREMENT なので、移した id が新しいツイートに再利用されることはない）。
+履歴の読み取り（一覧・件数・最終投稿）は main.py で両方のテーブルを合わせて返す。
+"""
+import logging
+import os
+from datetime import datetime, timedelta
+
+from sqlalchemy import delete, insert
+from sqlmodel import Session, select
+
+from models import engine, Tweet, TweetArchive, TWEET_POSTED, TWEET_FAILED
+
+logger = logging.getLogger(__name__)
+
+# アーカイブするまでの保存期間（日、予約日時から数える）。0 で無効
+TWEET_ARCHIVE_DAYS = int(os.getenv("TWEET_ARCHIVE_DAYS", "30"))
+# 1トランザクションで移す件数（書き込みロックを長く持たないように小分けにする）
+TWEET_ARCHIVE_BATCH_SIZE = int(os.getenv("TWEET_ARCHIVE_BATCH_SIZE", "1000"))
+# アーカイブの実行間隔（分）
+TWEET_ARCHIVE_INTERVAL_MINUTES = int(os.getenv("TWEET_ARCHIVE_INTERVAL_MINUTES", "60"))
+
+# アーカイブの対象になる状態（投稿待ち・送信中は移さない）
+ARCHIVED_STATUSES = (TWEET_POSTED, TWEET_FAILED)
+
+# TweetArchive に引き継ぐカラム
+ARCHIVE_COLUMNS = [
+    name for name in TweetArchive.__table__.columns.keys() if name != "archived_at"
+]
+
+
+def includes_archived(statuses):
+    """この状態の一覧にアーカイブ済みのツイートが含まれうるか"""
+    return any(status in ARCHIVED_STATUSES for status in statuses)
+
+
+def _archive_batch(session, cutoff, now, batch_size):
+    """1バッチ分を移して件数を返す"""
+    due = (
+        select(Tweet.id)
+        .where(
+            Tweet.status.in_(ARCHIVED_STATUSES),
+            Tweet.scheduled_at < cutoff,
+            Tweet.lease_owner == None,
+        )
+        .order_by(Tweet.scheduled_at)
+        .limit(batch_size)
+    )
+    # 最初の文で書き込みロックを取る（別プロセスと同時に動いても同じ行は1回しか移らない）
+    rows = session.execute(
+        delete(Tweet)
+        .where(Tweet.id.in_(due))
+        .returning(*(getattr(Tweet, name) for name in ARCHIVE_COLUMNS))
+        .execution_options(synchronize_session=False)
+    ).all()
+    if rows:
+        session.execute(
+            insert(TweetArchive),
+            [{**row._mapping, "archived_at": now} for row in rows],
+        )
+    session.commit()
+    return len(rows)
+
+
+def archive_tweets(now=None, retention_days=None, batch_size=TWEET_ARCHIVE_BATCH_SIZE):
+    """保存期間を過ぎた投稿済み・失敗ツイートを TweetArchive に移し、移した件数を返す"""
+    retention_days = TWEET_ARCHIVE_DAYS if retention_days is None else retention_days
+    if retention_days <= 0:
+        return 0
+
+    now = now or datetime.now()
+    cutoff = now - timedelta(days=retention_days)
+    moved = 0
+    while True:
+        with Session(engine) as session:
+            count = _archive_batch(session, cutoff, now, batch_size)
+        moved += count
+        if count < batch_size:
+            break
+    if moved:
+        logger.info(f"{retention_days}日より前の投稿済み・失敗ツイート {moved} 件をアーカイブしました")
+    return moved
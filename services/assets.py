@@ -0,0 +1,169 @@
+# services/assets.py
+"""
+static/ の配信（StaticFiles を拡張）。
+
+- HTML 内の .js / .css の参照を、内容のハッシュ付きの名前（app.js → app.3f2a9c1b.js）に書き換えて返す。
+  ハッシュ付きの URL は内容が変わらないので1年間キャッシュさせる（immutable）。
+  HTML 自体は毎回 ETag で更新を確認させる（no-cache）。
+- .js / .css は圧縮済み（gzip、brotli があれば br）のものをメモリに持って返す。
+  ファイルの更新日時・サイズが変わったら作り直すので、開発中に編集してもそのまま反映される。
+"""
+import gzip
+import hashlib
+import mimetypes
+import os
+import re
+import stat
+import threading
+
+import anyio
+from starlette.datastructures import Headers
+from starlette.responses import Response
+from starlette.staticfiles import StaticFiles
+
+from services.compression import HAS_BROTLI, choose_encoding
+
+if HAS_BROTLI:
+    import brotli
+
+# 内容のハッシュ付きの URL（内容が変われば URL も変わる）
+IMMUTABLE_CACHE_CONTROL = "public, max-age=31536000, immutable"
+# 毎回サーバーに更新を確認させる（変わっていなければ 304）
+REVALIDATE_CACHE_CONTROL = "no-cache"
+
+# ハッシュ付きで配信するファイル
+FINGERPRINTED_EXTENSIONS = (".js", ".css")
+FINGERPRINT_LENGTH = 8
+
+# HTML 内のローカルの .js / .css の参照（以前の手動のキャッシュ対策 ?v=N は外す）
+_ASSET_REF = re.compile(r'(src|href)="([\w./-]+\.(?:js|css))(?:\?[^"]*)?"')
+# app.3f2a9c1b.js → (app, 3f2a9c1b, .js)
+_FINGERPRINTED = re.compile(rf"^(.+)\.([0-9a-f]{{{FINGERPRINT_LENGTH}}})(\.(?:js|css))$")
+
+
+class _Asset:
+    def __init__(self, body, stat_result):
+        self.key = (stat_result.st_mtime_ns, stat_result.st_size)
+        self.body = body
+        self.digest = hashlib.sha256(body).hexdigest()
+        # 圧縮方式が違っても中身は同じなので弱い ETag にする
+        self.etag = f'W/"{self.digest[:32]}"'
+        # 1回だけ最大の圧縮率で圧縮しておく
+        self.encoded = {"gzip": gzip.compress(body, compresslevel=9, mtime=0)}
+        if HAS_BROTLI:
+            self.encoded["br"] = brotli.compress(body, quality=11)
+
+    @property
+    def fingerprint(self):
+        return self.digest[:FINGERPRINT_LENGTH]
+
+
+def fingerprinted_name(name, fingerprint):
+    root, ext = os.path.splitext(name)
+    return f"{root}.{fingerprint}{ext}"
+
+
+class AssetFiles(StaticFiles):
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._assets = {}
+        self._lock = threading.Lock()
+
+    def _load_asset(self, path):
+        """path の .js / .css を読み込む（変わっていなければキャッシュを返す）。なければ None"""
+        full_path, stat_result = self.lookup_path(path)
+        if not stat_result or not stat.S_ISREG(stat_result.st_mode):
+            return None
+        with self._lock:
+            asset = self._assets.get(full_path)
+        if asset and asset.key == (stat_result.st_mtime_ns, stat_result.st_size):
+            return asset
+        with open(full_path, "rb") as f:
+            asset = _Asset(f.read(), stat_result)
+        with self._lock:
+            self._assets[full_path] = asset
+        return asset
+
+    def _rewrite_html(self, html_dir, html):
+        def replace(match):
+            attr, ref = match.groups()
+            if ref.startswith("/") or "://" in ref:
+                return match.group(0)
+            asset = self._load_asset(os.path.normpath(os.path.join(html_dir, ref)))
+            if asset is None:
+                return match.group(0)
+            return f'{attr}="{fingerprinted_name(ref, asset.fingerprint)}"'
+
+        return _ASSET_REF.sub(replace, html)
+
+    def _asset_response(self, path, scope):
+        """.js / .css の応答（それ以外は None）"""
+        fingerprint = None
+        match = _FINGERPRINTED.match(path)
+        if match:
+            name, fingerprint, ext = match.groups()
+            path = name + ext
+        elif not path.endswith(FINGERPRINTED_EXTENSIONS):
+            return None
+        asset = self._load_asset(path)
+        if asset is None:
+            return None
+
+        # 古い HTML が前のハッシュで参照してきた場合は、今の内容を返してキャッシュはさせない
+        immutable = fingerprint == asset.fingerprint
+        headers = {
+            "ETag": asset.etag,
+            "Cache-Control": IMMUTABLE_CACHE_CONTROL if immutable else REVALIDATE_CACHE_CONTROL,
+            "Vary": "Accept-Encoding",
+        }
+        request_headers = Headers(scope=scope)
+        if etag_matches(request_headers.get("if-none-match"), asset.etag):
+            return Response(status_code=304, headers=headers)
+
+        media_type = mimetypes.guess_type(path)[0] or "application/octet-stream"
+        encoding = choose_encoding(request_headers.get("accept-encoding"), tuple(asset.encoded))
+        if encoding:
+            headers["Content-Encoding"] = encoding
+            return Response(asset.encoded[encoding], media_type=media_type, headers=headers)
+        return Response(asset.body, media_type=media_type, headers=headers)
+
+    def _html_response(self, path, scope):
+        """HTML の応答（参照をハッシュ付きに書き換える）。HTML でなければ None"""
+        full_path, stat_result = self.lookup_path(path)
+        if stat_result and stat.S_ISDIR(stat_result.st_mode):
+            if not scope["path"].endswith("/"):
+                # "/" 付きの URL へのリダイレクトは StaticFiles に任せる
+                return None
+            path = os.path.join(path, "index.html")
+            full_path, stat_result = self.lookup_path(path)
+        if not (stat_result and stat.S_ISREG(stat_result.st_mode) and path.endswith(".html")):
+            return None
+        with open(full_path, encoding="utf-8") as f:
+            html = self._rewrite_html(os.path.dirname(path), f.read())
+
+        body = html.encode("utf-8")
+        etag = f'W/"{hashlib.sha256(body).hexdigest()[:32]}"'
+        headers = {"ETag": etag, "Cache-Control": REVALIDATE_CACHE_CONTROL}
+        if etag_matches(Headers(scope=scope).get("if-none-match"), etag):
+            return Response(status_code=304, headers=headers)
+        return Response(body, media_type="text/html", headers=headers)
+
+    def _build_response(self, path, scope):
+        return self._asset_response(path, scope) or self._html_response(path, scope)
+
+    async def get_response(self, path, scope):
+        if scope["method"] in ("GET", "HEAD"):
+            # ファイルの読み込みと圧縮はスレッドで行う
+            response = await anyio.to_thread.run_sync(self._build_response, path, scope)
+            if response is not None:
+                return response
+        # 画像など、それ以外のファイルは StaticFiles のまま返す
+        return await super().get_response(path, scope)
+
+
+def etag_matches(if_none_match, etag):
+    """If-None-Match に etag が含まれるか（W/ の有無は区別しない）"""
+    if not if_none_match:
+        return False
+    tags = {tag.strip().removeprefix("W/") for tag in if_none_match.split(",")}
+    return "*" in tags or etag.removeprefix("W/") in tags
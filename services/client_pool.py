@@ -0,0 +1,120 @@
+# services/client_pool.py
+"""
+アカウントごとの X API クライアントをプロセス内で使い回すためのレジストリ。
+
+復号済みの認証情報と tweepy のクライアント（keep-alive の HTTP セッション付き）を
+Account.id をキーに保持し、投稿のたびに Fernet の復号や TLS ハンドシェイクを
+やり直さないようにする。
+"""
+import os
+import threading
+import time
+
+import tweepy
+
+from services.encryption import decrypt_data
+from services.metrics import POST_PHASE
+from services.rate_limiter import app_key_for, response_hook
+
+# 使われないまま一定時間経ったクライアントは破棄する（秒）
+X_CLIENT_IDLE_TTL = int(os.getenv("X_CLIENT_IDLE_TTL", "1800"))
+
+
+def _fingerprint(account):
+    """暗号化済みの認証情報の組。行が更新されると値が変わる"""
+    return (
+        account.api_key,
+        account.api_secret,
+        account.access_token,
+        account.access_token_secret,
+    )
+
+
+class XClients:
+    """1アカウント分の復号済み認証情報と、再利用する v1.1 / v2 クライアント"""
+
+    def __init__(self, account):
+        self.account_id = account.id
+        self.fingerprint = _fingerprint(account)
+        self.consumer_key = decrypt_data(account.api_key)
+        self.consumer_secret = decrypt_data(account.api_secret)
+        self.access_token = decrypt_data(account.access_token)
+        self.access_token_secret = decrypt_data(account.access_token_secret)
+        # アプリ単位のレート制限のキー
+        self.app_key = app_key_for(self.consumer_key)
+
+        # v1.1 API（画像アップロード用）
+        self.api_v1 = tweepy.API(
+            tweepy.OAuth1UserHandler(
+                self.consumer_key,
+                self.consumer_secret,
+                self.access_token,
+                self.access_token_secret,
+            )
+        )
+        # v2 API（ツイート投稿用）
+        self.client_v2 = tweepy.Client(
+            consumer_key=self.consumer_key,
+            consumer_secret=self.consumer_secret,
+            access_token=self.access_token,
+            access_token_secret=self.access_token_secret,
+        )
+        # 投稿レスポンスのレート制限ヘッダーをリミッターに渡す
+        self.client_v2.session.hooks["response"].append(
+            response_hook(self.account_id, self.app_key)
+        )
+        self.last_used = time.monotonic()
+
+    def close(self):
+        """保持している HTTP セッションを閉じる"""
+        self.api_v1.session.close()
+        self.client_v2.session.close()
+
+
+_clients = {}
+_lock = threading.Lock()
+
+
+def _evict_idle(now):
+    """アイドル時間を超えたエントリを取り除く（_lock 取得中に呼ぶ）"""
+    expired = [
+        account_id
+        for account_id, entry in _clients.items()
+        if now - entry.last_used > X_CLIENT_IDLE_TTL
+    ]
+    return [_clients.pop(account_id) for account_id in expired]
+
+
+def get_clients(account):
+    """アカウントのクライアントを取得する。キャッシュがなければ作成する"""
+    now = time.monotonic()
+    fingerprint = _fingerprint(account)
+    with _lock:
+        stale = _evict_idle(now)
+        entry = _clients.get(account.id)
+        if entry and entry.fingerprint == fingerprint:
+            entry.last_used = now
+        else:
+            entry = None
+    for old in stale:
+        old.close()
+    if entry:
+        return entry
+
+    # 復号とクライアント生成はロックの外で行う
+    with POST_PHASE.time(phase="decrypt"):
+        entry = XClients(account)
+    with _lock:
+        previous = _clients.get(account.id)
+        _clients[account.id] = entry
+    if previous and previous is not entry:
+        previous.close()
+    return entry
+
+
+def invalidate(account_id):
+    """アカウントの更新・削除時にキャッシュを破棄する"""
+    with _lock:
+        entry = _clients.pop(account_id, None)
+    if entry:
+        entry.close()
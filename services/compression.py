@@ -0,0 +1,128 @@
+# services/compression.py
+"""
+HTTP 応答の圧縮（gzip、brotli がインストールされていれば br）。
+
+Starlette の GZipMiddleware はストリーミング応答を1チャンクずつ flush しないため、
+メガ予約の進捗（NDJSON）が最後まで届かなくなる。ここでは長さのわかっている
+JSON・テキストの応答だけを圧縮し、ストリーミング応答（SSE・進捗）・画像・
+圧縮済みの応答（静的ファイル）はそのまま流す。
+"""
+import asyncio
+import gzip
+import os
+
+from starlette.datastructures import Headers, MutableHeaders
+
+try:
+    import brotli
+
+    HAS_BROTLI = True
+except ImportError:
+    HAS_BROTLI = False
+
+# これより小さい応答は圧縮しない（バイト）
+COMPRESS_MIN_BYTES = int(os.getenv("COMPRESS_MIN_BYTES", "1024"))
+# gzip の圧縮レベル（1〜9、応答ごとに圧縮するので速さを優先する）
+GZIP_LEVEL = int(os.getenv("GZIP_LEVEL", "6"))
+# brotli の品質（0〜11）
+BROTLI_QUALITY = 5
+# これより大きい応答はスレッドで圧縮する（イベントループを止めない）
+COMPRESS_THREAD_BYTES = 256 * 1024
+
+COMPRESSIBLE_TYPES = (
+    "application/json",
+    "application/javascript",
+    "image/svg+xml",
+    "text/",
+)
+EXCLUDED_TYPES = ("text/event-stream",)
+
+
+def accepted_encodings(accept_encoding):
+    """Accept-Encoding のうち q=0 でないもの"""
+    accepted = set()
+    for item in (accept_encoding or "").split(","):
+        name, _, params = item.strip().partition(";")
+        params = params.replace(" ", "")
+        if name and params not in ("q=0", "q=0.0", "q=0.00", "q=0.000"):
+            accepted.add(name.lower())
+    return accepted
+
+
+def choose_encoding(accept_encoding, available=None):
+    """使う圧縮方式（br を優先）。使えなければ None"""
+    accepted = accepted_encodings(accept_encoding)
+    available = available or (("br", "gzip") if HAS_BROTLI else ("gzip",))
+    for name in available:
+        if name in accepted:
+            return name
+    return None
+
+
+def compress(body, encoding, level=None):
+    if encoding == "br":
+        return brotli.compress(body, quality=BROTLI_QUALITY if level is None else level)
+    return gzip.compress(body, compresslevel=GZIP_LEVEL if level is None else level, mtime=0)
+
+
+def is_compressible(content_type):
+    return content_type.startswith(COMPRESSIBLE_TYPES) and not content_type.startswith(
+        EXCLUDED_TYPES
+    )
+
+
+class CompressionMiddleware:
+    def __init__(self, app, minimum_size=COMPRESS_MIN_BYTES):
+        self.app = app
+        self.minimum_size = minimum_size
+
+    def _should_compress(self, headers):
+        # 長さがわかっている（1回で作られた）応答だけを圧縮する。ストリーミング応答は長さがない。
+        # @app.middleware を通ると本文が分割されて届くので、最後のチャンクまでためてから圧縮する
+        return (
+            "content-length" in headers
+            and int(headers["content-length"]) >= self.minimum_size
+            and "content-encoding" not in headers
+            and is_compressible(headers.get("content-type", ""))
+        )
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["method"] == "HEAD":
+            await self.app(scope, receive, send)
+            return
+        encoding = choose_encoding(Headers(scope=scope).get("accept-encoding"))
+        if encoding is None:
+            await self.app(scope, receive, send)
+            return
+
+        start = None
+        chunks = []
+
+        async def send_compressed(message):
+            nonlocal start
+            if message["type"] == "http.response.start":
+                if self._should_compress(Headers(raw=message["headers"])):
+                    start = message
+                else:
+                    await send(message)
+                return
+            if start is None or message["type"] != "http.response.body":
+                await send(message)
+                return
+
+            chunks.append(message.get("body", b""))
+            if message.get("more_body", False):
+                return
+            body = b"".join(chunks)
+            if len(body) >= COMPRESS_THREAD_BYTES:
+                body = await asyncio.to_thread(compress, body, encoding)
+            else:
+                body = compress(body, encoding)
+            headers = MutableHeaders(raw=start["headers"])
+            headers["Content-Encoding"] = encoding
+            headers["Content-Length"] = str(len(body))
+            headers.add_vary_header("Accept-Encoding")
+            await send(start)
+            await send({"type": "http.response.body", "body": body})
+
+        await self.app(scope, receive, send_compressed)
@@ -0,0 +1,132 @@
+# services/derivatives.py
+"""
+アップロード画像の派生ファイル（サムネイル）と、上限サイズを超えた画像の再圧縮。
+
+Pillow は任意の依存関係（pip install ".[images]"）。入っていない場合はサムネイルを作らず
+元画像をそのまま返し、上限サイズを超えた画像は従来どおり受け付けない。
+
+サムネイルは初回リクエスト時に作り、画像の実体（SHA-256）ごとに
+static/uploads/_derived/<先頭2文字>/<sha256>_<幅>.webp に保存して使い回す。
+"""
+import hashlib
+import io
+import logging
+import os
+
+try:
+    from PIL import Image, ImageOps
+
+    HAS_PILLOW = True
+except ImportError:  # pragma: no cover - Pillow なしの環境
+    HAS_PILLOW = False
+
+logger = logging.getLogger(__name__)
+
+DERIVED_DIR = os.path.join("static/uploads", "_derived")
+
+# 生成するサムネイルの幅（px）。リクエストの幅はこのいずれかに切り上げる
+THUMBNAIL_WIDTHS = (160, 320, 640)
+THUMBNAIL_QUALITY = 80
+
+# 上限サイズを超えた画像を再圧縮して受け付けるか（Pillow が必要。GIF は対象外）
+IMAGE_AUTO_RECOMPRESS = os.getenv("IMAGE_AUTO_RECOMPRESS", "0") == "1"
+# 再圧縮を前提に受け付ける元画像の最大サイズ
+RECOMPRESS_MAX_BYTES = int(os.getenv("IMAGE_RECOMPRESS_MAX_BYTES", str(50 * 1024 * 1024)))
+# 再圧縮で試す JPEG の品質と、それでも収まらない場合の縮小率
+RECOMPRESS_QUALITIES = (90, 82, 74, 66)
+RECOMPRESS_SCALE = 0.8
+
+
+def can_recompress(mime_type):
+    return IMAGE_AUTO_RECOMPRESS and HAS_PILLOW and mime_type != "image/gif"
+
+
+def thumbnail_width(requested):
+    """要求された幅以上で最小の生成サイズ（最大を超える場合は最大）"""
+    for width in THUMBNAIL_WIDTHS:
+        if requested <= width:
+            return width
+    return THUMBNAIL_WIDTHS[-1]
+
+
+def derived_path(sha256, width):
+    return os.path.join(DERIVED_DIR, sha256[:2], f"{sha256}_{width}.webp")
+
+
+def remove_derivatives(sha256):
+    """実体の削除に合わせてサムネイルを削除する"""
+    for width in THUMBNAIL_WIDTHS:
+        try:
+            os.remove(derived_path(sha256, width))
+        except FileNotFoundError:
+            pass
+
+
+def image_size(path):
+    """画像の (幅, 高さ)。Pillow がない・読み込めない場合は (None, None)"""
+    if not HAS_PILLOW:
+        return None, None
+    try:
+        # ヘッダーだけを読むので大きな画像でも軽い
+        with Image.open(path) as image:
+            return image.size
+    except Exception:
+        return None, None
+
+
+def _open(path):
+    image = Image.open(path)
+    # スマートフォンの写真などは EXIF の向きを反映してから縮小する
+    return ImageOps.exif_transpose(image)
+
+
+def get_thumbnail(source, sha256, width):
+    """
+    サムネイルのパスを返す（なければ作る）。Pillow がない場合や
+    読み込めない画像の場合は None（呼び出し元で元画像を返す）。
+    """
+    if not HAS_PILLOW:
+        return None
+    path = derived_path(sha256, width)
+    if os.path.exists(path):
+        return path
+    try:
+        image = _open(source)
+        image.thumbnail((width, width * 4))
+        if image.mode not in ("RGB", "RGBA"):
+            image = image.convert("RGBA")
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        # 同時に作成されても壊れたファイルを返さないよう、書き終えてから置き換える
+        tmp = f"{path}.{os.getpid()}.part"
+        image.save(tmp, "WEBP", quality=THUMBNAIL_QUALITY)
+        os.replace(tmp, path)
+    except Exception as e:
+        logger.warning(f"サムネイルを作成できませんでした ({source}): {e}")
+        return None
+    return path
+
+
+def recompress(path, limit):
+    """
+    画像を JPEG で再圧縮して limit バイト以下にし、path を置き換える。
+    戻り値は (サイズ, MIME タイプ, SHA-256)。収まらなければ ValueError。
+    """
+    image = _open(path)
+    if image.mode != "RGB":
+        image = image.convert("RGB")
+    while True:
+        for quality in RECOMPRESS_QUALITIES:
+            buffer = io.BytesIO()
+            image.save(buffer, "JPEG", quality=quality, optimize=True, progressive=True)
+            data = buffer.getvalue()
+            if len(data) <= limit:
+                with open(path, "wb") as f:
+                    f.write(data)
+                return len(data), "image/jpeg", hashlib.sha256(data).hexdigest()
+        width, height = image.size
+        if width < 64 or height < 64:
+            raise ValueError("画像を上限サイズ以下に圧縮できませんでした")
+        image = image.resize(
+            (int(width * RECOMPRESS_SCALE), int(height * RECOMPRESS_SCALE)),
+            Image.LANCZOS,
+        )
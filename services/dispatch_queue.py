@@ -0,0 +1,182 @@
+# services/dispatch_queue.py
+"""
+投稿待ちツイートのリース（取得権）管理。
+
+複数のプロセス・コンテナでスケジューラーが動いても同じツイートを二重投稿しないよう、
+投稿前にツイートの行へ lease_owner / lease_expires_at を原子的に書き込んで「取得」する。
+リースを持つワーカーだけが結果を書き込め、期限切れのリース（クラッシュしたワーカーの分）は
+他のワーカーが取り直せる。ただし送信中（in_flight）だったものは結果が分からないため
+再送せず失敗扱いにする。
+
+- SQLite: 1つの UPDATE 文で選択と取得を同時に行う（書き込みロックで直列化される）
+- その他の DB: SELECT ... FOR UPDATE SKIP LOCKED で行ロックを取ってから更新する
+"""
+import logging
+import os
+import socket
+import threading
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+from uuid import uuid4
+
+from sqlalchemy import and_, or_, update
+from sqlmodel import Session, select
+
+from models import engine, Tweet, TWEET_PENDING, TWEET_IN_FLIGHT, TWEET_FAILED
+
+logger = logging.getLogger(__name__)
+
+# リースの有効期間（秒）。投稿処理中は keep_leases が延長し続ける
+LEASE_SECONDS = int(os.getenv("SCHEDULER_LEASE_SECONDS", "300"))
+# 1回に取得するツイートの最大件数
+CLAIM_BATCH_SIZE = int(os.getenv("SCHEDULER_CLAIM_BATCH", "200"))
+
+# このプロセスの識別子（ホスト名:PID）
+WORKER_ID = f"{socket.gethostname()}:{os.getpid()}"
+
+
+def lease_expiry(now):
+    """now に取得・延長したリースの有効期限"""
+    return now + timedelta(seconds=LEASE_SECONDS)
+
+
+def _claimable(now):
+    """取得可能なツイートの条件"""
+    # 他のワーカーが処理中のアカウントは丸ごと除外する（アカウント内の投稿順を守るため）
+    busy_accounts = select(Tweet.account_id).where(
+        Tweet.lease_owner != None,
+        Tweet.lease_expires_at >= now,
+        Tweet.status.in_([TWEET_PENDING, TWEET_IN_FLIGHT]),
+    )
+    return and_(
+        Tweet.status == TWEET_PENDING,
+        Tweet.scheduled_at <= now,
+        or_(Tweet.lease_owner == None, Tweet.lease_expires_at < now),
+        # 再試行・レート制限で延期したものは、その時刻まで取得しない
+        or_(Tweet.next_attempt_at == None, Tweet.next_attempt_at <= now),
+        Tweet.account_id.not_in(busy_accounts),
+    )
+
+
+def recover_interrupted(session, now):
+    """
+    送信中（in_flight）のままリースが切れたツイートを失敗扱いにする。
+
+    ワーカーが X への送信中に落ちた場合、投稿されたかどうかは分からない。
+    再送すると二重投稿になりうるため、自動では再送せず failed にする。
+    """
+    result = session.execute(
+        update(Tweet)
+        .where(
+            Tweet.status == TWEET_IN_FLIGHT,
+            or_(Tweet.lease_expires_at == None, Tweet.lease_expires_at < now),
+        )
+        .values(
+            status=TWEET_FAILED,
+            is_failed=True,
+            lease_owner=None,
+            lease_expires_at=None,
+        )
+        .execution_options(synchronize_session=False)
+    )
+    if result.rowcount:
+        logger.warning(
+            f"送信中に中断されたツイート {result.rowcount} 件を失敗扱いにしました（二重投稿防止）"
+        )
+
+
+def claim_due_tweets(now=None, limit=CLAIM_BATCH_SIZE):
+    """
+    期限の来たツイートを取得し、(リーストークン, [(tweet_id, account_id), ...]) を返す。
+    リストは scheduled_at 順。
+    """
+    now = now or datetime.now()
+    token = f"{WORKER_ID}:{uuid4().hex[:8]}"
+    due = (
+        select(Tweet.id)
+        .where(_claimable(now))
+        .order_by(Tweet.scheduled_at, Tweet.id)
+        .limit(limit)
+    )
+
+    with Session(engine) as session:
+        recover_interrupted(session, now)
+        if engine.dialect.name == "sqlite":
+            session.execute(
+                update(Tweet)
+                .where(Tweet.id.in_(due))
+                .values(lease_owner=token, lease_expires_at=lease_expiry(now))
+                .execution_options(synchronize_session=False)
+            )
+        else:
+            ids = session.exec(due.with_for_update(skip_locked=True)).all()
+            if ids:
+                session.execute(
+                    update(Tweet)
+                    .where(Tweet.id.in_(ids))
+                    .values(lease_owner=token, lease_expires_at=lease_expiry(now))
+                    .execution_options(synchronize_session=False)
+                )
+        session.commit()
+
+        claimed = session.exec(
+            select(Tweet.id, Tweet.account_id)
+            .where(Tweet.lease_owner == token)
+            .order_by(Tweet.scheduled_at, Tweet.id)
+        ).all()
+    return token, claimed
+
+
+def renew_leases(session, token, account_id):
+    """処理中のアカウントについて、残りのリースを延長する"""
+    session.execute(
+        update(Tweet)
+        .where(Tweet.lease_owner == token, Tweet.account_id == account_id)
+        .values(lease_expires_at=lease_expiry(datetime.now()))
+        .execution_options(synchronize_session=False)
+    )
+    session.commit()
+
+
+@contextmanager
+def keep_leases(token, account_id):
+    """
+    ブロック内の処理中、このアカウントのリース（送信中の行を含む）を延長し続ける。
+    画像のアップロードやレート制限の待ちで送信が長引いても、リースが切れて
+    他のプロセスに送信中のツイートを失敗扱いにされないようにする。
+    """
+    stop = threading.Event()
+
+    def renew():
+        while not stop.wait(LEASE_SECONDS / 3):
+            try:
+                with Session(engine) as session:
+                    renew_leases(session, token, account_id)
+            except Exception as e:
+                # 次の周期でまたやり直す（期限までにはまだ余裕がある）
+                logger.warning(f"アカウント {account_id} のリースの延長に失敗しました: {e!r}")
+
+    thread = threading.Thread(target=renew, name=f"lease-{account_id}", daemon=True)
+    thread.start()
+    try:
+        yield
+    finally:
+        stop.set()
+        thread.join()
+
+
+def release_leases(session, token, account_id=None, retry_at=None):
+    """
+    未処理（pending）のまま残ったリースを解放する。
+    retry_at を指定すると、その時刻まで再取得されないように延期する（レート制限中のアカウントなど）。
+    """
+    statement = update(Tweet).where(
+        Tweet.lease_owner == token, Tweet.status == TWEET_PENDING
+    )
+    if account_id is not None:
+        statement = statement.where(Tweet.account_id == account_id)
+    values = {"lease_owner": None, "lease_expires_at": None}
+    if retry_at is not None:
+        values["next_attempt_at"] = retry_at
+    session.execute(statement.values(**values).execution_options(synchronize_session=False))
+    session.commit()
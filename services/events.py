@@ -0,0 +1,192 @@
+# services/events.py
+"""
+ダッシュボード向けの変更イベント（Server-Sent Events）。
+
+予約の登録・削除（main.py）と投稿結果（scheduler.py）が publish() で小さな差分イベントを送り、
+GET /events の接続ごとのキューに配る。画面は一覧を取り直さずにその場で書き換える。
+
+- scheduled: 予約を登録した（件数が少なければ表示用の内容も含む）
+- deleted:   予約を削除した
+- posted:    投稿した
+- failed:    投稿に失敗した（リトライ上限）
+- resync:    差分を追えなくなった（再接続時に取りこぼした・受信が追いつかない）ので一覧を読み直す
+
+イベントはこのプロセス内だけで配る（uvicorn --workers N では同じワーカーの分だけ届く）。
+直近 EVENTS_HISTORY 件を覚えておき、再接続時の Last-Event-ID 以降を送り直す。
+"""
+import asyncio
+import json
+import os
+import threading
+import time
+from collections import deque
+from uuid import uuid4
+
+EVENT_SCHEDULED = "scheduled"
+EVENT_DELETED = "deleted"
+EVENT_POSTED = "posted"
+EVENT_FAILED = "failed"
+EVENT_RESYNC = "resync"
+
+# 再接続時に送り直すために覚えておくイベント数
+EVENTS_HISTORY = int(os.getenv("EVENTS_HISTORY", "1000"))
+# 接続ごとの未送信イベントの上限（超えたら resync を送る）
+EVENTS_QUEUE_SIZE = int(os.getenv("EVENTS_QUEUE_SIZE", "1000"))
+# 何も送るものがないときのコメント行の間隔（秒、プロキシに切断されないように）
+EVENTS_HEARTBEAT_SECONDS = 15
+# 1つの接続を保つ最大秒数（ブラウザは Last-Event-ID 付きで自動的に再接続する）
+EVENTS_MAX_STREAM_SECONDS = int(os.getenv("EVENTS_MAX_STREAM_SECONDS", "300"))
+# 再接続までの待ち時間（ミリ秒、ブラウザへの指示）
+EVENTS_RETRY_MS = 3000
+# scheduled イベントに表示用の内容を含める最大件数（多い場合は件数だけ送り、画面側で読み直す）
+EVENT_MAX_TWEETS = 100
+
+_RESYNC = {"type": EVENT_RESYNC}
+
+
+def _json_default(value):
+    # datetime は API のレスポンスと同じ ISO 形式にする
+    if hasattr(value, "isoformat"):
+        return value.isoformat()
+    raise TypeError(f"{type(value).__name__} は JSON にできません")
+
+
+class _Subscriber:
+    def __init__(self, loop, account_id):
+        self.loop = loop
+        self.account_id = account_id
+        self.queue = asyncio.Queue(maxsize=EVENTS_QUEUE_SIZE)
+
+    def wants(self, event):
+        return self.account_id is None or event.get("account_id") == self.account_id
+
+    def put(self, event):
+        """接続のイベントループ上で呼ばれる"""
+        try:
+            self.queue.put_nowait(event)
+        except asyncio.QueueFull:
+            # 追いつけない接続は差分をあきらめて読み直してもらう
+            while not self.queue.empty():
+                self.queue.get_nowait()
+            self.queue.put_nowait(_RESYNC)
+
+
+class EventBroker:
+    """publish() はどのスレッドからでも呼べる。購読は async のジェネレーター（stream）で行う"""
+
+    def __init__(self, history=EVENTS_HISTORY):
+        # プロセスごとの識別子。再起動をまたいだ Last-Event-ID は使えないので resync にする
+        self._boot = uuid4().hex[:8]
+        self._next_id = 1
+        self._history = deque(maxlen=history)
+        self._subscribers = set()
+        self._lock = threading.Lock()
+
+    def publish(self, event_type, account_id, **data):
+        with self._lock:
+            event = {
+                "id": f"{self._boot}-{self._next_id}",
+                "seq": self._next_id,
+                "type": event_type,
+                "account_id": account_id,
+                **data,
+            }
+            self._next_id += 1
+            self._history.append(event)
+            subscribers = [s for s in self._subscribers if s.wants(event)]
+        for subscriber in subscribers:
+            try:
+                subscriber.loop.call_soon_threadsafe(subscriber.put, event)
+            except RuntimeError:
+                # イベントループが閉じている（切断処理中）
+                pass
+        return event
+
+    def _subscribe(self, account_id):
+        subscriber = _Subscriber(asyncio.get_running_loop(), account_id)
+        with self._lock:
+            self._subscribers.add(subscriber)
+        return subscriber
+
+    def _unsubscribe(self, subscriber):
+        with self._lock:
+            self._subscribers.discard(subscriber)
+
+    def _replay(self, subscriber, last_event_id):
+        """Last-Event-ID より後のイベント（送り直せない場合は resync）"""
+        boot, _, seq = (last_event_id or "").partition("-")
+        with self._lock:
+            history = list(self._history)
+            next_id = self._next_id
+        if boot != self._boot or not seq.isdigit() or int(seq) >= next_id:
+            return [_RESYNC]
+        seq = int(seq)
+        if seq + 1 < next_id and (not history or history[0]["seq"] > seq + 1):
+            # 覚えている範囲より前で途切れている
+            return [_RESYNC]
+        return [e for e in history if e["seq"] > seq and subscriber.wants(e)]
+
+    @property
+    def subscriber_count(self):
+        with self._lock:
+            return len(self._subscribers)
+
+    async def stream(self, account_id=None, last_event_id=None):
+        """text/event-stream の本文を返す async ジェネレーター"""
+        subscriber = self._subscribe(account_id)
+        sent = 0
+        deadline = time.monotonic() + EVENTS_MAX_STREAM_SECONDS
+        try:
+            yield f"retry: {EVENTS_RETRY_MS}\n\n"
+            pending = self._replay(subscriber, last_event_id) if last_event_id else []
+            while True:
+                for event in pending:
+                    seq = event.get("seq")
+                    # 購読開始と送り直しの両方に入ったイベントは1回だけ送る
+                    if seq is not None and seq <= sent:
+                        continue
+                    sent = seq or sent
+                    yield _format(event)
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return
+                try:
+                    event = await asyncio.wait_for(
+                        subscriber.queue.get(), min(EVENTS_HEARTBEAT_SECONDS, remaining)
+                    )
+                except asyncio.TimeoutError:
+                    yield ": ping\n\n"
+                    pending = []
+                    continue
+                pending = [event]
+        finally:
+            self._unsubscribe(subscriber)
+
+
+def _format(event):
+    lines = []
+    if "id" in event:
+        lines.append(f"id: {event['id']}")
+    lines.append(f"event: {event['type']}")
+    payload = {k: v for k, v in event.items() if k not in ("id", "seq")}
+    lines.append(f"data: {json.dumps(payload, ensure_ascii=False, default=_json_default)}")
+    return "\n".join(lines) + "\n\n"
+
+
+broker = EventBroker()
+
+
+def publish(event_type, account_id, **data):
+    return broker.publish(event_type, account_id, **data)
+
+
+def tweet_fields(tweet):
+    """画面の一覧に差し込むためのツイートの内容"""
+    return {
+        "id": tweet.id,
+        "content": tweet.content,
+        "image_names": tweet.image_names,
+        "scheduled_at": tweet.scheduled_at,
+        "posted_at": tweet.posted_at,
+        "status": tweet.status,
+    }
@@ -0,0 +1,554 @@
+# services/image_store.py
+"""
+画像のコンテンツアドレス型ストア。
+
+画像の実体は SHA-256 をキーに static/uploads/_blobs/<先頭2文字>/<sha256><拡張子> に1つだけ置き、
+アカウントごとの画像名（static/uploads/{account_id}/{name}）は実体へのハードリンクにする。
+同じ画像を何度・いくつのアカウントにアップロードしてもディスク上の実体は1つで、
+既存の URL（/uploads/{account_id}/{name}）や投稿時のファイルパスはそのまま使える。
+
+参照数は投稿待ち（送信中を含む）のツイートの image_names から数える。
+一度ツイートに使われ、その後どのツイートからも参照されなくなって（投稿済み・削除）猶予期間を
+過ぎた画像名は GC（collect_garbage）で削除し、どの画像名からも使われなくなった実体も合わせて削除する。
+まだ一度もツイートに使われていない画像（ギャラリーにアップロードしただけのもの）は、
+ユーザーが削除するまで残す。
+"""
+import base64
+import binascii
+import hashlib
+import json
+import logging
+import os
+import shutil
+from collections import Counter
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+from uuid import uuid4
+
+from sqlalchemy import and_, or_
+from sqlalchemy.exc import IntegrityError
+from sqlmodel import Session, select
+
+from models import (
+    engine,
+    AccountImage,
+    ImageBlob,
+    Tweet,
+    TWEET_PENDING,
+    TWEET_IN_FLIGHT,
+)
+from services.derivatives import image_size, remove_derivatives
+from services.uploads import HEADER_SIZE, detect_image_type
+
+logger = logging.getLogger(__name__)
+
+UPLOAD_DIR = "static/uploads"
+BLOB_DIR = os.path.join(UPLOAD_DIR, "_blobs")
+
+# ツイートから参照されなくなった画像名を削除するまでの猶予（時間）
+IMAGE_GC_GRACE_HOURS = int(os.getenv("IMAGE_GC_GRACE_HOURS", "72"))
+
+# 元のファイル名に拡張子がない場合に使う拡張子
+MIME_EXTENSIONS = {
+    "image/jpeg": ".jpg",
+    "image/png": ".png",
+    "image/gif": ".gif",
+    "image/webp": ".webp",
+}
+
+HASH_CHUNK_SIZE = 1024 * 1024
+
+
+def account_dir(account_id):
+    return os.path.join(UPLOAD_DIR, str(account_id))
+
+
+def image_path(account_id, name):
+    return os.path.join(account_dir(account_id), name)
+
+
+def blob_path(sha256, ext):
+    return os.path.join(BLOB_DIR, sha256[:2], f"{sha256}{ext}")
+
+
+def temp_path():
+    """アップロード中のファイルを置く一時パス（実体と同じファイルシステム上）"""
+    return os.path.join(BLOB_DIR, "tmp", uuid4().hex)
+
+
+def unique_name(original_name):
+    """ファイル名衝突を避けるためUUIDを付与"""
+    name, ext = os.path.splitext(os.path.basename(original_name or "image"))
+    safe_ext = ext if ext else ""
+    return f"{name}_{uuid4().hex}{safe_ext}"
+
+
+def _link(source, dest):
+    """ハードリンクを作る（作れないファイルシステムではコピーする）"""
+    os.makedirs(os.path.dirname(dest), exist_ok=True)
+    try:
+        os.link(source, dest)
+    except OSError:
+        shutil.copyfile(source, dest)
+
+
+def _remove(path):
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
+
+
+def _hash_file(path):
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(HASH_CHUNK_SIZE), b""):
+            digest.update(chunk)
+    return digest.hexdigest(), os.path.getsize(path)
+
+
+def _detect_mime_type(path):
+    with open(path, "rb") as f:
+        return detect_image_type(f.read(HEADER_SIZE))
+
+
+def _store_blob(session, source, sha256, ext, size, mime_type, move):
+    """
+    実体を登録してパスを返す。既に同じ内容の実体があればそれを使う。
+    move=True なら source を実体の位置へ移動し、False ならハードリンクを作る。
+    """
+    blob = session.get(ImageBlob, sha256)
+    if blob and os.path.exists(blob_path(sha256, blob.ext)):
+        if move:
+            _remove(source)
+        return blob_path(sha256, blob.ext)
+
+    path = blob_path(sha256, ext)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    if move:
+        os.replace(source, path)
+    elif not os.path.exists(path):
+        _link(source, path)
+    if blob is None:
+        blob = ImageBlob(sha256=sha256, ext=ext, size=size, mime_type=mime_type)
+    blob.ext = ext
+    if blob.width is None:
+        blob.width, blob.height = image_size(path)
+    blob.mime_type = blob.mime_type or mime_type or _detect_mime_type(path)
+    session.add(blob)
+    return path
+
+
+def add_image(account_id, original_name, temp_file, sha256, size, mime_type):
+    """
+    アップロード済みの一時ファイルをストアに登録し、アカウントでの画像名を返す。
+    同じアカウントに同じ内容の画像があれば、新しい名前は作らず既存の画像名を返す。
+    """
+    return store_image(account_id, original_name, temp_file, sha256, size, mime_type)[0]
+
+
+def store_image(account_id, original_name, temp_file, sha256, size, mime_type):
+    """add_image と同じ。(画像名, 新しく作った画像名か) を返す"""
+    ext = os.path.splitext(original_name or "")[1].lower() or MIME_EXTENSIONS.get(
+        mime_type, ""
+    )
+    # 同じ実体を同時に登録した場合は一意制約で片方が失敗するので、やり直す
+    for attempt in range(2):
+        with Session(engine) as session:
+            existing = session.exec(
+                select(AccountImage).where(
+                    AccountImage.account_id == account_id,
+                    AccountImage.sha256 == sha256,
+                )
+            ).first()
+            if existing and os.path.exists(image_path(account_id, existing.name)):
+                _remove(temp_file)
+                return existing.name, False
+
+            path = _store_blob(session, temp_file, sha256, ext, size, mime_type, True)
+            name = unique_name(original_name)
+            _link(path, image_path(account_id, name))
+            session.add(AccountImage(account_id=account_id, name=name, sha256=sha256))
+            try:
+                session.commit()
+            except IntegrityError:
+                session.rollback()
+                _remove(image_path(account_id, name))
+                if attempt:
+                    raise
+                continue
+            return name, True
+
+
+def find_image(session, account_id, name):
+    """アカウントの画像名に対応する (AccountImage, ImageBlob)。未登録なら None"""
+    row = session.exec(
+        select(AccountImage, ImageBlob).where(
+            AccountImage.account_id == account_id,
+            AccountImage.name == name,
+            ImageBlob.sha256 == AccountImage.sha256,
+        )
+    ).first()
+    return row
+
+
+# 画像一覧の並び順: 名前 -> (並べるカラム, 降順か)
+IMAGE_SORTS = {
+    "newest": (AccountImage.created_at, True),
+    "oldest": (AccountImage.created_at, False),
+    "name": (AccountImage.name, False),
+    "size": (ImageBlob.size, True),
+    "usage": (AccountImage.usage_count, True),
+}
+
+
+def _encode_cursor(value, image_id):
+    if isinstance(value, datetime):
+        value = value.isoformat()
+    raw = json.dumps([value, image_id])
+    return base64.urlsafe_b64encode(raw.encode()).decode()
+
+
+def _decode_cursor(sort, cursor):
+    """カーソルを (並び順の値, id) に戻す。不正なら ValueError"""
+    try:
+        value, image_id = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        if IMAGE_SORTS[sort][0] is AccountImage.created_at:
+            value = datetime.fromisoformat(value)
+        return value, int(image_id)
+    except (TypeError, ValueError, binascii.Error):
+        raise ValueError("無効なカーソルです")
+
+
+def image_info(image, blob):
+    """画像一覧で返す1件分のメタデータ"""
+    return {
+        "name": image.name,
+        "size": blob.size,
+        "width": blob.width,
+        "height": blob.height,
+        "mime_type": blob.mime_type,
+        "uploaded_at": image.created_at,
+        "usage_count": image.usage_count,
+    }
+
+
+def list_page(session, account_id, sort="newest", cursor=None, limit=60):
+    """
+    アカウントの画像を (並び順の値, id) のキーセットで1ページ分取得する。
+    戻り値は (メタデータのリスト, 次ページのカーソル or None)。
+    """
+    column, descending = IMAGE_SORTS[sort]
+    statement = select(AccountImage, ImageBlob).where(
+        AccountImage.account_id == account_id,
+        ImageBlob.sha256 == AccountImage.sha256,
+    )
+    if cursor:
+        value, last_id = _decode_cursor(sort, cursor)
+        if descending:
+            statement = statement.where(
+                or_(column < value, and_(column == value, AccountImage.id < last_id))
+            )
+        else:
+            statement = statement.where(
+                or_(column > value, and_(column == value, AccountImage.id > last_id))
+            )
+    if descending:
+        statement = statement.order_by(column.desc(), AccountImage.id.desc())
+    else:
+        statement = statement.order_by(column, AccountImage.id)
+    # 次ページの有無を判定するため1件多く取得する
+    rows = session.exec(statement.limit(limit + 1)).all()
+
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        image, blob = rows[-1]
+        last_value = blob.size if column is ImageBlob.size else getattr(image, column.key)
+        next_cursor = _encode_cursor(last_value, image.id)
+    return [image_info(image, blob) for image, blob in rows], next_cursor
+
+
+def image_names(session, account_id):
+    """アカウントの画像名（アップロード順）"""
+    return session.exec(
+        select(AccountImage.name)
+        .where(AccountImage.account_id == account_id)
+        .order_by(AccountImage.created_at, AccountImage.id)
+    ).all()
+
+
+def find_references(session, account_id, name):
+    """画像名を使っている投稿待ち（送信中を含む）のツイート数"""
+    return len(
+        session.exec(
+            select(Tweet.id).where(
+                Tweet.account_id == account_id,
+                Tweet.status.in_([TWEET_PENDING, TWEET_IN_FLIGHT]),
+                Tweet.image_names.contains(json.dumps(name), autoescape=True),
+            )
+        ).all()
+    )
+
+
+def remove_image(session, account_id, name):
+    """アカウントの画像名を削除する（実体は GC で削除される）。存在しなければ False"""
+    mapping = session.exec(
+        select(AccountImage).where(
+            AccountImage.account_id == account_id, AccountImage.name == name
+        )
+    ).first()
+    path = image_path(account_id, name)
+    found = mapping is not None or os.path.exists(path)
+    if mapping:
+        session.delete(mapping)
+        session.commit()
+    _remove(path)
+    return found
+
+
+def discard_images(account_id, names):
+    """
+    登録を取り消す画像名を、実体（他から使われていなければ）と合わせてすぐに削除する。
+    一度も使われていない画像は GC の対象にならないため、予約に失敗したときに呼ぶ。
+    その間に予約中のツイートから使われた画像名は残す。後始末なので、失敗しても例外は投げない。
+    """
+    try:
+        removed_names, removed_blobs = _discard_images(account_id, names)
+    except Exception:
+        logger.exception(f"アカウント {account_id} の画像 {len(names)}件を削除できませんでした")
+        return
+    # ファイルは DB をコミットしてから消す
+    for path in removed_names:
+        _remove(path)
+    for sha256, path in removed_blobs:
+        _remove(path)
+        remove_derivatives(sha256)
+
+
+def _discard_images(account_id, names):
+    removed_names = []
+    removed_blobs = []
+    with Session(engine) as session:
+        for name in names:
+            found = find_image(session, account_id, name)
+            if not found or find_references(session, account_id, name):
+                continue
+            image, blob = found
+            session.delete(image)
+            session.flush()
+            path = image_path(account_id, name)
+            removed_names.append(path)
+            others = session.exec(
+                select(AccountImage.id).where(AccountImage.sha256 == blob.sha256)
+            ).first()
+            # 同時に登録された画像名のリンクが残っていれば実体は消さない（GC と同じ確認）
+            blob_file = blob_path(blob.sha256, blob.ext)
+            links = os.stat(blob_file).st_nlink if os.path.exists(blob_file) else 0
+            if others is None and links <= 1 + os.path.exists(path):
+                session.delete(blob)
+                removed_blobs.append((blob.sha256, blob_file))
+        session.commit()
+    return removed_names, removed_blobs
+
+
+def _adopt_files(session, now, use_mtime=False):
+    """
+    ストアに登録されていない画像ファイル（この仕組みより前にアップロードされたもの）を取り込む。
+    実体を作り、アカウント側のファイルはそのまま実体へのハードリンクになる。
+    use_mtime=True ならファイルの更新日時をアップロード日時として記録する。
+    """
+    known = set(session.exec(select(AccountImage.account_id, AccountImage.name)).all())
+    adopted = 0
+    for entry in os.scandir(UPLOAD_DIR) if os.path.isdir(UPLOAD_DIR) else []:
+        if not entry.is_dir() or not entry.name.isdigit():
+            continue
+        account_id = int(entry.name)
+        for file in os.scandir(entry.path):
+            if not file.is_file() or file.name.endswith(".part"):
+                continue
+            if (account_id, file.name) in known:
+                continue
+            sha256, size = _hash_file(file.path)
+            ext = os.path.splitext(file.name)[1].lower()
+            path = _store_blob(session, file.path, sha256, ext, size, None, False)
+            if not os.path.samefile(path, file.path):
+                # 同じ内容の実体が既にあれば、アカウント側をそのリンクに置き換える
+                tmp = file.path + ".part"
+                _link(path, tmp)
+                os.replace(tmp, file.path)
+            created_at = (
+                datetime.fromtimestamp(file.stat().st_mtime) if use_mtime else now
+            )
+            session.add(
+                AccountImage(
+                    account_id=account_id,
+                    name=file.name,
+                    sha256=sha256,
+                    created_at=created_at,
+                )
+            )
+            adopted += 1
+    return adopted
+
+
+def backfill(session):
+    """
+    既存のアップロードディレクトリを走査して画像一覧のテーブルを埋める（マイグレーションから1回だけ呼ぶ）。
+    既に登録済みの実体も、寸法・MIME タイプが未設定なら埋める。コミットは呼び出し側で行う。
+    """
+    now = datetime.now()
+    adopted = _adopt_files(session, now, use_mtime=True)
+    session.flush()
+    for blob in session.exec(
+        select(ImageBlob).where(or_(ImageBlob.width == None, ImageBlob.mime_type == None))
+    ).all():
+        path = blob_path(blob.sha256, blob.ext)
+        if not os.path.exists(path):
+            continue
+        blob.width, blob.height = image_size(path)
+        blob.mime_type = blob.mime_type or _detect_mime_type(path)
+        session.add(blob)
+    session.flush()
+    if adopted:
+        logger.info(f"既存の画像 {adopted}件を画像一覧に取り込みました")
+    return adopted
+
+
+def _referenced_names(session):
+    """投稿待ち（送信中を含む）のツイートが使っている (account_id, 画像名) ごとの参照数"""
+    counts = Counter()
+    rows = session.exec(
+        select(Tweet.account_id, Tweet.image_names).where(
+            Tweet.status.in_([TWEET_PENDING, TWEET_IN_FLIGHT])
+        )
+    )
+    for account_id, image_names in rows:
+        try:
+            names = json.loads(image_names or "[]")
+        except ValueError:
+            continue
+        for name in names:
+            counts[(account_id, name)] += 1
+    return counts
+
+
+def _remove_stale_temp_files(expired_before):
+    """中断されたアップロードの一時ファイルを削除する"""
+    tmp_dir = os.path.dirname(temp_path())
+    if not os.path.isdir(tmp_dir):
+        return
+    for entry in os.scandir(tmp_dir):
+        if datetime.fromtimestamp(entry.stat().st_mtime) < expired_before:
+            _remove(entry.path)
+
+
+@contextmanager
+def _write_session():
+    """最初に書き込みロックを取るセッション（コミットまで他の書き込みを待たせる）"""
+    with Session(engine) as session:
+        if engine.dialect.name == "sqlite":
+            session.connection().exec_driver_sql("BEGIN IMMEDIATE")
+        yield session
+
+
+def _delete_unreferenced(candidate_ids, expired_before):
+    """
+    候補の画像名と、どの画像名からも使われなくなった実体を削除する。
+    書き込みロックを取ってから参照を数え直すので、候補を選んだ後に予約されたツイートが
+    使う画像は消さない。削除するファイルのパスを返す（消すのはコミットの後）。
+    """
+    removed_names = []
+    removed_blobs = []
+    with _write_session() as session:
+        unlinked = Counter()  # 実体ごとの、これから消すハードリンクの数
+        for image_id in candidate_ids:
+            image = session.get(AccountImage, image_id)
+            if (
+                image is None
+                or image.last_referenced_at is None
+                or image.last_referenced_at >= expired_before
+                or find_references(session, image.account_id, image.name)
+            ):
+                continue
+            session.delete(image)
+            path = image_path(image.account_id, image.name)
+            removed_names.append(path)
+            if os.path.exists(path):
+                unlinked[image.sha256] += 1
+        session.flush()
+
+        orphans = session.exec(
+            select(ImageBlob).where(
+                ImageBlob.sha256.not_in(select(AccountImage.sha256).distinct())
+            )
+        ).all()
+        for blob in orphans:
+            path = blob_path(blob.sha256, blob.ext)
+            # GC と同時に登録された画像名のリンクが残っていれば消さない
+            if os.path.exists(path) and os.stat(path).st_nlink > 1 + unlinked[blob.sha256]:
+                continue
+            session.delete(blob)
+            removed_blobs.append((blob.sha256, path))
+        session.commit()
+    return removed_names, removed_blobs
+
+
+def collect_garbage(now=None):
+    """
+    参照されなくなった画像名と、使われなくなった実体を削除する。
+    参照数を更新して削除の候補を選び、削除は書き込みロックの中で参照を数え直してから行う。
+    DB をコミットしてからファイルを消すので、途中で失敗してもファイルだけが残る側に倒れる
+    （残ったファイルは次回の GC で取り込まれ、猶予期間後に削除される）。
+    """
+    now = now or datetime.now()
+    expired_before = now - timedelta(hours=IMAGE_GC_GRACE_HOURS)
+    candidate_ids = []
+
+    _remove_stale_temp_files(expired_before)
+    with Session(engine) as session:
+        adopted = _adopt_files(session, now)
+        session.flush()
+
+        referenced = _referenced_names(session)
+        blob_refs = Counter()
+        for image in session.exec(select(AccountImage)).all():
+            count = referenced.get((image.account_id, image.name), 0)
+            if count != image.usage_count:
+                image.usage_count = count
+                session.add(image)
+            if count:
+                image.last_referenced_at = now
+                session.add(image)
+            elif (
+                # 一度も使われていない画像は消さない（猶予はツイートから外れた時点から数える）
+                image.last_referenced_at is not None
+                and image.last_referenced_at < expired_before
+            ):
+                candidate_ids.append(image.id)
+            blob_refs[image.sha256] += count
+
+        for blob in session.exec(select(ImageBlob)).all():
+            if blob.ref_count != blob_refs[blob.sha256]:
+                blob.ref_count = blob_refs[blob.sha256]
+                session.add(blob)
+        session.commit()
+
+    removed_names, removed_blobs = _delete_unreferenced(candidate_ids, expired_before)
+
+    for path in removed_names:
+        _remove(path)
+    for sha256, path in removed_blobs:
+        _remove(path)
+        remove_derivatives(sha256)
+
+    if adopted or removed_names or removed_blobs:
+        logger.info(
+            f"画像の GC: 取り込み {adopted}件、画像名の削除 {len(removed_names)}件、"
+            f"実体の削除 {len(removed_blobs)}件"
+        )
+    return {
+        "adopted": adopted,
+        "removed_names": len(removed_names),
+        "removed_blobs": len(removed_blobs),
+    }
@@ -0,0 +1,179 @@
+# services/ingest.py
+"""
+CSV / NDJSON ファイルからツイートを一括予約する。
+
+ファイルは1行ずつ読み込んで検証し、INGEST_BATCH_SIZE 件ごとに1つの INSERT 文
+（executemany）でまとめて書き込む。ファイル全体をメモリに載せないため、数千〜数万行でも扱える。
+不正な行はスキップし、行番号付きのエラーとして返す（INGEST_MAX_ERRORS 件まで）。
+
+CSV: ヘッダー行に content, image_names, scheduled_at
+     （image_names は "a.jpg|b.jpg" または JSON 配列）
+NDJSON: 1行1オブジェクト {"content": ..., "image_names": [...], "scheduled_at": ...}
+"""
+import codecs
+import csv
+import json
+import logging
+import os
+from datetime import datetime
+
+from sqlalchemy import insert
+from sqlalchemy.exc import SQLAlchemyError
+
+from models import Tweet, TWEET_PENDING
+
+logger = logging.getLogger(__name__)
+
+# 1回の INSERT にまとめる件数
+INGEST_BATCH_SIZE = int(os.getenv("INGEST_BATCH_SIZE", "500"))
+# 1ファイルで読み込む最大行数
+INGEST_MAX_ROWS = int(os.getenv("INGEST_MAX_ROWS", "100000"))
+# レスポンスに含めるエラーの最大件数（件数自体はすべて数える）
+INGEST_MAX_ERRORS = 100
+# X で1ツイートに添付できる画像の最大数
+MAX_IMAGES_PER_TWEET = 4
+
+FORMATS = ("csv", "ndjson")
+
+
+class IngestError(ValueError):
+    """ファイル全体が読み込めない場合のエラー（形式・ヘッダーの不備など）"""
+
+
+def _parse_image_names(value):
+    """"a.jpg|b.jpg"、JSON 配列の文字列、リストのいずれかを画像名のリストにする"""
+    if value is None or value == "":
+        return []
+    if isinstance(value, str):
+        value = value.strip()
+        if value.startswith("["):
+            try:
+                value = json.loads(value)
+            except ValueError:
+                raise ValueError("image_names の JSON が不正です")
+        else:
+            return [name.strip() for name in value.split("|") if name.strip()]
+    if not isinstance(value, list) or not all(isinstance(n, str) for n in value):
+        raise ValueError("image_names は画像名の配列で指定してください")
+    return value
+
+
+def validate_row(record, account_id, known_images):
+    """1行分のデータを検証し、INSERT する値の dict を返す（不正なら ValueError）"""
+    content = record.get("content") or ""
+    if not isinstance(content, str):
+        raise ValueError("content は文字列で指定してください")
+    content = content.strip()
+    image_names = _parse_image_names(record.get("image_names"))
+
+    if not content and not image_names:
+        raise ValueError("テキストまたは画像を指定してください")
+    if len(image_names) > MAX_IMAGES_PER_TWEET:
+        raise ValueError(f"画像は{MAX_IMAGES_PER_TWEET}枚までです")
+    missing = [name for name in image_names if name not in known_images]
+    if missing:
+        raise ValueError(f"画像が見つかりません: {', '.join(missing)}")
+
+    try:
+        scheduled_at = datetime.fromisoformat(record.get("scheduled_at"))
+    except (ValueError, TypeError):
+        raise ValueError("無効な日時形式です")
+
+    return {
+        "account_id": account_id,
+        "content": content,
+        "image_names": json.dumps(image_names),
+        "is_posted": False,
+        "scheduled_at": scheduled_at,
+        "status": TWEET_PENDING,
+    }
+
+
+def _csv_records(stream):
+    reader = csv.DictReader(stream)
+    fields = set(reader.fieldnames or [])
+    if "scheduled_at" not in fields or not fields & {"content", "image_names"}:
+        raise IngestError(
+            "CSV のヘッダーに scheduled_at と content / image_names が必要です"
+        )
+    for record in reader:
+        yield reader.line_num, record
+
+
+def _ndjson_records(stream):
+    for line_no, line in enumerate(stream, 1):
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            record = json.loads(line)
+        except ValueError:
+            yield line_no, ValueError("JSON として読み込めません")
+            continue
+        if not isinstance(record, dict):
+            yield line_no, ValueError("1行に1つのオブジェクトを指定してください")
+            continue
+        yield line_no, record
+
+
+def read_records(binary, fmt):
+    """バイナリのファイルオブジェクトから (行番号, レコード) を1件ずつ返す"""
+    if fmt not in FORMATS:
+        raise IngestError(f"対応していない形式です: {fmt}")
+    # BOM 付きの UTF-8（Excel で保存した CSV など）も読めるようにする
+    stream = codecs.getreader("utf-8-sig")(binary)
+    records = _csv_records(stream) if fmt == "csv" else _ndjson_records(stream)
+    try:
+        yield from records
+    except UnicodeDecodeError:
+        raise IngestError("ファイルは UTF-8 で保存してください")
+
+
+def ingest_tweets(session, account_id, binary, fmt, known_images, on_batch=None):
+    """
+    ファイルのツイートを検証しながらバッチ単位で INSERT・コミットする。
+    on_batch にはコミットしたバッチの (id, scheduled_at) の行が渡される。
+    """
+    statement = insert(Tweet).returning(Tweet.id, Tweet.scheduled_at)
+    result = {"created_count": 0, "error_count": 0, "total": 0, "errors": []}
+    batch = []
+
+    def add_error(line_no, message):
+        result["error_count"] += 1
+        if len(result["errors"]) < INGEST_MAX_ERRORS:
+            result["errors"].append(f"{line_no}行目: {message}")
+
+    def flush():
+        rows = session.execute(statement, batch).all()
+        session.commit()
+        result["created_count"] += len(rows)
+        batch.clear()
+        if on_batch:
+            on_batch(rows)
+
+    try:
+        for line_no, record in read_records(binary, fmt):
+            if result["total"] >= INGEST_MAX_ROWS:
+                add_error(line_no, f"{INGEST_MAX_ROWS}行を超えたため以降は読み込みません")
+                break
+            result["total"] += 1
+            if isinstance(record, Exception):
+                add_error(line_no, str(record))
+                continue
+            try:
+                batch.append(validate_row(record, account_id, known_images))
+            except ValueError as e:
+                add_error(line_no, str(e))
+                continue
+            if len(batch) >= INGEST_BATCH_SIZE:
+                flush()
+        if batch:
+            flush()
+    except SQLAlchemyError as e:
+        # コミット済みのバッチは残る（件数は created_count に反映済み）
+        session.rollback()
+        logger.error(f"一括予約の保存に失敗しました (account_id={account_id}): {e}")
+        add_error(line_no, f"DB保存エラー: {e}（以降は登録されていません）")
+
+    result["status"] = "success" if result["created_count"] > 0 else "failed"
+    return result
@@ -0,0 +1,251 @@
+# services/metrics.py
+"""
+Prometheus 形式（text exposition format 0.0.4）のメトリクス。
+
+外部ライブラリは使わず、カウンター・ゲージ・ヒストグラムを最小限に実装する。
+記録は「ラベルの組 → 値」の辞書をロック付きで更新するだけなので、本番でも常時有効にできる。
+GET /metrics（main.py）で render() の結果を返す。
+"""
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+
+from sqlalchemy import event
+
+# 秒単位の既定のバケット（API 呼び出し・DB クエリ向け）
+DEFAULT_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_labels(names, values, extra=()):
+    pairs = [*zip(names, values), *extra]
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape(value)}"' for name, value in pairs) + "}"
+
+
+def _format_value(value):
+    if value == float("inf"):
+        return "+Inf"
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    return repr(value) if isinstance(value, float) else str(value)
+
+
+class _Metric:
+    type_name = ""
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def _key(self, labels):
+        if set(labels) != set(self.labelnames):
+            raise ValueError(f"{self.name}: ラベルは {self.labelnames} を指定してください")
+        return tuple(str(labels[name]) for name in self.labelnames)
+
+    def _header(self):
+        return [
+            f"# HELP {self.name} {self.documentation}",
+            f"# TYPE {self.name} {self.type_name}",
+        ]
+
+
+class Counter(_Metric):
+    type_name = "counter"
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def render(self):
+        with self._lock:
+            values = dict(self._values)
+        lines = self._header()
+        for key, value in sorted(values.items()):
+            lines.append(f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}")
+        return lines
+
+
+class Gauge(_Metric):
+    """値を set() で上書きするゲージ。set_all() でラベルの組ごと入れ替えられる"""
+
+    type_name = "gauge"
+
+    def set(self, value, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = value
+
+    def set_all(self, values):
+        """{ラベル値のタプル: 値} で全体を置き換える（消えたラベルの組は出力しない）"""
+        with self._lock:
+            self._values = {tuple(str(v) for v in key): value for key, value in values.items()}
+
+    render = Counter.render
+
+
+class Histogram(_Metric):
+    type_name = "histogram"
+
+    def __init__(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value, **labels):
+        key = self._key(labels)
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            state = self._values.get(key)
+            if state is None:
+                # [各バケットの件数（累積前）..., 合計, 件数]
+                state = self._values[key] = [0] * (len(self.buckets) + 1) + [0.0, 0]
+            state[index] += 1
+            state[-2] += value
+            state[-1] += 1
+
+    @contextmanager
+    def time(self, **labels):
+        """with ブロックの所要時間（秒）を記録する"""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, **labels)
+
+    def render(self):
+        with self._lock:
+            values = {key: list(state) for key, state in self._values.items()}
+        lines = self._header()
+        for key, state in sorted(values.items()):
+            cumulative = 0
+            for bound, count in zip((*self.buckets, float("inf")), state):
+                cumulative += count
+                labels = _format_labels(self.labelnames, key, [("le", _format_value(float(bound)))])
+                lines.append(f"{self.name}_bucket{labels} {cumulative}")
+            labels = _format_labels(self.labelnames, key)
+            lines.append(f"{self.name}_sum{labels} {_format_value(state[-2])}")
+            lines.append(f"{self.name}_count{labels} {state[-1]}")
+        return lines
+
+
+_registry = []
+
+
+def _register(metric):
+    _registry.append(metric)
+    return metric
+
+
+def render():
+    """登録済みのメトリクスを text exposition format にする"""
+    lines = []
+    for metric in _registry:
+        lines.extend(metric.render())
+    return "\n".join(lines) + "\n"
+
+
+# ===== 投稿処理 =====
+PENDING_TWEETS = _register(
+    Gauge(
+        "xbm_pending_tweets",
+        "投稿待ち・送信中のツイート数（スクレイプ時に集計）",
+        ["account_id", "status"],
+    )
+)
+DISPATCH_LAG = _register(
+    Histogram(
+        "xbm_dispatch_lag_seconds",
+        "予約時刻から実際に投稿されるまでの遅れ（posted_at - scheduled_at）",
+        buckets=(0.5, 1, 2, 5, 10, 30, 60, 120, 300, 600, 1800, 3600, 21600),
+    )
+)
+POST_PHASE = _register(
+    Histogram(
+        "xbm_post_phase_seconds",
+        "投稿処理の段階ごとの所要時間（decrypt / media_upload / create_tweet）",
+        ["phase"],
+    )
+)
+TWEETS_PROCESSED = _register(
+    Counter(
+        "xbm_tweets_processed_total",
+        "投稿処理の結果ごとのツイート数（posted / retry / failed / rate_limited）",
+        ["result"],
+    )
+)
+X_API_ERRORS = _register(
+    Counter(
+        "xbm_x_api_errors_total",
+        "X API 呼び出しのエラー数（status は HTTP ステータス、429 はレート制限。通信エラーは exception）",
+        ["endpoint", "status"],
+    )
+)
+SCHEDULER_LOOP = _register(
+    Histogram(
+        "xbm_scheduler_loop_seconds",
+        "スケジューラーの1回の実行（期限の来たツイートの取得から投稿まで）の所要時間",
+        buckets=(0.01, 0.05, 0.1, 0.5, 1, 5, 10, 30, 60, 300, 900),
+    )
+)
+
+# ===== 画面 =====
+EVENT_STREAMS = _register(
+    Gauge("xbm_event_streams", "接続中の変更イベント（GET /events）のストリーム数")
+)
+
+# ===== データベース =====
+DB_QUERY = _register(
+    Histogram(
+        "xbm_db_query_seconds",
+        "SQL の実行時間（engine: write / read、operation: SELECT / INSERT / UPDATE / DELETE / OTHER）",
+        ["engine", "operation"],
+    )
+)
+
+_OPERATIONS = {"SELECT", "INSERT", "UPDATE", "DELETE"}
+
+
+def _operation(statement):
+    verb = statement.lstrip()[:6].upper()
+    return verb if verb in _OPERATIONS else "OTHER"
+
+
+def instrument_engine(engine, name):
+    """SQLAlchemy のエンジン（async の場合は sync_engine）の SQL 実行時間を記録する"""
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def _before(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault("metrics_started", []).append(time.perf_counter())
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def _after(conn, cursor, statement, parameters, context, executemany):
+        started = conn.info.get("metrics_started")
+        if started:
+            DB_QUERY.observe(
+                time.perf_counter() - started.pop(),
+                engine=name,
+                operation=_operation(statement),
+            )
+
+    @event.listens_for(engine, "handle_error")
+    def _error(context):
+        # 失敗した SQL は after_cursor_execute が呼ばれないため、開始時刻だけ捨てる
+        connection = context.connection
+        if connection is not None and connection.info.get("metrics_started"):
+            connection.info["metrics_started"].pop()
+
+
+def record_x_api_error(endpoint, error):
+    """X API 呼び出しの例外を記録する（tweepy.HTTPException ならステータスコード別）"""
+    response = getattr(error, "response", None)
+    status = getattr(response, "status_code", None) or getattr(response, "status", None)
+    X_API_ERRORS.inc(endpoint=endpoint, status=status or "exception")
@@ -0,0 +1,173 @@
+# services/rate_limiter.py
+"""
+X API のレート制限を考慮した送信制御（トークンバケット）。
+
+- ユーザーコンテキスト: アカウントごとのバケット（x-rate-limit-* / x-user-limit-24hour-*）
+- アプリコンテキスト: コンシューマーキーごとのバケット（x-app-limit-24hour-*）
+
+バケットは既定値で初期化し、tweepy のレスポンスヘッダーを受け取るたびに
+X 側の残り回数・リセット時刻で上書きする。上限に達している間は投稿を送らずに延期する。
+"""
+import hashlib
+import os
+import threading
+import time
+
+# ユーザーごとの POST /2/tweets の上限（ヘッダーを受け取るまでの初期値）
+X_USER_TWEET_LIMIT = int(os.getenv("X_USER_TWEET_LIMIT", "100"))
+X_USER_TWEET_WINDOW = int(os.getenv("X_USER_TWEET_WINDOW", "900"))
+# ユーザーごとの24時間あたりの上限
+X_USER_DAILY_TWEET_LIMIT = int(os.getenv("X_USER_DAILY_TWEET_LIMIT", "2400"))
+# アプリ（コンシューマーキー）ごとの上限
+X_APP_TWEET_LIMIT = int(os.getenv("X_APP_TWEET_LIMIT", "10000"))
+X_APP_TWEET_WINDOW = int(os.getenv("X_APP_TWEET_WINDOW", "86400"))
+
+# 上限に達したがリセット時刻が分からない場合の待ち時間（秒）
+DEFAULT_BACKOFF_SECONDS = 60
+
+
+def app_key_for(consumer_key):
+    """コンシューマーキーをそのまま保持しないためのハッシュ"""
+    return hashlib.sha256(consumer_key.encode()).hexdigest()[:16]
+
+
+class TokenBucket:
+    """容量 limit、window 秒で満タンに戻るトークンバケット"""
+
+    def __init__(self, limit, window_seconds):
+        self.limit = limit
+        self.rate = limit / window_seconds
+        self.tokens = float(limit)
+        self.updated = time.time()
+        self.blocked_until = 0.0  # X から上限到達を通知された場合のリセット時刻
+
+    def _refill(self, now):
+        if self.blocked_until:
+            if now < self.blocked_until:
+                return
+            # リセット時刻を過ぎたら満タンに戻す
+            self.blocked_until = 0.0
+            self.tokens = float(self.limit)
+        else:
+            self.tokens = min(self.limit, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def wait_time(self, now):
+        """トークンが1つ使えるようになるまでの秒数（0 なら今すぐ使える）"""
+        self._refill(now)
+        if self.blocked_until:
+            return self.blocked_until - now
+        if self.tokens >= 1:
+            return 0.0
+        return (1 - self.tokens) / self.rate
+
+    def take(self):
+        self.tokens -= 1
+
+    def sync(self, limit, remaining, reset_at, now):
+        """レスポンスヘッダーの値（上限・残り回数・リセット時刻）でバケットを上書きする"""
+        if limit:
+            self.limit = limit
+        self.tokens = float(min(remaining, self.limit))
+        self.updated = now
+        if remaining <= 0:
+            if reset_at and reset_at > now:
+                self.blocked_until = reset_at
+            else:
+                self.blocked_until = now + DEFAULT_BACKOFF_SECONDS
+
+
+def _int_header(headers, name):
+    value = headers.get(name)
+    try:
+        return int(value) if value is not None else None
+    except ValueError:
+        return None
+
+
+class RateLimiter:
+    """アカウント・コンシューマーキーごとのバケットを管理する"""
+
+    def __init__(self):
+        self._buckets = {}
+        self._lock = threading.Lock()
+
+    def _bucket(self, key):
+        bucket = self._buckets.get(key)
+        if bucket is None:
+            if key[0] == "app":
+                bucket = TokenBucket(X_APP_TWEET_LIMIT, X_APP_TWEET_WINDOW)
+            elif key[0] == "user24":
+                bucket = TokenBucket(X_USER_DAILY_TWEET_LIMIT, 24 * 60 * 60)
+            else:
+                bucket = TokenBucket(X_USER_TWEET_LIMIT, X_USER_TWEET_WINDOW)
+            self._buckets[key] = bucket
+        return bucket
+
+    def _keys(self, account_id, app_key):
+        return [("user", account_id), ("user24", account_id), ("app", app_key)]
+
+    def acquire(self, account_id, app_key):
+        """
+        投稿1回分のトークンを取得する。取得できれば 0、
+        上限に達していれば送信可能になるまでの秒数を返す（トークンは消費しない）。
+        """
+        now = time.time()
+        with self._lock:
+            buckets = [self._bucket(key) for key in self._keys(account_id, app_key)]
+            wait = max(bucket.wait_time(now) for bucket in buckets)
+            if wait > 0:
+                return wait
+            for bucket in buckets:
+                bucket.take()
+            return 0.0
+
+    def wait_time(self, account_id, app_key):
+        """送信可能になるまでの秒数を返す（トークンは消費しない）"""
+        now = time.time()
+        with self._lock:
+            return max(
+                self._bucket(key).wait_time(now) for key in self._keys(account_id, app_key)
+            )
+
+    def observe(self, account_id, app_key, headers):
+        """POST /2/tweets のレスポンスヘッダーからバケットを更新する"""
+        now = time.time()
+        groups = [
+            (("user", account_id), "x-rate-limit"),
+            (("user24", account_id), "x-user-limit-24hour"),
+            (("app", app_key), "x-app-limit-24hour"),
+        ]
+        with self._lock:
+            for key, prefix in groups:
+                remaining = _int_header(headers, f"{prefix}-remaining")
+                if remaining is None:
+                    continue
+                self._bucket(key).sync(
+                    _int_header(headers, f"{prefix}-limit"),
+                    remaining,
+                    _int_header(headers, f"{prefix}-reset"),
+                    now,
+                )
+
+    def block_until(self, account_id, reset_at):
+        """429 でリセット時刻が分からない場合などに、アカウントを一定時間止める"""
+        with self._lock:
+            bucket = self._bucket(("user", account_id))
+            bucket.tokens = 0.0
+            bucket.blocked_until = max(bucket.blocked_until, reset_at)
+
+
+limiter = RateLimiter()
+
+
+def response_hook(account_id, app_key):
+    """requests のレスポンスフック。ツイート投稿のレスポンスだけを見る"""
+
+    def hook(response, *args, **kwargs):
+        request = response.request
+        if request.method == "POST" and request.path_url.startswith("/2/tweets"):
+            limiter.observe(account_id, app_key, response.headers)
+        return response
+
+    return hook
@@ -1,73 +1,559 @@
 # services/scheduler.py
 from apscheduler.schedulers.background import BackgroundScheduler
+from concurrent.futures import ThreadPoolExecutor, wait
 from sqlmodel import Session, select
-from models import engine, Account, Tweet
-from services.x_service import send_tweet_with_media
-from datetime import datetime
+from models import (
+    engine,
+    Account,
+    Tweet,
+    TWEET_PENDING,
+    TWEET_IN_FLIGHT,
+    TWEET_POSTED,
+    TWEET_FAILED,
+)
+from services.x_service import send_tweet_with_media, upload_media
+from services.client_pool import get_clients
+from services.rate_limiter import limiter
+from services.dispatch_queue import (
+    CLAIM_BATCH_SIZE,
+    claim_due_tweets,
+    keep_leases,
+    lease_expiry,
+    release_leases,
+)
+from services.status_writer import status_writer
+from services.image_store import collect_garbage
+from services.archive import TWEET_ARCHIVE_INTERVAL_MINUTES, archive_tweets
+from services.metrics import DISPATCH_LAG, SCHEDULER_LOOP, TWEETS_PROCESSED
+from services import events
+from datetime import datetime, timedelta
+import heapq
 import logging
 import json
+import os
+import threading
+import time
+import tweepy
 
 # ログの設定（動いているか確認できるようにする）
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# 同時に投稿処理を行うアカウント数の上限（1 なら従来どおり直列に処理）
+SCHEDULER_MAX_WORKERS = max(1, int(os.getenv("SCHEDULER_MAX_WORKERS", "8")))
 
-def check_and_post():
-    """DBをチェックして投稿するメイン処理"""
-    with Session(engine) as session:
-        # naive datetime で現在時刻を取得（TZ=Asia/Tokyo 環境変数で JST になる）
-        now = datetime.now()
-        # 1. 投稿待ち(is_posted=False) かつ 予定時刻(scheduled_at)が現在より前で、失敗していないものを取得
-        statement = select(Tweet).where(
-            Tweet.is_posted == False,
-            Tweet.is_failed == False,
-            Tweet.scheduled_at <= now,
+# DB を読み直して予約時刻の一覧を作り直す間隔（秒）。他プロセスで追加された予約もここで拾う
+SCHEDULER_RESYNC_SECONDS = int(os.getenv("SCHEDULER_RESYNC_SECONDS", "600"))
+# 投稿に失敗したツイートを再試行するまでの待ち時間（レート制限のリセット時刻が不明な場合も同じ）
+RETRY_DELAY = timedelta(minutes=1)
+
+# 予約時刻の何分前から画像を事前アップロードするか（0 で無効）
+MEDIA_PRESTAGE_MINUTES = int(os.getenv("MEDIA_PRESTAGE_MINUTES", "30"))
+# 事前アップロード済み media_id を使うのに必要な残り有効期間
+MEDIA_EXPIRY_MARGIN = timedelta(minutes=5)
+
+# 使われなくなった画像を削除する間隔（分）
+IMAGE_GC_INTERVAL_MINUTES = int(os.getenv("IMAGE_GC_INTERVAL_MINUTES", "60"))
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def _get_executor():
+    """アカウント単位の投稿に使うスレッドプールを取得（初回のみ作成）"""
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=SCHEDULER_MAX_WORKERS, thread_name_prefix="dispatch"
+            )
+        return _executor
+
+
+def _earliest(*times):
+    """None を除いた最も早い時刻を返す"""
+    times = [t for t in times if t is not None]
+    return min(times) if times else None
+
+
+def _post_tweet(account, tweet):
+    """
+    1件のツイートを投稿し、DBに書き込む値の辞書を返す。
+    レート制限（429）で送れなかった場合は None を返す（リトライ回数は消費しない）。
+    """
+    try:
+        # image_names (JSON文字列) をリストに変換
+        image_names = json.loads(tweet.image_names) if tweet.image_names else []
+
+        content_preview = tweet.content[:20] if tweet.content else "(画像のみ)"
+        logger.info(f"投稿実行中: {content_preview}... (画像: {len(image_names)}枚)")
+
+        # 事前アップロード済みで有効期限内の media_id があれば使う
+        media_ids = None
+        if (
+            tweet.media_ids
+            and tweet.media_expires_at
+            and tweet.media_expires_at > datetime.now() + MEDIA_EXPIRY_MARGIN
+        ):
+            media_ids = json.loads(tweet.media_ids)
+
+        # 実際にXへ投稿（複数画像対応）
+        send_tweet_with_media(account, tweet.content, image_names, media_ids=media_ids)
+
+        # DBの状態を「投稿済み」に更新
+        logger.info(f"投稿成功！")
+        posted_at = datetime.now()
+        TWEETS_PROCESSED.inc(result="posted")
+        if tweet.scheduled_at:
+            DISPATCH_LAG.observe(max(0.0, (posted_at - tweet.scheduled_at).total_seconds()))
+        return {"status": TWEET_POSTED, "is_posted": True, "posted_at": posted_at}
+    except tweepy.TooManyRequests as e:
+        logger.warning(f"レート制限のため投稿を延期します (ID: {tweet.id}): {e}")
+        TWEETS_PROCESSED.inc(result="rate_limited")
+        return None
+    except Exception as e:
+        return _failure_values(tweet, e)
+
+
+def _failure_values(tweet, error, exc_info=False):
+    """投稿に失敗したツイートに書き込む値（再試行、3回目なら failed）"""
+    # 事前アップロード分が原因の可能性もあるため、次回は投稿時にアップロードし直す
+    values = {
+        "status": TWEET_PENDING,
+        "media_ids": None,
+        "media_expires_at": None,
+        "retry_count": tweet.retry_count + 1,
+        "next_attempt_at": datetime.now() + RETRY_DELAY,
+    }
+    TWEETS_PROCESSED.inc(result="failed" if values["retry_count"] >= 3 else "retry")
+    if values["retry_count"] >= 3:
+        values["status"] = TWEET_FAILED
+        values["is_failed"] = True
+        logger.error(
+            f"投稿失敗 (ID: {tweet.id}): {error!r} → 3回失敗したため is_failed=True",
+            exc_info=exc_info,
         )
-        pending_tweets = session.exec(statement).all()
+    else:
+        logger.error(
+            f"投稿失敗 (ID: {tweet.id}): {error!r} （リトライ {values['retry_count']}/3）",
+            exc_info=exc_info,
+        )
+    return values
+
 
-        for tweet in pending_tweets:
-            # 2. 紐づくアカウント情報を取得
-            account = session.get(Account, tweet.account_id)
+def _publish_result(future, tweet, values):
+    """結果がコミットされたら画面に posted / failed を知らせる（再試行待ちは知らせない）"""
+    event_type = {TWEET_POSTED: events.EVENT_POSTED, TWEET_FAILED: events.EVENT_FAILED}.get(
+        values["status"]
+    )
+    if event_type is None:
+        return
+
+    def done(f):
+        if f.exception() is None and f.result():
+            fields = events.tweet_fields(tweet)
+            fields.update(status=values["status"], posted_at=values.get("posted_at"))
+            events.publish(event_type, tweet.account_id, tweet=fields)
+
+    future.add_done_callback(done)
+
+
+def _rate_limit_wait(account, take=True):
+    """
+    レート制限の空きを確認し、送れるなら 0、送れないなら待ち秒数を返す。
+    take なら送る1回分を消費する（False は待ち時間を見るだけ）。
+    """
+    clients = get_clients(account)
+    if take:
+        return limiter.acquire(account.id, clients.app_key)
+    return limiter.wait_time(account.id, clients.app_key)
+
+
+def _load(model, row_id):
+    """行を読み込んでセッションから切り離す（読み取りトランザクションを長く持たない）"""
+    with Session(engine) as session:
+        row = session.get(model, row_id)
+        if row:
+            session.expunge(row)
+        return row
+
+
+def _dispatch_account(token, account_id, tweet_ids):
+    """
+    1アカウント分のツイートを scheduled_at 順に投稿する（ワーカースレッドで実行）。
+    token のリースを持っているツイートだけを処理する。
+    再試行・延期したツイートがあれば、次に起床すべき時刻を返す。
+    延期したツイートには next_attempt_at を付けるので、その時刻までは他のワーカーも取得しない。
+
+    状態遷移: pending →(送信前に確定)→ in_flight →(投稿結果)→ posted / pending（再試行）/ failed
+    in_flight を書き込んでから送信するので、途中でプロセスが落ちても再送はされない。
+    """
+    wake_at = None
+    # 残りのリースを解放するときに、この時刻まで延期する
+    retry_at = None
+    try:
+        # 処理中（送信中を含む）はリースを延長し続け、他のワーカーに取られないようにする
+        with keep_leases(token, account_id):
+            account = _load(Account, account_id)
             if not account:
-                continue
+                retry_at = datetime.now() + RETRY_DELAY
+                return retry_at
+
+            for tweet_id in tweet_ids:
+                tweet = _load(Tweet, tweet_id)
+                # 取得後に削除・処理済みになったもの、リースを失ったものはスキップ
+                if (
+                    not tweet
+                    or tweet.status != TWEET_PENDING
+                    or tweet.lease_owner != token
+                ):
+                    continue
+
+                # レート制限に達していれば送らずに延期（このアカウントの残りも順番を守って延期）
+                try:
+                    wait_seconds = _rate_limit_wait(account)
+                except Exception as e:
+                    # 認証情報の復号・クライアントの作成に失敗した場合も、送信失敗と同じく再試行・failed にする
+                    values = _failure_values(tweet, e, exc_info=True)
+                    values.update(lease_owner=None, lease_expires_at=None)
+                    future = status_writer.submit(
+                        tweet_id, values, lease_owner=token, status=TWEET_PENDING
+                    )
+                    _publish_result(future, tweet, values)
+                    if values["status"] == TWEET_PENDING:
+                        wake_at = _earliest(wake_at, values["next_attempt_at"])
+                    continue
+                if wait_seconds > 0:
+                    logger.info(
+                        f"アカウント {account_id} はレート制限中のため {int(wait_seconds)} 秒後に再開します"
+                    )
+                    retry_at = datetime.now() + timedelta(seconds=wait_seconds)
+                    return retry_at
+
+                # 送信前に in_flight を確定させる（リースも延長し、送信中に期限が切れないようにする）
+                if not status_writer.write(
+                    tweet_id,
+                    {"status": TWEET_IN_FLIGHT, "lease_expires_at": lease_expiry(datetime.now())},
+                    lease_owner=token,
+                    status=TWEET_PENDING,
+                ):
+                    continue
+
+                values = _post_tweet(account, tweet)
+                if values is None:
+                    # 429: 送信されていないので pending に戻して延期
+                    status_writer.write(
+                        tweet_id,
+                        {"status": TWEET_PENDING},
+                        lease_owner=token,
+                        status=TWEET_IN_FLIGHT,
+                    )
+                    # ヘッダーでバケットが更新されていなければ一定時間止める
+                    wait_seconds = _rate_limit_wait(account, take=False)
+                    if wait_seconds <= 0:
+                        limiter.block_until(account_id, time.time() + RETRY_DELAY.total_seconds())
+                        wait_seconds = RETRY_DELAY.total_seconds()
+                    retry_at = datetime.now() + timedelta(seconds=wait_seconds)
+                    return retry_at
+
+                # 結果はライターがまとめてコミットする（完了は待たない）
+                values.update(lease_owner=None, lease_expires_at=None)
+                future = status_writer.submit(
+                    tweet_id, values, lease_owner=token, status=TWEET_IN_FLIGHT
+                )
+                _publish_result(future, tweet, values)
+                if values["status"] == TWEET_PENDING:
+                    wake_at = _earliest(wake_at, values["next_attempt_at"])
+    except Exception:
+        # 同じエラーで取り直しを繰り返さないよう、残りは少し待ってから再開する
+        retry_at = datetime.now() + RETRY_DELAY
+        raise
+    finally:
+        # 投稿結果（リースの解放を含む）のコミットを待ってから残りを解放する。
+        # 送信中のまま残った行があると、次の取得でこのアカウントごと対象外になってしまう
+        status_writer.flush()
+        # 未処理分のリースはすぐ他のワーカーに渡す（延期した場合はその時刻から）
+        with Session(engine) as session:
+            release_leases(session, token, account_id, retry_at=retry_at)
+    return wake_at
 
+
+def _dispatch_claimed(token, claimed):
+    """取得したツイートをアカウントごとに投稿する。次に起床すべき時刻を返す"""
+    # アカウントごとにまとめる（各アカウント内は scheduled_at 順を維持）
+    by_account = {}
+    for tweet_id, account_id in claimed:
+        by_account.setdefault(account_id, []).append(tweet_id)
+
+    if SCHEDULER_MAX_WORKERS == 1 or len(by_account) == 1:
+        wake_at = None
+        for account_id, tweet_ids in by_account.items():
+            # 1アカウントのエラーで残りのアカウントを止めない（並列の場合と同じ）
             try:
-                # image_names (JSON文字列) をリストに変換
-                image_names = json.loads(tweet.image_names) if tweet.image_names else []
+                wake_at = _earliest(wake_at, _dispatch_account(token, account_id, tweet_ids))
+            except Exception:
+                logger.exception(f"アカウント {account_id} の投稿処理でエラー")
+                wake_at = _earliest(wake_at, datetime.now() + RETRY_DELAY)
+        return wake_at
+
+    # アカウント単位で並列に投稿（同一アカウントは1ワーカー内で順番に処理）
+    executor = _get_executor()
+    futures = {
+        executor.submit(_dispatch_account, token, account_id, tweet_ids): account_id
+        for account_id, tweet_ids in by_account.items()
+    }
+    wait(futures)
+    wake_at = None
+    for future, account_id in futures.items():
+        exc = future.exception()
+        if exc:
+            logger.error(f"アカウント {account_id} の投稿処理でエラー", exc_info=exc)
+            wake_at = _earliest(wake_at, datetime.now() + RETRY_DELAY)
+        else:
+            wake_at = _earliest(wake_at, future.result())
+    return wake_at
+
+
+def check_and_post():
+    """
+    DBをチェックして投稿するメイン処理。
+    再試行・レート制限で延期したツイートがあれば、次に起床すべき時刻を返す。
+    """
+    wake_at = None
+    while True:
+        # naive datetime で現在時刻を取得（TZ=Asia/Tokyo 環境変数で JST になる）
+        # 期限の来た未投稿のツイートを、他のワーカーと重複しないようリース付きで取得
+        token, claimed = claim_due_tweets(datetime.now())
+        if not claimed:
+            break
+        wake_at = _earliest(wake_at, _dispatch_claimed(token, claimed))
+        # 取得上限に満たなければ残りはない。再試行・延期したものは next_attempt_at まで
+        # 取得されないので、他のアカウントの分はそのまま取り続ける
+        if len(claimed) < CLAIM_BATCH_SIZE:
+            break
+    return wake_at
+
+
+def _prestage_account(account_id, tweet_ids):
+    """1アカウント分の画像を事前アップロードし、media_id を保存する"""
+    account = _load(Account, account_id)
+    if not account:
+        return
+
+    for tweet_id in tweet_ids:
+        tweet = _load(Tweet, tweet_id)
+        if not tweet or tweet.status != TWEET_PENDING:
+            continue
+        image_names = json.loads(tweet.image_names) if tweet.image_names else []
+        try:
+            media_ids, expires_at = upload_media(
+                account, image_names, raise_on_error=True
+            )
+        except Exception as e:
+            # 失敗しても投稿時にアップロードし直すので、ここでは記録しない
+            logger.warning(f"画像の事前アップロード失敗 (ID: {tweet.id}): {e}")
+            continue
+        if not media_ids:
+            continue
+        status_writer.submit(
+            tweet_id,
+            {"media_ids": json.dumps(media_ids), "media_expires_at": expires_at},
+            status=TWEET_PENDING,
+        )
+
+
+def prestage_media():
+    """予約時刻が近い画像付きツイートの画像を先にアップロードしておく"""
+    if MEDIA_PRESTAGE_MINUTES <= 0:
+        return
+
+    now = datetime.now()
+    horizon = now + timedelta(minutes=MEDIA_PRESTAGE_MINUTES)
+    with Session(engine) as session:
+        statement = (
+            select(Tweet.id, Tweet.account_id, Tweet.media_ids, Tweet.media_expires_at)
+            .where(
+                Tweet.status == TWEET_PENDING,
+                Tweet.scheduled_at > now,
+                Tweet.scheduled_at <= horizon,
+                Tweet.image_names != "",
+                Tweet.image_names != "[]",
+            )
+            .order_by(Tweet.scheduled_at, Tweet.id)
+        )
+        rows = session.exec(statement).all()
+
+    by_account = {}
+    for tweet_id, account_id, media_ids, expires_at in rows:
+        # 予約時刻まで有効な media_id が既にあれば対象外
+        if media_ids and expires_at and expires_at > horizon + MEDIA_EXPIRY_MARGIN:
+            continue
+        by_account.setdefault(account_id, []).append(tweet_id)
+
+    if not by_account:
+        return
+
+    executor = _get_executor()
+    futures = {
+        executor.submit(_prestage_account, account_id, tweet_ids): account_id
+        for account_id, tweet_ids in by_account.items()
+    }
+    wait(futures)
+    for future, account_id in futures.items():
+        exc = future.exception()
+        if exc:
+            logger.error(f"アカウント {account_id} の事前アップロードでエラー: {exc}")
 
-                content_preview = tweet.content[:20] if tweet.content else "(画像のみ)"
-                logger.info(
-                    f"投稿実行中: {content_preview}... (画像: {len(image_names)}枚)"
+
+class DispatchLoop:
+    """
+    予約時刻の min-heap を持ち、次の予約時刻まで眠って check_and_post を実行するループ。
+
+    予約の追加・削除は notify_* で通知され、より早い予約が入ればすぐに起きて
+    待ち時間を計算し直す。1回の実行が長引いても、その間に期限が来た予約は
+    heap に残っているので次の周回で必ず処理される（実行がスキップされない）。
+    """
+
+    def __init__(self, run, resync_seconds):
+        self._run = run
+        self._resync_interval = timedelta(seconds=resync_seconds)
+        self._heap = []  # (scheduled_at, tweet_id) の min-heap
+        self._entries = {}  # tweet_id -> scheduled_at（削除・変更されたものは heap 上で無効扱い）
+        self._cond = threading.Condition()
+        self._next_resync = datetime.min
+        self._thread = None
+
+    def start(self):
+        self._thread = threading.Thread(
+            target=self._loop, name="dispatch-loop", daemon=True
+        )
+        self._thread.start()
+
+    def notify_scheduled(self, scheduled_at, tweet_id=None):
+        """予約の追加・変更を通知する（tweet_id が None の場合は起床時刻だけ登録）"""
+        if scheduled_at is None:
+            return
+        with self._cond:
+            if tweet_id is not None:
+                self._entries[tweet_id] = scheduled_at
+            heapq.heappush(self._heap, (scheduled_at, tweet_id or 0))
+            # 先頭が変わった場合だけ起こせば十分
+            if self._heap[0][0] == scheduled_at:
+                self._cond.notify_all()
+
+    def notify_removed(self, tweet_id):
+        """予約の削除を通知する（heap からは次に先頭に来たときに取り除く）"""
+        with self._cond:
+            self._entries.pop(tweet_id, None)
+            self._cond.notify_all()
+
+    def _is_valid(self, scheduled_at, tweet_id):
+        return not tweet_id or self._entries.get(tweet_id) == scheduled_at
+
+    def _resync(self, now):
+        """DB から直近の未投稿の予約を読み込んで heap を作り直す"""
+        horizon = now + self._resync_interval * 2
+        with Session(engine) as session:
+            rows = session.exec(
+                select(Tweet.id, Tweet.scheduled_at, Tweet.next_attempt_at).where(
+                    Tweet.status == TWEET_PENDING,
+                    Tweet.scheduled_at <= horizon,
                 )
+            ).all()
+        # 延期したツイートは、予約時刻ではなく次に取得できる時刻に起きる
+        rows = [(tweet_id, max(at, retry_at or at)) for tweet_id, at, retry_at in rows]
+        with self._cond:
+            # 範囲外の予約は通知済みのものを残す（次回以降の resync でも拾われる）
+            entries = {
+                tweet_id: at
+                for tweet_id, at in self._entries.items()
+                if at > horizon
+            }
+            entries.update({tweet_id: at for tweet_id, at in rows})
+            self._entries = entries
+            self._heap = [(at, tweet_id) for tweet_id, at in entries.items()]
+            heapq.heapify(self._heap)
+        self._next_resync = now + self._resync_interval
 
-                # 3. 実際にXへ投稿（複数画像対応）
-                send_tweet_with_media(account, tweet.content, image_names)
-
-                # 4. DBの状態を「投稿済み」に更新
-                tweet.is_posted = True
-                tweet.posted_at = now
-                session.add(tweet)
-                logger.info(f"投稿成功！")
-            except Exception as e:
-                tweet.retry_count += 1
-                if tweet.retry_count >= 3:
-                    tweet.is_failed = True
-                    logger.error(
-                        f"投稿失敗 (ID: {tweet.id}): {e} → 3回失敗したため is_failed=True"
-                    )
-                else:
-                    logger.error(
-                        f"投稿失敗 (ID: {tweet.id}): {e} （リトライ {tweet.retry_count}/3）"
-                    )
-                session.add(tweet)
+    def _wait_for_due(self):
+        """期限の来た予約が出るまで待つ。resync が必要になったら False を返す"""
+        with self._cond:
+            while True:
+                now = datetime.now()
+                if now >= self._next_resync:
+                    return False
+                while self._heap and not self._is_valid(*self._heap[0]):
+                    heapq.heappop(self._heap)
+                if self._heap and self._heap[0][0] <= now:
+                    # 期限の来たエントリを取り出す（未処理分は DB に残るので再取得される）
+                    while self._heap and self._heap[0][0] <= now:
+                        at, tweet_id = heapq.heappop(self._heap)
+                        if tweet_id and self._entries.get(tweet_id) == at:
+                            del self._entries[tweet_id]
+                    return True
+                wake = self._next_resync
+                if self._heap and self._heap[0][0] < wake:
+                    wake = self._heap[0][0]
+                self._cond.wait((wake - now).total_seconds())
+
+    def _loop(self):
+        while True:
+            try:
+                if not self._wait_for_due():
+                    # 起動直後と一定間隔ごとに DB と同期し、期限切れの予約があればすぐ処理する
+                    self._resync(datetime.now())
+                    continue
+                with SCHEDULER_LOOP.time():
+                    wake_at = self._run()
+                if wake_at:
+                    self.notify_scheduled(wake_at)
+            except Exception:
+                logger.exception("スケジューラーのループでエラー")
+                # DB エラーなどで連続して失敗しないよう少し待ってから同期し直す
+                with self._cond:
+                    self._next_resync = datetime.now() + RETRY_DELAY
+
+
+_dispatch_loop = DispatchLoop(check_and_post, SCHEDULER_RESYNC_SECONDS)
 
-        session.commit()
+
+def notify_tweet_scheduled(scheduled_at, tweet_id=None):
+    """予約の追加をスケジューラーに通知する"""
+    _dispatch_loop.notify_scheduled(scheduled_at, tweet_id)
+
+
+def notify_tweet_removed(tweet_id):
+    """予約の削除をスケジューラーに通知する"""
+    _dispatch_loop.notify_removed(tweet_id)
 
 
 def start_scheduler():
     """スケジュールの開始"""
+    # 投稿は予約時刻ベースで起床するループで行う
+    _dispatch_loop.start()
+
     scheduler = BackgroundScheduler()
-    # 1分ごとに check_and_post を実行
-    scheduler.add_job(check_and_post, "interval", minutes=1)
+    # 5分ごとに直近の予約の画像を事前アップロード
+    scheduler.add_job(
+        prestage_media, "interval", minutes=5, max_instances=1, coalesce=True
+    )
+    # 投稿済み・削除済みのツイートでしか使われていない画像を定期的に削除
+    scheduler.add_job(
+        collect_garbage,
+        "interval",
+        minutes=IMAGE_GC_INTERVAL_MINUTES,
+        max_instances=1,
+        coalesce=True,
+    )
+    # 保存期間を過ぎた投稿済み・失敗ツイートを TweetArchive に移す（投稿処理が読む Tweet を小さく保つ）
+    scheduler.add_job(
+        archive_tweets,
+        "interval",
+        minutes=TWEET_ARCHIVE_INTERVAL_MINUTES,
+        max_instances=1,
+        coalesce=True,
+    )
     scheduler.start()
-    logger.info("スケジューラーが起動しました（1分ごとにチェックします）")
+    logger.info(
+        f"スケジューラーが起動しました（予約時刻に合わせて投稿します、並列数: {SCHEDULER_MAX_WORKERS}）"
+    )
@@ -0,0 +1,62 @@
+# services/slots.py
+"""
+一括予約の投稿時刻の割り当て。
+
+- 間隔指定: 開始日時から interval_minutes 分ごと
+- 時間帯スケジュール（HourlySchedule）: 開始日時以降の登録時刻（"09:00" など）に毎日順番に
+- 期間内の時間帯スケジュールの枠（空き枠への割り当ては services/allocator.py）
+"""
+from datetime import datetime, time, timedelta
+
+
+def parse_hours(hours):
+    """["09:00", "18:30"] を time のソート済みリストにする（不正な値は ValueError）"""
+    parsed = set()
+    for value in hours:
+        try:
+            hour, minute = str(value).split(":")
+            parsed.add(time(int(hour), int(minute)))
+        except (TypeError, ValueError):
+            raise ValueError(f"無効な時刻です: {value}")
+    if not parsed:
+        raise ValueError("時間を指定してください")
+    return sorted(parsed)
+
+
+def interval_slots(start_at, count, interval_minutes):
+    """開始日時から一定間隔の時刻を count 個返す"""
+    if interval_minutes <= 0:
+        raise ValueError("投稿間隔は1分以上にしてください")
+    step = timedelta(minutes=interval_minutes)
+    return [start_at + step * i for i in range(count)]
+
+
+def hourly_slots(start_at, count, hours):
+    """開始日時以降、毎日の登録時刻を早い順に count 個返す"""
+    times = parse_hours(hours)
+    slots = []
+    day = start_at.date()
+    while len(slots) < count:
+        for t in times:
+            slot = datetime.combine(day, t)
+            if slot < start_at:
+                continue
+            slots.append(slot)
+            if len(slots) == count:
+                break
+        day += timedelta(days=1)
+    return slots
+
+
+def iter_hourly_slots(hours, start_at, end_at):
+    """start_at 以上 end_at 未満の、毎日の登録時刻を早い順に返す（ジェネレーター）"""
+    times = parse_hours(hours)
+    day = start_at.date()
+    while True:
+        for t in times:
+            slot = datetime.combine(day, t)
+            if slot >= end_at:
+                return
+            if slot >= start_at:
+                yield slot
+        day += timedelta(days=1)
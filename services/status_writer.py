@@ -0,0 +1,118 @@
+# services/status_writer.py
+"""
+ツイートの状態遷移をまとめて DB に書き込むライター。
+
+各ワーカーは状態が変わった時点で submit() し、ライターのスレッドが
+少し待って集まった更新を1つのトランザクションでコミットする（グループコミット）。
+送信前の in_flight のように確定させてから次へ進みたい遷移は write() で完了を待つ。
+"""
+import logging
+import os
+import queue
+import threading
+import time
+from concurrent.futures import Future
+
+from sqlalchemy import update
+from sqlmodel import Session
+
+from models import engine, Tweet
+
+logger = logging.getLogger(__name__)
+
+# 1トランザクションにまとめる最大件数と、更新が集まるのを待つ最大時間（秒）
+STATUS_BATCH_SIZE = int(os.getenv("STATUS_BATCH_SIZE", "100"))
+STATUS_BATCH_DELAY = float(os.getenv("STATUS_BATCH_DELAY", "0.05"))
+# 書き込みに失敗したときの試行回数
+WRITE_ATTEMPTS = 3
+
+
+class StatusWriter:
+    """状態遷移の更新をキューで受け取り、まとめてコミットする"""
+
+    def __init__(self, batch_size=STATUS_BATCH_SIZE, batch_delay=STATUS_BATCH_DELAY):
+        self._batch_size = batch_size
+        self._batch_delay = batch_delay
+        self._queue = queue.Queue()
+        self._thread = None
+        self._lock = threading.Lock()
+
+    def _ensure_started(self):
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(
+                    target=self._loop, name="status-writer", daemon=True
+                )
+                self._thread.start()
+
+    def submit(self, tweet_id, values, **conditions):
+        """
+        状態遷移を登録し、Future を返す（結果は更新できたかどうかの bool）。
+        conditions は「この値のときだけ更新する」条件（例: lease_owner=token）。
+        """
+        self._ensure_started()
+        future = Future()
+        self._queue.put((tweet_id, values, conditions, future))
+        return future
+
+    def write(self, tweet_id, values, **conditions):
+        """状態遷移を登録し、コミットされるまで待つ"""
+        return self.submit(tweet_id, values, **conditions).result()
+
+    def flush(self):
+        """ここまでに登録された更新がコミットされるまで待つ"""
+        self.submit(None, None).result()
+
+    def _collect(self):
+        """最初の1件を待ち、その後は batch_delay の間に届いた分をまとめて取り出す"""
+        batch = [self._queue.get()]
+        while len(batch) < self._batch_size:
+            try:
+                batch.append(self._queue.get(timeout=self._batch_delay))
+            except queue.Empty:
+                break
+        return batch
+
+    def _apply(self, session, tweet_id, values, conditions):
+        statement = update(Tweet).where(Tweet.id == tweet_id)
+        for name, value in conditions.items():
+            statement = statement.where(getattr(Tweet, name) == value)
+        result = session.execute(
+            statement.values(**values).execution_options(synchronize_session=False)
+        )
+        return result.rowcount > 0
+
+    def _commit(self, batch):
+        """バッチを1トランザクションで書き込み、各更新の結果を返す"""
+        results = []
+        with Session(engine) as session:
+            for tweet_id, values, conditions, _ in batch:
+                if tweet_id is None:
+                    # flush() 用の目印
+                    results.append(True)
+                    continue
+                results.append(self._apply(session, tweet_id, values, conditions))
+            session.commit()
+        return results
+
+    def _loop(self):
+        while True:
+            batch = self._collect()
+            # DB ロック待ちなどの一時的なエラーに備えて数回やり直す
+            for attempt in range(WRITE_ATTEMPTS):
+                try:
+                    results = self._commit(batch)
+                    break
+                except Exception as e:
+                    error = e
+                    time.sleep(0.2 * (attempt + 1))
+            else:
+                logger.error(f"状態の書き込みに失敗しました ({len(batch)}件): {error}")
+                for *_, future in batch:
+                    future.set_exception(error)
+                continue
+            for (*_, future), result in zip(batch, results):
+                future.set_result(result)
+
+
+status_writer = StatusWriter()
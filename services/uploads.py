@@ -0,0 +1,162 @@
+# services/uploads.py
+"""
+画像アップロードの検証と保存。
+
+ファイルは UPLOAD_CHUNK_SIZE ごとに読み込んで書き込み、上限サイズを超えた時点で中断する
+（1アップロードあたりのメモリ使用量はファイルサイズではなくチャンクサイズで決まる）。
+ファイル形式は Content-Type ではなく先頭のマジックバイトで判定する。
+ディスクへの書き込みはスレッドプールで行い、イベントループを止めない。
+書き込みながら SHA-256 を計算し、画像ストア（services/image_store.py）の登録に使う。
+"""
+import hashlib
+import os
+
+from starlette.concurrency import run_in_threadpool
+
+from services.derivatives import RECOMPRESS_MAX_BYTES, can_recompress, recompress
+
+ALLOWED_MIME_TYPES = {"image/jpeg", "image/png", "image/gif", "image/webp"}
+MAX_SIZE_BYTES = 5 * 1024 * 1024  # 5MB（通常画像）
+MAX_GIF_SIZE_BYTES = 15 * 1024 * 1024  # 15MB（GIF）
+
+# 1回に読み書きするサイズ
+UPLOAD_CHUNK_SIZE = int(os.getenv("UPLOAD_CHUNK_SIZE", str(256 * 1024)))
+# 形式の判定に使う先頭のバイト数
+HEADER_SIZE = 12
+
+
+class UploadError(ValueError):
+    """アップロードされたファイルが受け付けられない場合のエラー"""
+
+
+def detect_image_type(header):
+    """先頭のバイト列から画像の MIME タイプを判定する（対応形式でなければ None）"""
+    if header.startswith(b"\xff\xd8\xff"):
+        return "image/jpeg"
+    if header.startswith(b"\x89PNG\r\n\x1a\n"):
+        return "image/png"
+    if header[:6] in (b"GIF87a", b"GIF89a"):
+        return "image/gif"
+    if header[:4] == b"RIFF" and header[8:12] == b"WEBP":
+        return "image/webp"
+    return None
+
+
+def size_limit(mime_type):
+    return MAX_GIF_SIZE_BYTES if mime_type == "image/gif" else MAX_SIZE_BYTES
+
+
+def _prefix(filename):
+    return f"{filename}: " if filename else ""
+
+
+def check_header(header, filename=""):
+    """形式を判定し、MIME タイプを返す。非対応なら UploadError"""
+    mime_type = detect_image_type(header)
+    if mime_type not in ALLOWED_MIME_TYPES:
+        raise UploadError(
+            f"{_prefix(filename)}サポートされていないファイル形式です。JPEG / PNG / GIF / WebP のみ許可されています。"
+        )
+    return mime_type
+
+
+def accepted_size(mime_type):
+    """受け付ける最大サイズ（再圧縮が有効なら、上限を超えた分は保存後に圧縮する）"""
+    if can_recompress(mime_type):
+        return max(RECOMPRESS_MAX_BYTES, size_limit(mime_type))
+    return size_limit(mime_type)
+
+
+def check_size(mime_type, size, filename=""):
+    limit = accepted_size(mime_type)
+    if size > limit:
+        raise UploadError(
+            f"{_prefix(filename)}ファイルサイズが上限（{limit // (1024 * 1024)}MB）を超えています。"
+        )
+
+
+def _remove(path):
+    if os.path.exists(path):
+        os.remove(path)
+
+
+def _open_part(path):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    return open(path + ".part", "wb")
+
+
+def _finish(buffer, path):
+    buffer.close()
+    os.replace(path + ".part", path)
+
+
+def _abort(buffer, path):
+    buffer.close()
+    _remove(path + ".part")
+
+
+def copy_upload(source, path, filename=""):
+    """
+    ファイルオブジェクトから path へチャンク単位でコピーする（同期版）。
+    書き込み中は path + ".part" に書き、完了してから名前を変える。
+    戻り値は (サイズ, MIME タイプ, SHA-256)。
+    """
+    chunk = source.read(UPLOAD_CHUNK_SIZE)
+    mime_type = check_header(chunk[:HEADER_SIZE], filename)
+    size = 0
+    digest = hashlib.sha256()
+    buffer = _open_part(path)
+    try:
+        while chunk:
+            size += len(chunk)
+            check_size(mime_type, size, filename)
+            digest.update(chunk)
+            buffer.write(chunk)
+            chunk = source.read(UPLOAD_CHUNK_SIZE)
+    except BaseException:
+        _abort(buffer, path)
+        raise
+    _finish(buffer, path)
+    return size, mime_type, digest.hexdigest()
+
+
+async def save_upload(file, path):
+    """
+    UploadFile をチャンク単位で読み込み、path へ保存する（async 版）。
+    上限サイズを超えた時点で中断し、書きかけのファイルは削除する。
+    戻り値は (サイズ, MIME タイプ, SHA-256)。
+    """
+    chunk = await file.read(UPLOAD_CHUNK_SIZE)
+    mime_type = check_header(chunk[:HEADER_SIZE], file.filename)
+    size = 0
+    digest = hashlib.sha256()
+    buffer = await run_in_threadpool(_open_part, path)
+    try:
+        while chunk:
+            size += len(chunk)
+            check_size(mime_type, size, file.filename)
+            digest.update(chunk)
+            await run_in_threadpool(buffer.write, chunk)
+            chunk = await file.read(UPLOAD_CHUNK_SIZE)
+    except BaseException:
+        await run_in_threadpool(_abort, buffer, path)
+        raise
+    await run_in_threadpool(_finish, buffer, path)
+    return size, mime_type, digest.hexdigest()
+
+
+def fit_to_limit(path, size, mime_type, sha256, filename):
+    """
+    保存した画像が X の上限を超えていれば再圧縮する（IMAGE_AUTO_RECOMPRESS=1 のときだけ
+    上限超えの画像がここまで来る）。戻り値は (サイズ, MIME タイプ, SHA-256, ファイル名)。
+    """
+    if size <= size_limit(mime_type):
+        return size, mime_type, sha256, filename
+    try:
+        size, mime_type, sha256 = recompress(path, size_limit(mime_type))
+    except Exception:
+        _remove(path)
+        raise UploadError(f"{_prefix(filename)}画像を上限サイズ以下に圧縮できませんでした。")
+    # 中身は JPEG になるので拡張子も合わせる
+    filename = os.path.splitext(filename or "image")[0] + ".jpg"
+    return size, mime_type, sha256, filename
@@ -1,73 +1,77 @@
+from services.client_pool import get_clients
+from services.metrics import POST_PHASE, record_x_api_error
 import tweepy
-from services.encryption import decrypt_data
+from datetime import datetime, timedelta
+import logging
 import os
 
+logger = logging.getLogger(__name__)
+
+# media_upload のレスポンスに有効期限がない場合の既定値（X の仕様では24時間）
+DEFAULT_MEDIA_EXPIRES_SECS = 24 * 60 * 60
+
 
 def send_hello_world(account):
-    # 1. 保存された情報を復号
-    api_key = decrypt_data(account.api_key)
-    api_secret = decrypt_data(account.api_secret)
-    access_token = decrypt_data(account.access_token)
-    access_secret = decrypt_data(account.access_token_secret)
-
-    # 2. X API (v2) クライアントの初期化
-    client = tweepy.Client(
-        consumer_key=api_key,
-        consumer_secret=api_secret,
-        access_token=access_token,
-        access_token_secret=access_secret,
-    )
-
-    # 3. 投稿実行
+    # 1. キャッシュ済みの X API (v2) クライアントを取得（なければ復号して作成）
+    client = get_clients(account).client_v2
+
+    # 2. 投稿実行
     response = client.create_tweet(text="Hello World! from my Python Bot")
     return response
 
 
-def send_tweet_with_media(account, text, image_names=None):
-    """複数画像対応のツイート投稿関数（最大4枚、本文なし投稿も可能）"""
-    import logging
+def upload_media(account, image_names, raise_on_error=False):
+    """
+    画像をアップロードして (media_ids, 有効期限) を返す（最大4枚）。
+    raise_on_error=True の場合、アップロード失敗時に例外を送出する（事前アップロード用）。
+    """
+    api_v1 = get_clients(account).api_v1
+
+    media_ids = []
+    expires_at = None
+    for img_name in (image_names or [])[:4]:  # 最大4枚まで
+        file_path = f"static/uploads/{account.id}/{img_name}"
 
-    logger = logging.getLogger(__name__)
+        if not os.path.exists(file_path):
+            logger.warning(f"画像が見つかりません: {file_path}")
+            continue
 
-    # 復号処理
-    auth_info = {
-        "ck": decrypt_data(account.api_key),
-        "cs": decrypt_data(account.api_secret),
-        "at": decrypt_data(account.access_token),
-        "as": decrypt_data(account.access_token_secret),
-    }
+        try:
+            with POST_PHASE.time(phase="media_upload"):
+                media = api_v1.media_upload(filename=file_path)
+        except tweepy.TooManyRequests as e:
+            # レート制限は画像なしで投稿せず、呼び出し元で延期させる
+            record_x_api_error("media_upload", e)
+            raise
+        except Exception as e:
+            record_x_api_error("media_upload", e)
+            logger.error(f"画像アップロード失敗 ({img_name}): {e}")
+            if raise_on_error:
+                raise
+            continue
 
-    # v1.1 API（画像アップロード用）
-    auth_v1 = tweepy.OAuth1UserHandler(
-        auth_info["ck"], auth_info["cs"], auth_info["at"], auth_info["as"]
-    )
-    api_v1 = tweepy.API(auth_v1)
+        media_ids.append(media.media_id)
+        expires_secs = (
+            getattr(media, "expires_after_secs", None) or DEFAULT_MEDIA_EXPIRES_SECS
+        )
+        media_expires_at = datetime.now() + timedelta(seconds=expires_secs)
+        if expires_at is None or media_expires_at < expires_at:
+            expires_at = media_expires_at
+        logger.info(f"画像アップロード成功: {img_name}")
 
-    # v2 API（ツイート投稿用）
-    client_v2 = tweepy.Client(
-        consumer_key=auth_info["ck"],
-        consumer_secret=auth_info["cs"],
-        access_token=auth_info["at"],
-        access_token_secret=auth_info["as"],
-    )
+    return media_ids, expires_at
 
-    # 画像アップロード処理
-    media_ids = []
-    if image_names:
-        for img_name in image_names[:4]:  # 最大4枚まで
-            file_path = f"static/uploads/{account.id}/{img_name}"
 
-            if not os.path.exists(file_path):
-                logger.warning(f"画像が見つかりません: {file_path}")
-                continue
+def send_tweet_with_media(account, text, image_names=None, media_ids=None):
+    """
+    複数画像対応のツイート投稿関数（最大4枚、本文なし投稿も可能）
+    media_ids が渡された場合は事前アップロード済みとみなし、アップロードを省略する。
+    """
+    client_v2 = get_clients(account).client_v2
 
-            try:
-                media = api_v1.media_upload(filename=file_path)
-                media_ids.append(media.media_id)
-                logger.info(f"画像アップロード成功: {img_name}")
-            except Exception as e:
-                logger.error(f"画像アップロード失敗 ({img_name}): {e}")
-                continue
+    # 画像アップロード処理（事前アップロード済みならスキップ）
+    if not media_ids and image_names:
+        media_ids, _ = upload_media(account, image_names)
 
     # テキストまたは画像のどちらかが必須
     if not text and not media_ids:
@@ -77,9 +81,11 @@ def send_tweet_with_media(account, text, image_names=None):
 
     # 投稿実行（本文が空でも、media_idsがあれば投稿可能）
     try:
-        return client_v2.create_tweet(
-            text=text if text else None, media_ids=media_ids if media_ids else None
-        )
+        with POST_PHASE.time(phase="create_tweet"):
+            return client_v2.create_tweet(
+                text=text if text else None, media_ids=media_ids if media_ids else None
+            )
     except Exception as e:
+        record_x_api_error("create_tweet", e)
         logger.error(f"ツイート投稿失敗: {e}")
         raise
@@ -28,17 +28,22 @@ async function loadAccounts() {
     return;
   }
 
+  accounts.forEach((acc) => {
+    _accountCards[acc.id] = { next_scheduled_at: acc.next_scheduled_at };
+  });
+  connectEvents(null, dashboardEventHandlers);
+
   grid.innerHTML = accounts
     .map(
       (acc) => `
-        <div class="card" style="cursor: pointer; position: relative;" onclick="location.href='account_detail.html?id=${acc.id}'">
+        <div class="card" id="account-card-${acc.id}" style="cursor: pointer; position: relative;" onclick="location.href='account_detail.html?id=${acc.id}'">
             <button onclick="event.stopPropagation(); editAccount(${acc.id})" 
                     style="position:absolute; top:10px; right:10px; background:none; border:none; cursor:pointer; font-size:20px; color:#666;">
                 ⚙️
             </button>
             <h3>${acc.name}</h3>
-            <p><span class="label">最終ツイート</span> ${acc.last_tweet}</p>
-            <p><span class="label">次回予定</span> ${acc.next_scheduled}</p>
+            <p><span class="label">最終ツイート</span> <span class="last-tweet">${acc.last_tweet}</span></p>
+            <p><span class="label">次回予定</span> <span class="next-scheduled">${acc.next_scheduled}</span></p>
             <button onclick="event.stopPropagation(); verifyAccount(${acc.id}, this)" style="margin-top:10px; cursor:pointer;">APIキー確認</button>
             <button onclick="event.stopPropagation(); testPost(${acc.id})" style="margin-top:6px; cursor:pointer;">Hello Worldテスト</button>
         </div>
@@ -84,17 +89,18 @@ function editAccount(accountId) {
 
 // 3. 詳細画面のデータを読み込む
 async function loadAccountDetail(id) {
-  const res = await fetch(`/accounts/${id}/tweets`);
-  const data = await res.json();
+  // タイムライン表示（予約と履歴をそれぞれ1ページ目だけ取得）
+  const data = await loadTimeline(id);
+  // 以降の変更はイベントで受け取って一覧に反映する
+  connectEvents(id, timelineEventHandlers(id));
 
   document.getElementById(
     "account-name"
   ).innerText = `${data.account_name} の投稿管理`;
 
-  // タイムライン表示（予約と履歴を統合）
-  renderTimeline(data.tweets);
-
-  // 画像読み込み
+  // 画像読み込み（並び順を変えたら1ページ目から読み直す）
+  const sortSelect = document.getElementById("image-sort");
+  if (sortSelect) sortSelect.onchange = () => loadImages(id);
   loadImages(id);
 
   // CSVテキストを読み込み
@@ -373,27 +379,62 @@ function switchFormTab(tab) {
   }
 }
 
-// 画像一覧の読み込み
-async function loadImages(accountId) {
-  const res = await fetch(`/accounts/${accountId}/images`);
-  const images = await res.json();
+// 画像一覧の読み込み（append=true なら次のページを末尾に追加）
+const IMAGE_PAGE_SIZE = 60;
+let _galleryCursor = null;
 
+async function loadImages(accountId, append = false) {
   const gallery = document.getElementById("image-gallery");
   if (!gallery) return;
 
-  gallery.innerHTML = images
-    .map(
-      (img, idx) => `
+  const sortSelect = document.getElementById("image-sort");
+  const params = new URLSearchParams({
+    sort: sortSelect ? sortSelect.value : "newest",
+    limit: IMAGE_PAGE_SIZE,
+  });
+  if (append && _galleryCursor) params.set("cursor", _galleryCursor);
+
+  const res = await fetch(`/accounts/${accountId}/images?${params}`);
+  if (!res.ok) {
+    showToast("画像一覧の読み込みに失敗しました", "error");
+    return;
+  }
+  const data = await res.json();
+  _galleryCursor = data.next_cursor;
+
+  // 追加読み込みでも範囲選択できるよう、通し番号を続ける
+  const offset = append ? gallery.querySelectorAll(".gallery-img").length : 0;
+  const html = data.items
+    .map((item, i) => {
+      const img = item.name;
+      const idx = offset + i;
+      const title = item.width
+        ? `${img} (${item.width}×${item.height})`
+        : img;
+      return `
         <div class="gallery-item-wrapper" style="position:relative;">
-            <img src="/uploads/${accountId}/${img}" loading="lazy" alt="${img}" data-index="${idx}" data-name="${img}" class="gallery-img" onclick="selectImage(event, '${accountId}', '${img}', this, ${idx})">
+            <img src="/accounts/${accountId}/images/${encodeURIComponent(img)}/thumb?w=320" loading="lazy" alt="${img}" title="${title}" data-index="${idx}" data-name="${img}" class="gallery-img" onclick="selectImage(event, '${accountId}', '${img}', this, ${idx})">
             <button class="delete-img-btn" onclick="deleteImage(event, '${accountId}', '${img}')" title="削除">×</button>
         </div>
-    `
-    )
+    `;
+    })
     .join("");
 
-  // 選択状態をリセット
-  lastSelectedIndex = -1;
+  const moreBtn = document.getElementById("image-more-btn");
+  if (moreBtn) moreBtn.remove();
+  if (append) {
+    gallery.insertAdjacentHTML("beforeend", html);
+  } else {
+    gallery.innerHTML = html;
+    // 選択状態をリセット
+    lastSelectedIndex = -1;
+  }
+  if (_galleryCursor) {
+    gallery.insertAdjacentHTML(
+      "afterend",
+      `<button id="image-more-btn" class="btn-ghost" type="button" style="width:100%; margin-top:8px;" onclick="loadImages('${accountId}', true)">もっと見る</button>`
+    );
+  }
   updateSelectionBadges();
 }
 
@@ -428,7 +469,8 @@ async function deleteImage(event, accountId, imageName) {
       updateBulkPreview();
       updateImageCountDisplay();
     } else {
-      showToast("削除に失敗しました", "error");
+      const err = await res.json().catch(() => ({}));
+      showToast(`削除に失敗しました: ${err.detail || "不明なエラー"}`, "error");
     }
   } catch (err) {
     console.error("削除エラー:", err);
@@ -679,59 +721,92 @@ function updateSelectionBadges(imgNodes, selectionList) {
   });
 }
 
-// タイムライン描画（予約/履歴を2カラム表示、ページネーション対応）
-let _allPosted = [];
-let _allScheduled = [];
+// タイムライン描画（予約/履歴を2カラム表示、サーバー側ページネーション）
 const PAGE_SIZE = 20;
-let _postedPage = 1;
-let _scheduledPage = 1;
-
-function renderTimeline(tweets) {
-  const scheduledBox = document.getElementById("scheduled-list");
-  const postedBox = document.getElementById("posted-list");
-  if (!scheduledBox || !postedBox) return;
-
-  _allPosted = tweets
-    .filter((t) => t.is_posted)
-    .sort((a, b) => new Date(b.posted_at) - new Date(a.posted_at));
-  _allScheduled = tweets
-    .filter((t) => !t.is_posted)
-    .sort((a, b) => new Date(a.scheduled_at) - new Date(b.scheduled_at));
-
-  _postedPage = 1;
-  _scheduledPage = 1;
-
-  _renderScheduledPage(scheduledBox);
-  _renderPostedPage(postedBox);
+// 予約は未投稿（失敗含む）、履歴は投稿済み
+const _timeline = {
+  scheduled: { status: "pending,failed", items: [], cursor: null, total: 0 },
+  posted: { status: "posted", items: [], cursor: null, total: 0 },
+};
+
+async function _fetchTweetPage(accountId, column, cursor) {
+  const params = new URLSearchParams({
+    status: _timeline[column].status,
+    limit: PAGE_SIZE,
+  });
+  if (cursor) params.set("cursor", cursor);
+  const res = await fetch(`/accounts/${accountId}/tweets?${params}`);
+  return res.json();
+}
+
+async function loadTimeline(accountId) {
+  const [scheduled, posted] = await Promise.all([
+    _fetchTweetPage(accountId, "scheduled"),
+    _fetchTweetPage(accountId, "posted"),
+  ]);
+
+  _timeline.scheduled.items = scheduled.tweets;
+  _timeline.scheduled.cursor = scheduled.next_cursor;
+  _timeline.scheduled.total =
+    scheduled.counts.pending + scheduled.counts.failed;
+  _timeline.posted.items = posted.tweets;
+  _timeline.posted.cursor = posted.next_cursor;
+  _timeline.posted.total = posted.counts.posted;
+
+  _renderScheduledPage(document.getElementById("scheduled-list"));
+  _renderPostedPage(document.getElementById("posted-list"));
+  return scheduled;
+}
+
+// 「もっと見る」: 次のページを取得して末尾に追加
+async function loadMoreTweets(column) {
+  const urlParams = new URLSearchParams(window.location.search);
+  const accountId = urlParams.get("id");
+  const state = _timeline[column];
+  if (!state.cursor) return;
+
+  const data = await _fetchTweetPage(accountId, column, state.cursor);
+  state.items = state.items.concat(data.tweets);
+  state.cursor = data.next_cursor;
+
+  if (column === "scheduled") {
+    _renderScheduledPage(document.getElementById("scheduled-list"));
+  } else {
+    _renderPostedPage(document.getElementById("posted-list"));
+  }
+}
+
+function _moreButton(column, state) {
+  if (!state.cursor) return "";
+  const rest = state.total - state.items.length;
+  return `<button class="btn-ghost" style="width:100%; margin-top:8px;" onclick="loadMoreTweets('${column}')">もっと見る${
+    rest > 0 ? `（残り${rest}件）` : ""
+  }</button>`;
 }
 
 function _renderScheduledPage(box) {
-  const visible = _allScheduled.slice(0, _scheduledPage * PAGE_SIZE);
-  const hasMore = _allScheduled.length > visible.length;
+  if (!box) return;
+  const state = _timeline.scheduled;
 
   let html = "";
-  visible.forEach((t, idx) => {
+  state.items.forEach((t, idx) => {
     html += renderTweetItem(t, false, idx === 0);
   });
   if (!html) html = '<p style="color:#999;">予約がありません</p>';
-  if (hasMore) {
-    html += `<button class="btn-ghost" style="width:100%; margin-top:8px;" onclick="_scheduledPage++; _renderScheduledPage(document.getElementById('scheduled-list'))">もっと見る</button>`;
-  }
+  html += _moreButton("scheduled", state);
   box.innerHTML = html;
 }
 
 function _renderPostedPage(box) {
-  const visible = _allPosted.slice(0, _postedPage * PAGE_SIZE);
-  const hasMore = _allPosted.length > visible.length;
+  if (!box) return;
+  const state = _timeline.posted;
 
   let html = "";
-  visible.forEach((t) => {
+  state.items.forEach((t) => {
     html += renderTweetItem(t, true);
   });
   if (!html) html = '<p style="color:#999;">履歴がありません</p>';
-  if (hasMore) {
-    html += `<button class="btn-ghost" style="width:100%; margin-top:8px;" onclick="_postedPage++; _renderPostedPage(document.getElementById('posted-list'))">もっと見る</button>`;
-  }
+  html += _moreButton("posted", state);
   box.innerHTML = html;
 }
 
@@ -748,7 +823,7 @@ function renderTweetItem(tweet, isPosted, isNext = false) {
       imagesHtml =
         '<div style="display:flex; gap:4px; margin-top:8px; flex-wrap:wrap;">';
       imageNames.slice(0, 4).forEach((img) => {
-        imagesHtml += `<img src="/uploads/${accountId}/${img}" style="width:50px; height:50px; object-fit:cover; border-radius:4px; border:1px solid #ddd;">`;
+        imagesHtml += `<img src="/accounts/${accountId}/images/${encodeURIComponent(img)}/thumb?w=160" loading="lazy" style="width:50px; height:50px; object-fit:cover; border-radius:4px; border:1px solid #ddd;">`;
       });
       imagesHtml += "</div>";
     }
@@ -790,7 +865,7 @@ async function deleteTweet(tweetId) {
       method: "DELETE",
     });
     if (res.ok) {
-      location.reload();
+      if (!eventsConnected()) loadTimeline(accountId);
     } else {
       const err = await res.json();
       showToast(`削除に失敗しました: ${err.detail || "不明なエラー"}`, "error");
@@ -800,6 +875,140 @@ async function deleteTweet(tweetId) {
   }
 }
 
+// ===== 変更イベント（Server-Sent Events）=====
+// サーバーから届く差分（scheduled / deleted / posted / failed）で一覧をその場で書き換える。
+// resync が届いたとき（取りこぼし・サーバー再起動）だけ一覧を読み直す
+let _eventSource = null;
+
+function connectEvents(accountId, handlers) {
+  if (!window.EventSource || _eventSource) return;
+  const query = accountId ? `?account_id=${accountId}` : "";
+  _eventSource = new EventSource(`/events${query}`);
+  // 切断時はブラウザが Last-Event-ID 付きで自動的に再接続する
+  Object.entries(handlers).forEach(([type, handler]) => {
+    _eventSource.addEventListener(type, (e) => handler(JSON.parse(e.data)));
+  });
+}
+
+// 接続中ならイベントで一覧が更新されるので読み直さなくてよい
+function eventsConnected() {
+  return _eventSource && _eventSource.readyState === EventSource.OPEN;
+}
+
+// 予約・履歴の並び順（予約は古い順、履歴は新しい順）と同じ (scheduled_at, id) の比較
+function _compareTweets(a, b) {
+  if (a.scheduled_at !== b.scheduled_at)
+    return a.scheduled_at < b.scheduled_at ? -1 : 1;
+  return a.id - b.id;
+}
+
+// 読み込み済みの範囲に入るツイートだけ差し込む（範囲外は「もっと見る」で取得される）
+function _insertTweet(column, tweet) {
+  const state = _timeline[column];
+  const order = column === "scheduled" ? 1 : -1;
+  if (state.items.some((t) => t.id === tweet.id)) return;
+  const idx = state.items.findIndex((t) => order * _compareTweets(tweet, t) < 0);
+  if (idx >= 0) state.items.splice(idx, 0, tweet);
+  else if (!state.cursor) state.items.push(tweet);
+}
+
+function _removeTweet(column, tweetId) {
+  const state = _timeline[column];
+  state.items = state.items.filter((t) => t.id !== tweetId);
+}
+
+// 続けて届いたイベントは1回の描画にまとめる
+let _timelineRenderQueued = false;
+function _queueTimelineRender() {
+  if (_timelineRenderQueued) return;
+  _timelineRenderQueued = true;
+  requestAnimationFrame(() => {
+    _timelineRenderQueued = false;
+    _renderScheduledPage(document.getElementById("scheduled-list"));
+    _renderPostedPage(document.getElementById("posted-list"));
+  });
+}
+
+function timelineEventHandlers(accountId) {
+  return {
+    scheduled(ev) {
+      // 件数が多い予約は内容が送られてこないので読み直す
+      if (!ev.tweets) return loadTimeline(accountId);
+      ev.tweets.forEach((t) => _insertTweet("scheduled", t));
+      _timeline.scheduled.total += ev.count;
+      _queueTimelineRender();
+    },
+    deleted(ev) {
+      if (ev.status === "posted") return;
+      _removeTweet("scheduled", ev.tweet_id);
+      _timeline.scheduled.total = Math.max(0, _timeline.scheduled.total - 1);
+      _queueTimelineRender();
+    },
+    posted(ev) {
+      _removeTweet("scheduled", ev.tweet.id);
+      _timeline.scheduled.total = Math.max(0, _timeline.scheduled.total - 1);
+      _insertTweet("posted", ev.tweet);
+      _timeline.posted.total += 1;
+      _queueTimelineRender();
+    },
+    failed(ev) {
+      // 失敗したツイートは予約の列に残る
+      const state = _timeline.scheduled;
+      state.items = state.items.map((t) => (t.id === ev.tweet.id ? ev.tweet : t));
+      _queueTimelineRender();
+    },
+    resync() {
+      loadTimeline(accountId);
+    },
+  };
+}
+
+// ダッシュボード: カードの「最終ツイート」「次回予定」を書き換える
+const _accountCards = {};
+let _accountsReloadTimer = null;
+
+// 次回予定がわからなくなったときはまとめて読み直す
+function _reloadAccountsSoon() {
+  clearTimeout(_accountsReloadTimer);
+  _accountsReloadTimer = setTimeout(loadAccounts, 1000);
+}
+
+function _formatNextScheduled(iso) {
+  const d = new Date(iso);
+  const pad = (n) => String(n).padStart(2, "0");
+  return `${pad(d.getMonth() + 1)}/${pad(d.getDate())} ${pad(d.getHours())}:${pad(d.getMinutes())}`;
+}
+
+function _setNextScheduled(accountId, iso) {
+  _accountCards[accountId].next_scheduled_at = iso;
+  const el = document.querySelector(`#account-card-${accountId} .next-scheduled`);
+  if (el) el.textContent = _formatNextScheduled(iso);
+}
+
+const dashboardEventHandlers = {
+  scheduled(ev) {
+    const card = _accountCards[ev.account_id];
+    if (!card || !ev.first_scheduled_at) return;
+    if (new Date(ev.first_scheduled_at) <= new Date()) return;
+    if (!card.next_scheduled_at || ev.first_scheduled_at < card.next_scheduled_at)
+      _setNextScheduled(ev.account_id, ev.first_scheduled_at);
+  },
+  deleted(ev) {
+    const card = _accountCards[ev.account_id];
+    if (card && card.next_scheduled_at === ev.scheduled_at) _reloadAccountsSoon();
+  },
+  posted(ev) {
+    const card = _accountCards[ev.account_id];
+    if (!card) return;
+    const el = document.querySelector(`#account-card-${ev.account_id} .last-tweet`);
+    if (el) el.textContent = ev.tweet.content;
+    if (card.next_scheduled_at === ev.tweet.scheduled_at) _reloadAccountsSoon();
+  },
+  resync() {
+    loadAccounts();
+  },
+};
+
 // 4. 予約フォームの送信処理
 const tweetForm = document.getElementById("tweetForm");
 if (tweetForm) {
@@ -850,7 +1059,8 @@ if (tweetForm) {
         clearSelectedImage();
         document.getElementById("content").value = "";
         updateSelectedImagesPreview();
-        location.reload(); // 再読み込みして一覧を更新
+        // 一覧は scheduled イベントで更新される（未接続なら読み直す）
+        if (!eventsConnected()) loadTimeline(id);
       } else {
         const error = await res.json();
         showToast(`エラーが発生しました: ${error.detail || "不明なエラー"}`, "error");
@@ -1389,7 +1599,7 @@ if (bulkTweetForm) {
         document.getElementById("bulk_text_mode").value = "";
         document.getElementById("bulk_text").value = "";
         updateBulkPreview();
-        location.reload();
+        if (!eventsConnected()) loadTimeline(id);
       } else {
         const error = await res.json();
         showToast(`エラーが発生しました: ${error.detail || "不明なエラー"}`, "error");
@@ -1400,7 +1610,7 @@ if (bulkTweetForm) {
   };
 }
 
-// === メガ予約（大量画像を1枚ずつ順次送信） ===
+// === メガ予約（画像と予約内容をまとめて1リクエストで送信） ===
 const megaScheduleButton = document.getElementById("mega_schedule_btn");
 if (megaScheduleButton) {
   megaScheduleButton.onclick = async () => {
@@ -1431,93 +1641,89 @@ if (megaScheduleButton) {
       return;
     }
 
-    const startDate = new Date(startTime);
-    const total = megaSelectedImages.length;
     const useCSV =
       document.querySelector('input[name="mega_text_source"]:checked')
         ?.value === "csv";
+    const addNumber =
+      document.getElementById("mega_number_toggle")?.checked || false;
 
     const progressText = document.getElementById("mega-progress-text");
     const progressBar = document.getElementById("mega-progress-bar");
     const statusArea = document.getElementById("mega-progress-status");
 
-    if (progressText) progressText.textContent = "開始準備中...";
+    if (progressText) progressText.textContent = "送信中...";
     if (progressBar) progressBar.style.width = "0%";
     if (statusArea) statusArea.textContent = "";
 
-    let success = 0;
-    let failed = 0;
-
-    // 順次送信（await で1件ずつ）
-    for (let i = 0; i < megaSelectedImages.length; i++) {
-      const img = megaSelectedImages[i];
-      const scheduleDate = new Date(startDate);
-      scheduleDate.setMinutes(scheduleDate.getMinutes() + intervalMinutes * i);
-
-      const year = scheduleDate.getFullYear();
-      const month = String(scheduleDate.getMonth() + 1).padStart(2, "0");
-      const day = String(scheduleDate.getDate()).padStart(2, "0");
-      const hours = String(scheduleDate.getHours()).padStart(2, "0");
-      const minutes = String(scheduleDate.getMinutes()).padStart(2, "0");
-      const scheduledAtFormatted = `${year}-${month}-${day}T${hours}:${minutes}`;
+    // 予約内容（時刻の割り当て・本文の組み立てはサーバー側で行う）
+    const formData = new FormData();
+    formData.append(
+      "spec",
+      JSON.stringify({
+        image_names: megaSelectedImages.map((img) => img.name),
+        start_at: startTime,
+        interval_minutes: intervalMinutes,
+        texts: useCSV ? csvTexts : [],
+        text,
+        add_number: addNumber,
+      })
+    );
 
-      const baseText = useCSV ? csvTexts[i] || "" : text;
-      const addNumber =
-        document.getElementById("mega_number_toggle")?.checked || false;
-      let content = "";
-      if (addNumber) {
-        content = baseText
-          ? `${baseText} (${i + 1}/${total})`
-          : `(${i + 1}/${total})`;
-      } else {
-        content = baseText;
+    let result = null;
+    try {
+      const res = await fetch(`/accounts/${id}/mega-schedule`, {
+        method: "POST",
+        body: formData,
+      });
+      if (!res.ok) {
+        const error = await res.json();
+        throw new Error(
+          typeof error.detail === "string" ? error.detail : "不明なエラー"
+        );
       }
 
-      // 進捗表示
-      if (progressText)
-        progressText.textContent = `${i + 1} / ${total} アップロード中...`;
-      if (progressBar)
-        progressBar.style.width = `${Math.round(((i + 1) / total) * 100)}%`;
-
-      try {
-        const res = await fetch(`/accounts/${id}/bulk-schedule-single`, {
-          method: "POST",
-          headers: { "Content-Type": "application/json" },
-          body: JSON.stringify({
-            content,
-            image_name: img.name,
-            scheduled_at: scheduledAtFormatted,
-          }),
-        });
-
-        if (res.ok) {
-          success += 1;
-        } else {
-          failed += 1;
+      // 進捗は1行1イベントの NDJSON で返ってくる
+      const reader = res.body.getReader();
+      const decoder = new TextDecoder();
+      let buffer = "";
+      while (true) {
+        const { done, value } = await reader.read();
+        if (done) break;
+        buffer += decoder.decode(value, { stream: true });
+        const lines = buffer.split("\n");
+        buffer = lines.pop();
+        for (const line of lines) {
+          if (!line.trim()) continue;
+          const event = JSON.parse(line);
+          if (event.stage === "schedule") {
+            if (progressText)
+              progressText.textContent = `${event.done} / ${event.total} 登録中...`;
+            if (progressBar)
+              progressBar.style.width = `${Math.round(
+                (event.done / event.total) * 100
+              )}%`;
+          } else if (event.stage === "done" || event.stage === "error") {
+            result = event;
+          }
         }
-      } catch (err) {
-        failed += 1;
       }
+    } catch (err) {
+      result = { stage: "error", detail: err.message };
     }
 
-    if (progressText)
-      progressText.textContent = `完了: 成功 ${success} / 失敗 ${failed}`;
-    if (progressBar) progressBar.style.width = "100%";
-    if (statusArea)
-      statusArea.textContent =
-        failed === 0
-          ? "✅ 全件予約しました"
-          : `⚠️ 一部失敗しました（成功 ${success}, 失敗 ${failed}）`;
-
-    if (success > 0) {
-      showToast(
-        `${success}件を予約しました${failed ? `（失敗 ${failed}件）` : ""}`,
-        "success"
-      );
+    if (result && result.stage === "done") {
+      if (progressText)
+        progressText.textContent = `完了: ${result.created_count}件`;
+      if (progressBar) progressBar.style.width = "100%";
+      if (statusArea) statusArea.textContent = "✅ 全件予約しました";
+      showToast(`${result.created_count}件を予約しました`, "success");
       clearMegaSelectedImages();
-      location.reload();
+      if (!eventsConnected()) loadTimeline(id);
     } else {
-      showToast("予約に失敗しました。入力内容を確認してください。", "error");
+      const detail = result?.detail || "入力内容を確認してください";
+      if (progressText) progressText.textContent = "失敗しました";
+      if (statusArea) statusArea.textContent = `⚠️ ${detail}`;
+      showToast(`予約に失敗しました: ${detail}`, "error");
     }
   };
 }
@@ -206,6 +206,11 @@ async function loadSchedules() {
                         <button onclick="editSchedule(${
                           schedule.id
                         })" class="btn-small">編集</button>
+                        ${
+                          schedule.is_active
+                            ? `<button onclick="allocateSchedule(${schedule.id})" class="btn-small btn-success">空き枠に予約</button>`
+                            : ""
+                        }
                         <button onclick="deleteSchedule(${
                           schedule.id
                         })" class="btn-small btn-danger">削除</button>
@@ -284,6 +289,59 @@ async function editSchedule(scheduleId) {
   }
 }
 
+// スケジュールの空き枠に、保存済みの CSV テキスト（または画像）をまとめて予約
+async function allocateSchedule(scheduleId) {
+  const today = new Date().toISOString().slice(0, 10);
+  const startDate = prompt("開始日を入力してください (YYYY-MM-DD):", today);
+  if (!startDate) return;
+  const endDate = prompt("終了日を入力してください (YYYY-MM-DD):", startDate);
+  if (!endDate) return;
+  const useImages = confirm(
+    "画像1枚につき1件で予約しますか？\n（キャンセルで保存済みの CSV テキストを使います）"
+  );
+
+  const body = {
+    start_date: startDate,
+    end_date: endDate,
+    source: useImages ? "images" : "csv",
+  };
+  const url = `/accounts/${accountId}/hourly-schedules/${scheduleId}/allocate`;
+  try {
+    // まず割り当て予定を確認してから登録する
+    const preview = await fetch(url, {
+      method: "POST",
+      headers: { "Content-Type": "application/json" },
+      body: JSON.stringify({ ...body, dry_run: true }),
+    });
+    const plan = await preview.json();
+    if (!preview.ok) {
+      alert(`エラー: ${plan.detail}`);
+      return;
+    }
+    const count = plan.slots.length;
+    const first = new Date(plan.first_slot).toLocaleString("ja-JP");
+    const last = new Date(plan.last_slot).toLocaleString("ja-JP");
+    if (!confirm(`${count}件を ${first} 〜 ${last} の空き枠に予約します。よろしいですか？`)) {
+      return;
+    }
+
+    const response = await fetch(url, {
+      method: "POST",
+      headers: { "Content-Type": "application/json" },
+      body: JSON.stringify(body),
+    });
+    const result = await response.json();
+    if (response.ok) {
+      alert(`${result.created_count}件を予約しました`);
+    } else {
+      alert(`エラー: ${result.detail}`);
+    }
+  } catch (error) {
+    console.error("割り当てエラー:", error);
+    alert("予約に失敗しました");
+  }
+}
+
 // スケジュールを削除
 async function deleteSchedule(scheduleId) {
   if (!confirm("このスケジュール設定を削除しますか？")) {
@@ -0,0 +1,94 @@
+# tests/conftest.py
+"""
+テスト用の設定。models は import 時にエンジンを作るため、先に一時ディレクトリの DB と
+暗号化キーを指定する。
+"""
+import os
+import sys
+import tempfile
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from cryptography.fernet import Fernet  # noqa: E402
+
+_tmpdir = tempfile.mkdtemp(prefix="xbm-test-")
+os.environ["DATABASE_URL"] = f"sqlite:///{_tmpdir}/test.db"
+os.environ["ENCRYPTION_KEY"] = Fernet.generate_key().decode()
+
+from datetime import datetime  # noqa: E402
+
+import pytest  # noqa: E402
+from sqlalchemy import delete  # noqa: E402
+from sqlmodel import Session  # noqa: E402
+
+import models  # noqa: E402
+from models import (  # noqa: E402
+    engine,
+    Account,
+    AccountImage,
+    ImageBlob,
+    Tweet,
+    TweetArchive,
+    TWEET_PENDING,
+)
+
+models.create_db_and_tables()
+
+
+@pytest.fixture(autouse=True)
+def clean_db():
+    with Session(engine) as session:
+        for model in (Tweet, TweetArchive, AccountImage, ImageBlob, Account):
+            session.execute(delete(model))
+        session.commit()
+    yield
+
+
+@pytest.fixture
+def add_tweet():
+    """ツイートを1件追加して id を返す"""
+
+    def add(account_id, scheduled_at, status=TWEET_PENDING, **values):
+        with Session(engine) as session:
+            values.setdefault("content", "test")
+            values.setdefault("image_names", "[]")
+            tweet = Tweet(
+                account_id=account_id,
+                scheduled_at=scheduled_at,
+                status=status,
+                **values,
+            )
+            session.add(tweet)
+            session.commit()
+            return tweet.id
+
+    return add
+
+
+def load_tweet(tweet_id):
+    with Session(engine) as session:
+        return session.get(Tweet, tweet_id)
+
+
+@pytest.fixture
+def now():
+    return datetime.now().replace(microsecond=0)
+
+
+@pytest.fixture
+def upload_dir(tmp_path, monkeypatch):
+    """画像の保存先（static/uploads 相対）を一時ディレクトリにする"""
+    monkeypatch.chdir(tmp_path)
+    return tmp_path / "static" / "uploads"
+
+
+def png_bytes(color):
+    """color（RGB）1色の小さな PNG"""
+    import io
+
+    from PIL import Image
+
+    buffer = io.BytesIO()
+    Image.new("RGB", (8, 8), color).save(buffer, format="PNG")
+    return buffer.getvalue()
@@ -0,0 +1,103 @@
+# tests/test_archive.py
+from datetime import timedelta
+
+from sqlalchemy import text
+from sqlmodel import Session, select
+
+import models
+from models import engine, Tweet, TweetArchive, TWEET_PENDING, TWEET_POSTED
+from services.archive import archive_tweets
+
+
+def _delete(tweet_id):
+    with Session(engine) as session:
+        session.delete(session.get(Tweet, tweet_id))
+        session.commit()
+
+
+def _archived_ids():
+    with Session(engine) as session:
+        return set(session.exec(select(TweetArchive.id)).all())
+
+
+def test_archives_old_posted_tweets(add_tweet, now):
+    old = add_tweet(1, now - timedelta(days=40), status=TWEET_POSTED, is_posted=True)
+    recent = add_tweet(1, now - timedelta(days=1), status=TWEET_POSTED, is_posted=True)
+
+    assert archive_tweets(now, retention_days=30) == 1
+
+    assert _archived_ids() == {old}
+    with Session(engine) as session:
+        assert session.get(Tweet, recent) is not None
+
+
+def test_deleted_max_id_is_not_reused_after_archive(add_tweet, now):
+    # 以前は最大の id を削除すると次のツイートがその id を再利用し、アーカイブが UNIQUE 制約で失敗した
+    archived = add_tweet(1, now - timedelta(days=40), status=TWEET_POSTED, is_posted=True)
+    deleted = add_tweet(1, now + timedelta(days=1))
+    assert archive_tweets(now, retention_days=30) == 1
+    _delete(deleted)
+
+    reused = add_tweet(1, now - timedelta(days=40), status=TWEET_POSTED, is_posted=True)
+    assert reused > deleted
+
+    assert archive_tweets(now, retention_days=30) == 1
+    assert _archived_ids() == {archived, reused}
+
+
+def test_archiving_the_newest_tweet_does_not_reuse_its_id(add_tweet, now):
+    newest = add_tweet(1, now - timedelta(days=40), status=TWEET_POSTED, is_posted=True)
+    assert archive_tweets(now, retention_days=30) == 1
+
+    assert add_tweet(1, now) > newest
+
+
+def test_migration_rebuilds_tweet_table_with_autoincrement(add_tweet, now):
+    # AUTOINCREMENT のない古いテーブルで、アーカイブ済みの id が既に再利用されている状態
+    with engine.begin() as conn:
+        conn.execute(text("DROP TABLE tweet"))
+        conn.execute(
+            text(
+                "CREATE TABLE tweet (id INTEGER NOT NULL PRIMARY KEY, account_id INTEGER NOT NULL,"
+                " content VARCHAR, image_names VARCHAR NOT NULL, is_posted BOOLEAN NOT NULL,"
+                " scheduled_at DATETIME, posted_at DATETIME, retry_count INTEGER NOT NULL,"
+                " is_failed BOOLEAN NOT NULL, media_ids VARCHAR, media_expires_at DATETIME,"
+                " lease_owner VARCHAR, lease_expires_at DATETIME, status VARCHAR)"
+            )
+        )
+        models._create_indexes(conn, Tweet.__table__)
+        models._create_data_version_triggers(conn, "tweet")
+    with Session(engine) as session:
+        session.add(TweetArchive(id=7, account_id=1, scheduled_at=now, status=TWEET_POSTED))
+        session.commit()
+    with engine.begin() as conn:
+        for tweet_id in (3, 7):
+            conn.execute(
+                text(
+                    "INSERT INTO tweet (id, account_id, image_names, is_posted, retry_count,"
+                    " is_failed, status) VALUES (:id, 1, '[]', 0, 0, 0, :status)"
+                ),
+                {"id": tweet_id, "status": TWEET_PENDING},
+            )
+    pending, duplicate = 3, 7
+
+    with engine.begin() as conn:
+        models._migrate_tweet_autoincrement(conn)
+        models._migrate_next_attempt_at(conn)
+        table_sql = conn.execute(
+            text("SELECT sql FROM sqlite_master WHERE type = 'table' AND name = 'tweet'")
+        ).scalar()
+        triggers = conn.execute(
+            text("SELECT name FROM sqlite_master WHERE type = 'trigger' AND tbl_name = 'tweet'")
+        ).scalars().all()
+        index_names = conn.execute(
+            text("SELECT name FROM sqlite_master WHERE type = 'index' AND tbl_name = 'tweet'")
+        ).scalars().all()
+
+    assert "AUTOINCREMENT" in table_sql
+    assert len(triggers) == len(models.DATA_VERSION_TRIGGERS)
+    assert {index.name for index in Tweet.__table__.indexes} <= set(index_names)
+    with Session(engine) as session:
+        ids = set(session.exec(select(Tweet.id)).all())
+    assert pending in ids and duplicate not in ids
+    assert add_tweet(1, now) > max(ids)
@@ -0,0 +1,52 @@
+# tests/test_data_version.py
+from datetime import timedelta
+
+from sqlmodel import Session
+
+from models import engine, Account, Tweet, TWEET_IN_FLIGHT
+from services.dispatch_queue import claim_due_tweets, release_leases, renew_leases
+
+
+def _account():
+    with Session(engine) as session:
+        account = Account(
+            name="etag", api_key="k", api_secret="s", access_token="t", access_token_secret="ts"
+        )
+        session.add(account)
+        session.commit()
+        return account.id
+
+
+def _version(account_id):
+    with Session(engine) as session:
+        return session.get(Account, account_id).data_version
+
+
+def test_lease_writes_keep_data_version(add_tweet, now):
+    account_id = _account()
+    add_tweet(account_id, now - timedelta(minutes=1))
+    before = _version(account_id)
+
+    # リースの取得・延長・解放は画面に出ないので ETag を変えない
+    token, claimed = claim_due_tweets(now)
+    assert claimed
+    with Session(engine) as session:
+        renew_leases(session, token, account_id)
+    with Session(engine) as session:
+        release_leases(session, token, account_id, retry_at=now + timedelta(minutes=5))
+
+    assert _version(account_id) == before
+
+
+def test_status_change_bumps_data_version(add_tweet, now):
+    account_id = _account()
+    tweet_id = add_tweet(account_id, now - timedelta(minutes=1))
+    before = _version(account_id)
+
+    with Session(engine) as session:
+        tweet = session.get(Tweet, tweet_id)
+        tweet.status = TWEET_IN_FLIGHT
+        session.add(tweet)
+        session.commit()
+
+    assert _version(account_id) > before
@@ -0,0 +1,126 @@
+# tests/test_dispatch_queue.py
+import time
+from datetime import timedelta
+
+from sqlmodel import Session
+
+from conftest import load_tweet
+from models import engine, Tweet, TWEET_PENDING, TWEET_IN_FLIGHT, TWEET_FAILED
+from services import dispatch_queue
+from services.dispatch_queue import claim_due_tweets, keep_leases, release_leases, renew_leases
+
+
+def test_claims_due_tweets_in_scheduled_order(add_tweet, now):
+    second = add_tweet(1, now - timedelta(minutes=1))
+    first = add_tweet(1, now - timedelta(minutes=2))
+    add_tweet(1, now + timedelta(minutes=5))  # まだ予約時刻前
+
+    token, claimed = claim_due_tweets(now)
+
+    assert claimed == [(first, 1), (second, 1)]
+    assert load_tweet(first).lease_owner == token
+
+
+def test_account_is_claimed_by_one_worker_at_a_time(add_tweet, now):
+    add_tweet(1, now - timedelta(minutes=2))
+    _, claimed = claim_due_tweets(now)
+    assert len(claimed) == 1
+
+    # 1つ目のリースが生きている間は、同じアカウントの新しいツイートも他のワーカーには渡らない
+    add_tweet(1, now - timedelta(minutes=1))
+    other = add_tweet(2, now - timedelta(minutes=1))
+    _, claimed = claim_due_tweets(now)
+    assert claimed == [(other, 2)]
+
+
+def test_expired_lease_can_be_reclaimed(add_tweet, now):
+    tweet_id = add_tweet(1, now - timedelta(minutes=1))
+    claim_due_tweets(now - timedelta(hours=1))  # リース期限は now より前
+
+    token, claimed = claim_due_tweets(now)
+
+    assert claimed == [(tweet_id, 1)]
+    assert load_tweet(tweet_id).lease_owner == token
+
+
+def test_expired_in_flight_lease_becomes_failed(add_tweet, now):
+    # 送信中にワーカーが落ちた: 投稿されたか分からないので再送しない
+    tweet_id = add_tweet(
+        1,
+        now - timedelta(minutes=10),
+        status=TWEET_IN_FLIGHT,
+        lease_owner="dead-worker",
+        lease_expires_at=now - timedelta(seconds=1),
+    )
+
+    _, claimed = claim_due_tweets(now)
+
+    tweet = load_tweet(tweet_id)
+    assert claimed == []
+    assert tweet.status == TWEET_FAILED
+    assert tweet.is_failed
+    assert tweet.lease_owner is None
+
+
+def test_live_in_flight_lease_is_left_alone(add_tweet, now):
+    tweet_id = add_tweet(
+        1,
+        now - timedelta(minutes=10),
+        status=TWEET_IN_FLIGHT,
+        lease_owner="busy-worker",
+        lease_expires_at=now + timedelta(minutes=1),
+    )
+
+    claim_due_tweets(now)
+
+    assert load_tweet(tweet_id).status == TWEET_IN_FLIGHT
+
+
+def test_renew_extends_only_this_accounts_leases(add_tweet, now):
+    mine = add_tweet(1, now - timedelta(minutes=1))
+    other = add_tweet(2, now - timedelta(minutes=1))
+    token, _ = claim_due_tweets(now - timedelta(minutes=1))
+    before = load_tweet(mine).lease_expires_at
+
+    with Session(engine) as session:
+        renew_leases(session, token, 1)
+
+    assert load_tweet(mine).lease_expires_at > before
+    assert load_tweet(other).lease_expires_at == before
+
+
+def test_release_frees_pending_but_keeps_in_flight(add_tweet, now):
+    pending = add_tweet(1, now - timedelta(minutes=2))
+    sending = add_tweet(1, now - timedelta(minutes=1))
+    token, _ = claim_due_tweets(now)
+    with Session(engine) as session:
+        tweet = session.get(Tweet, sending)
+        tweet.status = TWEET_IN_FLIGHT
+        session.add(tweet)
+        session.commit()
+
+    with Session(engine) as session:
+        release_leases(session, token, 1)
+
+    assert load_tweet(pending).lease_owner is None
+    assert load_tweet(pending).status == TWEET_PENDING
+    assert load_tweet(sending).lease_owner == token
+
+
+def test_keep_leases_renews_in_flight_rows(add_tweet, now, monkeypatch):
+    monkeypatch.setattr(dispatch_queue, "LEASE_SECONDS", 1)
+    tweet_id = add_tweet(1, now - timedelta(minutes=1))
+    token, _ = claim_due_tweets()
+    with Session(engine) as session:
+        tweet = session.get(Tweet, tweet_id)
+        tweet.status = TWEET_IN_FLIGHT
+        session.add(tweet)
+        session.commit()
+
+    with keep_leases(token, 1):
+        time.sleep(1.5)
+        claim_due_tweets()
+
+    tweet = load_tweet(tweet_id)
+    assert tweet.status == TWEET_IN_FLIGHT
+    assert tweet.lease_owner == token
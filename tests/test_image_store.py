@@ -0,0 +1,81 @@
+# tests/test_image_store.py
+import hashlib
+import json
+import os
+from datetime import datetime, timedelta
+
+from sqlmodel import Session, select
+
+from conftest import png_bytes
+from models import engine, AccountImage, ImageBlob, Tweet, TWEET_POSTED
+from services import image_store
+
+
+def _store(account_id, name, color):
+    body = png_bytes(color)
+    temp_file = image_store.temp_path()
+    os.makedirs(os.path.dirname(temp_file), exist_ok=True)
+    with open(temp_file, "wb") as f:
+        f.write(body)
+    return image_store.add_image(
+        account_id, name, temp_file, hashlib.sha256(body).hexdigest(), len(body), "image/png"
+    )
+
+
+def _post(tweet_id):
+    with Session(engine) as session:
+        tweet = session.get(Tweet, tweet_id)
+        tweet.status = TWEET_POSTED
+        session.add(tweet)
+        session.commit()
+
+
+def _names():
+    with Session(engine) as session:
+        return set(session.exec(select(AccountImage.name)).all())
+
+
+def _after_grace(now):
+    return now + timedelta(hours=image_store.IMAGE_GC_GRACE_HOURS + 1)
+
+
+def test_gc_removes_released_images_after_grace(upload_dir, add_tweet):
+    now = datetime.now()
+    used = _store(1, "used.png", (255, 0, 0))
+    unused = _store(1, "unused.png", (0, 255, 0))
+    tweet_id = add_tweet(1, now, image_names=json.dumps([used]))
+    image_store.collect_garbage(now)
+    _post(tweet_id)
+
+    result = image_store.collect_garbage(_after_grace(now))
+
+    # 投稿された（参照が外れた）画像は猶予期間の後に消え、一度も使われていない画像は残る
+    assert result["removed_names"] == 1
+    assert result["removed_blobs"] == 1
+    assert _names() == {unused}
+    assert not os.path.exists(image_store.image_path(1, used))
+    assert os.path.exists(image_store.image_path(1, unused))
+
+
+def test_gc_keeps_images_referenced_during_collection(upload_dir, add_tweet, monkeypatch):
+    now = datetime.now()
+    name = _store(1, "again.png", (0, 0, 255))
+    tweet_id = add_tweet(1, now, image_names=json.dumps([name]))
+    image_store.collect_garbage(now)
+    _post(tweet_id)
+    delete_unreferenced = image_store._delete_unreferenced
+
+    def schedule_then_delete(candidate_ids, expired_before):
+        # 候補を選んだ後、削除する前に同じ画像で予約された
+        add_tweet(1, now + timedelta(days=1), image_names=json.dumps([name]))
+        return delete_unreferenced(candidate_ids, expired_before)
+
+    monkeypatch.setattr(image_store, "_delete_unreferenced", schedule_then_delete)
+
+    result = image_store.collect_garbage(_after_grace(now))
+
+    assert result["removed_names"] == 0
+    assert _names() == {name}
+    assert os.path.exists(image_store.image_path(1, name))
+    with Session(engine) as session:
+        assert len(session.exec(select(ImageBlob)).all()) == 1
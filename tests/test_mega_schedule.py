@@ -0,0 +1,80 @@
+# tests/test_mega_schedule.py
+import hashlib
+import json
+import os
+
+from fastapi.testclient import TestClient
+from sqlmodel import Session, select
+
+import main
+from conftest import png_bytes
+from models import engine, Account, AccountImage, ImageBlob, Tweet
+from services import image_store
+
+
+def _account():
+    with Session(engine) as session:
+        account = Account(
+            name="mega", api_key="k", api_secret="s", access_token="t", access_token_secret="ts"
+        )
+        session.add(account)
+        session.commit()
+        return account.id
+
+
+def _post(client, account_id, files):
+    spec = {"start_at": "2030-01-01T10:00", "interval_minutes": 60, "text": "mega"}
+    response = client.post(
+        f"/accounts/{account_id}/mega-schedule",
+        data={"spec": json.dumps(spec)},
+        files=[("files", (name, body, "image/png")) for name, body in files],
+    )
+    return [json.loads(line) for line in response.text.splitlines()]
+
+
+def _temp_upload(body):
+    """add_image に渡す一時ファイルを作る"""
+    temp_file = image_store.temp_path()
+    os.makedirs(os.path.dirname(temp_file), exist_ok=True)
+    with open(temp_file, "wb") as f:
+        f.write(body)
+    return temp_file, hashlib.sha256(body).hexdigest(), len(body), "image/png"
+
+
+def test_failed_batch_removes_the_images_it_stored(upload_dir, monkeypatch):
+    account_id = _account()
+    client = TestClient(main.app)
+    existing = image_store.add_image(
+        account_id, "existing.png", *_temp_upload(png_bytes((255, 0, 0)))
+    )
+
+    def broken_content(spec, index, total):
+        raise RuntimeError("DB エラー")
+
+    monkeypatch.setattr(main, "_mega_content", broken_content)
+    events = _post(
+        client,
+        account_id,
+        [("same.png", png_bytes((255, 0, 0))), ("new.png", png_bytes((0, 0, 255)))],
+    )
+
+    assert events[-1]["stage"] == "error"
+    with Session(engine) as session:
+        assert session.exec(select(Tweet)).all() == []
+        # 既存の画像と同じ内容のものは、既存の画像名ごと残す
+        assert session.exec(select(AccountImage.name)).all() == [existing]
+        assert len(session.exec(select(ImageBlob)).all()) == 1
+    files = sorted(p.name for p in upload_dir.rglob("*.png"))
+    assert len(files) == 2  # 既存の画像名と、その実体
+
+
+def test_successful_batch_keeps_its_images(upload_dir):
+    account_id = _account()
+    client = TestClient(main.app)
+
+    events = _post(client, account_id, [("new.png", png_bytes((0, 255, 0)))])
+
+    assert events[-1]["stage"] == "done"
+    with Session(engine) as session:
+        assert session.exec(select(AccountImage.name)).all() == events[-1]["uploaded"]
+
@@ -0,0 +1,34 @@
+# tests/test_rate_limiter.py
+from services.rate_limiter import RateLimiter, X_USER_TWEET_LIMIT
+
+
+def test_acquire_takes_a_token_until_the_limit():
+    limiter = RateLimiter()
+    for _ in range(X_USER_TWEET_LIMIT):
+        assert limiter.acquire(1, "app") == 0
+    assert limiter.acquire(1, "app") > 0
+    # 他のアカウントは別のバケット
+    assert limiter.acquire(2, "app") == 0
+
+
+def test_wait_time_does_not_take_a_token():
+    limiter = RateLimiter()
+    for _ in range(X_USER_TWEET_LIMIT - 1):
+        limiter.acquire(1, "app")
+
+    assert limiter.wait_time(1, "app") == 0
+    assert limiter.wait_time(1, "app") == 0
+    assert limiter.acquire(1, "app") == 0
+    assert limiter.wait_time(1, "app") > 0
+
+
+def test_headers_block_until_reset():
+    limiter = RateLimiter()
+    limiter.observe(
+        1,
+        "app",
+        {"x-rate-limit-limit": "100", "x-rate-limit-remaining": "0", "x-rate-limit-reset": "9999999999"},
+    )
+
+    assert limiter.wait_time(1, "app") > 0
+    assert limiter.acquire(1, "app") > 0
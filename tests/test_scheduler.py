@@ -0,0 +1,162 @@
+# tests/test_scheduler.py
+import time
+from datetime import datetime, timedelta
+from types import SimpleNamespace
+
+import pytest
+from sqlmodel import Session, select
+
+from conftest import load_tweet
+from models import engine, Account, Tweet, TWEET_PENDING, TWEET_IN_FLIGHT, TWEET_POSTED
+from services import dispatch_queue, scheduler
+from services.dispatch_queue import CLAIM_BATCH_SIZE, claim_due_tweets
+from services.rate_limiter import RateLimiter
+from services.status_writer import StatusWriter
+
+
+@pytest.fixture
+def sent(monkeypatch):
+    """X への送信を置き換え、送った内容を記録する"""
+    sent = []
+    monkeypatch.setattr(scheduler, "limiter", RateLimiter())
+    # 送信前の in_flight の書き込みを待つので、まとめる待ち時間は短くする
+    monkeypatch.setattr(scheduler, "status_writer", StatusWriter(batch_delay=0.001))
+    monkeypatch.setattr(scheduler, "get_clients", lambda account: SimpleNamespace(app_key="app"))
+
+    def send(account, content, image_names, media_ids=None):
+        if content.startswith("fail"):
+            raise RuntimeError("送信エラー")
+        sent.append(content)
+
+    monkeypatch.setattr(scheduler, "send_tweet_with_media", send)
+    return sent
+
+
+@pytest.fixture
+def accounts():
+    with Session(engine) as session:
+        rows = [
+            Account(
+                name=f"account{i}",
+                api_key="k",
+                api_secret="s",
+                access_token="t",
+                access_token_secret="ts",
+            )
+            for i in range(3)
+        ]
+        session.add_all(rows)
+        session.commit()
+        return [row.id for row in rows]
+
+
+def _statuses():
+    with Session(engine) as session:
+        return session.exec(select(Tweet.content, Tweet.status)).all()
+
+
+def test_retry_does_not_stop_claiming_the_rest(sent, accounts, add_tweet):
+    now = datetime.now()
+    failing = add_tweet(accounts[0], now - timedelta(hours=1), content="fail")
+    for i in range(CLAIM_BATCH_SIZE + 10):
+        add_tweet(accounts[i % 3], now - timedelta(minutes=30), content=f"tweet {i}")
+
+    wake_at = scheduler.check_and_post()
+
+    # 1件の再試行で取得を止めず、上限を超える残りも1回で送る
+    assert len(sent) == CLAIM_BATCH_SIZE + 10
+    tweet = load_tweet(failing)
+    assert tweet.status == TWEET_PENDING
+    assert tweet.retry_count == 1
+    assert tweet.lease_owner is None
+    assert wake_at == tweet.next_attempt_at > now
+
+
+def test_rate_limited_account_is_deferred_alone(sent, accounts, add_tweet):
+    now = datetime.now()
+    limited = [add_tweet(accounts[0], now - timedelta(minutes=5), content="limited") for _ in range(3)]
+    for i in range(CLAIM_BATCH_SIZE):
+        add_tweet(accounts[1 + i % 2], now - timedelta(minutes=1), content=f"tweet {i}")
+    scheduler.limiter.block_until(accounts[0], now.timestamp() + 600)
+
+    wake_at = scheduler.check_and_post()
+
+    assert len(sent) == CLAIM_BATCH_SIZE
+    for tweet_id in limited:
+        tweet = load_tweet(tweet_id)
+        assert tweet.status == TWEET_PENDING
+        assert tweet.next_attempt_at > now + timedelta(minutes=9)
+    assert wake_at > now + timedelta(minutes=9)
+    # 延期した時刻までは取得されない
+    assert scheduler.check_and_post() is None
+    assert {status for content, status in _statuses() if content != "limited"} == {TWEET_POSTED}
+
+
+def test_client_error_is_retried_without_stopping_other_accounts(
+    sent, accounts, add_tweet, monkeypatch
+):
+    now = datetime.now()
+    broken = add_tweet(accounts[0], now - timedelta(minutes=2), content="broken")
+    other = add_tweet(accounts[1], now - timedelta(minutes=1), content="ok")
+    get_clients = scheduler.get_clients
+
+    def failing_get_clients(account):
+        # 認証情報の復号に失敗した場合など
+        if account.id == accounts[0]:
+            raise ValueError()
+        return get_clients(account)
+
+    monkeypatch.setattr(scheduler, "get_clients", failing_get_clients)
+    monkeypatch.setattr(scheduler, "SCHEDULER_MAX_WORKERS", 1)
+
+    wake_at = scheduler.check_and_post()
+
+    tweet = load_tweet(broken)
+    assert tweet.status == TWEET_PENDING
+    assert tweet.retry_count == 1
+    assert tweet.lease_owner is None
+    assert wake_at == tweet.next_attempt_at
+    assert load_tweet(other).status == TWEET_POSTED
+
+
+def test_account_error_in_serial_path_does_not_strand_other_leases(
+    sent, accounts, add_tweet, monkeypatch
+):
+    now = datetime.now()
+    stuck = add_tweet(accounts[0], now - timedelta(minutes=2))
+    other = add_tweet(accounts[1], now - timedelta(minutes=1))
+    load = scheduler._load
+
+    def failing_load(model, row_id):
+        if model is Account and row_id == accounts[0]:
+            raise RuntimeError("DB エラー")
+        return load(model, row_id)
+
+    monkeypatch.setattr(scheduler, "_load", failing_load)
+    monkeypatch.setattr(scheduler, "SCHEDULER_MAX_WORKERS", 1)
+
+    assert scheduler.check_and_post() > now
+    tweet = load_tweet(stuck)
+    assert tweet.lease_owner is None
+    assert tweet.next_attempt_at > now
+    assert load_tweet(other).status == TWEET_POSTED
+
+
+def test_slow_send_keeps_its_in_flight_lease(sent, accounts, add_tweet, monkeypatch):
+    monkeypatch.setattr(dispatch_queue, "LEASE_SECONDS", 1)
+    tweet_id = add_tweet(accounts[0], datetime.now() - timedelta(minutes=1), content="slow")
+    seen = []
+
+    def slow_send(account, content, image_names, media_ids=None):
+        # 取得時のリース（1秒）より長くかかる送信
+        time.sleep(2)
+        # 別のプロセスの取得: リースが延長されているので送信中のツイートを失敗扱いにしない
+        claim_due_tweets(datetime.now())
+        seen.append(load_tweet(tweet_id).status)
+
+    monkeypatch.setattr(scheduler, "send_tweet_with_media", slow_send)
+
+    scheduler.check_and_post()
+
+    assert seen == [TWEET_IN_FLIGHT]
+    assert load_tweet(tweet_id).status == TWEET_POSTED
@@ -0,0 +1,75 @@
+# tests/test_status_writer.py
+from datetime import timedelta
+
+import pytest
+
+from conftest import load_tweet
+from models import TWEET_PENDING, TWEET_IN_FLIGHT, TWEET_POSTED
+from services.dispatch_queue import claim_due_tweets
+from services.status_writer import StatusWriter
+
+
+@pytest.fixture
+def writer():
+    # 更新がしばらくコミットされずに溜まるよう、待ち時間を長めにする
+    return StatusWriter(batch_size=100, batch_delay=1.0)
+
+
+def test_conditional_update_applies_when_conditions_hold(writer, add_tweet, now):
+    tweet_id = add_tweet(1, now, lease_owner="me")
+
+    assert writer.write(
+        tweet_id, {"status": TWEET_IN_FLIGHT}, lease_owner="me", status=TWEET_PENDING
+    )
+    assert load_tweet(tweet_id).status == TWEET_IN_FLIGHT
+
+
+def test_stale_conditional_update_is_ignored(writer, add_tweet, now):
+    # リースを失ったワーカーの結果は書き込まれない
+    tweet_id = add_tweet(1, now, status=TWEET_IN_FLIGHT, lease_owner="new-owner")
+
+    assert not writer.write(
+        tweet_id,
+        {"status": TWEET_POSTED, "is_posted": True},
+        lease_owner="old-owner",
+        status=TWEET_IN_FLIGHT,
+    )
+    tweet = load_tweet(tweet_id)
+    assert tweet.status == TWEET_IN_FLIGHT
+    assert not tweet.is_posted
+
+
+def test_batch_reports_each_result(writer, add_tweet, now):
+    applied = add_tweet(1, now, lease_owner="me")
+    stale = add_tweet(2, now, lease_owner="someone-else")
+
+    futures = [
+        writer.submit(tweet_id, {"retry_count": 1}, lease_owner="me")
+        for tweet_id in (applied, stale)
+    ]
+    writer.flush()
+
+    assert [f.result() for f in futures] == [True, False]
+
+
+def test_flush_makes_account_claimable_again(writer, add_tweet, now):
+    first = add_tweet(1, now - timedelta(minutes=2))
+    token, _ = claim_due_tweets(now)
+    writer.write(first, {"status": TWEET_IN_FLIGHT}, lease_owner=token, status=TWEET_PENDING)
+    later = add_tweet(1, now - timedelta(minutes=1))
+
+    # 投稿結果（リースの解放を含む）はまだコミットされていない
+    writer.submit(
+        first,
+        {"status": TWEET_POSTED, "is_posted": True, "lease_owner": None, "lease_expires_at": None},
+        lease_owner=token,
+        status=TWEET_IN_FLIGHT,
+    )
+    _, claimed = claim_due_tweets(now)
+    assert claimed == []
+
+    writer.flush()
+
+    _, claimed = claim_due_tweets(now)
+    assert claimed == [(later, 1)]
+    assert load_tweet(first).status == TWEET_POSTED